@@ -0,0 +1,240 @@
+# benchmarks/run_benchmarks.py
+"""
+ボード・一覧・予約ページのオフラインベンチマーク。
+
+    python -m benchmarks.run_benchmarks --reservations 40 120 400
+    python -m benchmarks.run_benchmarks --compare   # 直前の記録と比べて遅くなっていたら終了コード 1
+
+合成した1日分のデータを InMemoryBackend に入れ、各ページ関数を Streamlit の AppTest で
+ヘッドレスに実行して、実行時間・DB 往復回数・受け取った行数・ウィジェット数を測る。
+結果は benchmarks/results.jsonl に、コミットごとに追記される。
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime
+
+from streamlit.testing.v1 import AppTest
+
+from modules import board_snapshot, catalog_cache, daily_summary, occupancy, realtime_feed, timeline
+from modules.repository import InMemoryBackend, use_backend
+from modules.stations import DEFAULT_STATION, get_station
+from modules.time_utils import get_today_jst, parse_wall_jst
+
+from .synthetic_day import SyntheticDayConfig, build_day
+
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.jsonl")
+
+PAGES = ("board", "cooked_list", "served_list", "reservation")
+
+# --compare でこれ以上遅くなっていたら回帰とみなす（割合）
+WALL_TIME_TOLERANCE = 0.25
+
+
+def _page_script(page: str):
+    # AppTest はこの関数のソースだけを取り出して実行するので、import は中に書く
+    from modules import course_progress_view, course_reservation
+
+    if page == "board":
+        course_progress_view.show_board()
+    elif page == "cooked_list":
+        course_progress_view.show_cooked_list()
+    elif page == "served_list":
+        course_progress_view.show_served_list()
+    elif page == "reservation":
+        course_reservation.show()
+
+
+def _count_elements(node) -> int:
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return 1 + sum(_count_elements(child) for child in children.values())
+
+
+def _reset_process_caches():
+    """
+    プロセス全体で共有しているキャッシュ（st.cache_resource）を捨てる。
+    use_backend() でバックエンドを差し替えても、これらは前の設定のデータ・購読を持ち続けるので、
+    設定ごとに作り直さないと 2 つ目以降の予約数で 1 つ目のデータを測ってしまう。
+    """
+    for cached in (
+        realtime_feed.get_change_feed,
+        timeline.get_timeline_cache,
+        board_snapshot.get_board_snapshot_cache,
+        occupancy._registry,
+        daily_summary.get_summary_registry,
+    ):
+        cached.clear()
+    catalog_cache.invalidate_catalog()
+
+
+def _expected_board_cards(backend: InMemoryBackend, target_date) -> int:
+    """既定の持ち場のボードに出るはずのカード数（未配膳の進行がある、cancelled 以外の予約の数）を、テーブルから直接数える。"""
+    station = get_station(DEFAULT_STATION)
+    reservations = {
+        r["id"]: r
+        for r in backend.tables.get("course_reservations", [])
+        if r.get("status") != "cancelled" and parse_wall_jst(r["reserved_at"]).date() == target_date
+    }
+    items = {i["id"]: i for i in backend.tables.get("course_items", [])}
+    with_cards = set()
+    for p in backend.tables.get("course_progress", []):
+        r = reservations.get(p["reservation_id"])
+        item = items.get(p["course_item_id"])
+        if r is not None and item is not None and not p.get("is_served") and station.includes(r, p, item):
+            with_cards.add(r["id"])
+    return len(with_cards)
+
+
+def _check_board_cards(at: AppTest, backend: InMemoryBackend):
+    """ボードの「（全 N件）」が、いまのバックエンドの予約数と合っているか確かめる（古いキャッシュを測っていないか）。"""
+    expected = _expected_board_cards(backend, get_today_jst())
+    for caption in at.caption:
+        m = re.search(r"全 (\d+)件", caption.value) or re.match(r"予約：(\d+)件", caption.value)
+        if m:
+            if int(m.group(1)) != expected:
+                raise RuntimeError(f"board: カード {m.group(1)} 件を表示、予約から数えると {expected} 件")
+            return
+    if expected:
+        raise RuntimeError(f"board: カードが表示されていません（予約から数えると {expected} 件）")
+
+
+def bench_page(page: str, backend: InMemoryBackend, repeat: int):
+    """1ページを repeat 回再実行し、2回目以降（キャッシュが温まった状態）の中央値を返す。"""
+    at = AppTest.from_function(_page_script, kwargs={"page": page}, default_timeout=120)
+
+    walls = []
+    round_trips = []
+    rows = []
+    for _ in range(repeat + 1):
+        backend.reset_stats()
+        started = time.perf_counter()
+        at.run()
+        walls.append(time.perf_counter() - started)
+        round_trips.append(backend.stats["round_trips"])
+        rows.append(backend.stats["rows"])
+
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].value}")
+    if page == "board":
+        _check_board_cards(at, backend)
+
+    return {
+        "cold_wall_ms": round(walls[0] * 1000, 2),
+        "wall_ms": round(statistics.median(walls[1:]) * 1000, 2),
+        "round_trips": round_trips[-1],
+        "rows": rows[-1],
+        "cold_round_trips": round_trips[0],
+        "widgets": _count_elements(at.main),
+    }
+
+
+def run(config: SyntheticDayConfig, pages, repeat: int):
+    backend = InMemoryBackend(build_day(get_today_jst(), config))
+    use_backend(backend)
+    _reset_process_caches()
+    return {page: bench_page(page, backend, repeat) for page in pages}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load_history():
+    if not os.path.exists(RESULTS_PATH):
+        return []
+    with open(RESULTS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _find_regressions(previous, current):
+    problems = []
+    for page, now in current["results"].items():
+        before = previous["results"].get(page)
+        if not before:
+            continue
+        if now["round_trips"] > before["round_trips"]:
+            problems.append(f"{page}: round_trips {before['round_trips']} -> {now['round_trips']}")
+        if now["wall_ms"] > before["wall_ms"] * (1 + WALL_TIME_TOLERANCE):
+            problems.append(f"{page}: wall_ms {before['wall_ms']} -> {now['wall_ms']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reservations", type=int, nargs="+", default=[40])
+    parser.add_argument("--courses", type=int, default=3)
+    parser.add_argument("--items-per-course", type=int, default=6)
+    parser.add_argument("--pasta-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="キャッシュが温まった後の再実行回数")
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=list(PAGES))
+    parser.add_argument("--compare", action="store_true", help="同じ条件の直前の記録と比較する")
+    parser.add_argument("--no-save", action="store_true", help="results.jsonl に記録しない")
+    args = parser.parse_args(argv)
+
+    history = _load_history()
+    commit = _git_commit()
+    regressions = []
+
+    for n in args.reservations:
+        config = SyntheticDayConfig(
+            reservations=n,
+            courses=args.courses,
+            items_per_course=args.items_per_course,
+            pasta_ratio=args.pasta_ratio,
+            seed=args.seed,
+        )
+        entry = {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": asdict(config),
+            "results": run(config, args.pages, args.repeat),
+        }
+
+        print(f"\n== reservations={n} (commit {commit})")
+        print(f"{'page':<14}{'wall_ms':>10}{'cold_ms':>10}{'trips':>7}{'rows':>8}{'widgets':>9}")
+        for page, r in entry["results"].items():
+            print(
+                f"{page:<14}{r['wall_ms']:>10}{r['cold_wall_ms']:>10}"
+                f"{r['round_trips']:>7}{r['rows']:>8}{r['widgets']:>9}"
+            )
+
+        if args.compare:
+            previous = next(
+                (h for h in reversed(history) if h["config"] == entry["config"] and h["commit"] != commit),
+                None,
+            )
+            if previous:
+                regressions += [f"reservations={n} {p}" for p in _find_regressions(previous, entry)]
+
+        if not args.no_save:
+            with open(RESULTS_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    if regressions:
+        print("\n回帰の可能性があります:")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# benchmarks/synthetic_day.py
+
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+from modules.course_reservation import TABLE_OPTIONS, TIME_OPTIONS, MAIN_OPTIONS
+
+
+@dataclass
+class SyntheticDayConfig:
+    """ベンチマーク用の1日分のデータの作り方。seed が同じなら毎回同じデータになる。"""
+
+    reservations: int = 40
+    courses: int = 3
+    items_per_course: int = 6
+    pasta_ratio: float = 0.5     # メインのうちパスタの割合（残りはピザ）
+    cooked_ratio: float = 0.3    # 調理済みにしておく進行の割合
+    served_ratio: float = 0.2    # 配膳済みにしておく進行の割合
+    seed: int = 0
+
+
+MAKING_PLACES = ("キッチン", "ピザ", "両方")
+
+
+def build_day(target_date: date, config: SyntheticDayConfig):
+    """
+    InMemoryBackend にそのまま渡せる tables dict を作る。
+    テーブル × 時間帯の重複ルールは気にせず、予約数ぶん順番に割り当てる。
+    """
+    rng = random.Random(config.seed)
+    # 更新時刻は過去1時間にばらしておく（差分同期で毎回全件が返ってこないように）
+    base_time = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    def updated_at():
+        return (base_time + timedelta(seconds=rng.randint(0, 3000))).isoformat()
+
+    courses = []
+    items = []
+    for c in range(config.courses):
+        course_id = f"course-{c}"
+        courses.append({
+            "id": course_id,
+            "name": f"コース{c + 1}",
+            "description": None,
+            "is_active": True,
+            "created_at": f"2025-01-{c + 1:02d}T00:00:00+00:00",
+        })
+        for n in range(config.items_per_course):
+            # 真ん中あたりの1品を「メイン」枠にする
+            is_main = n == config.items_per_course // 2
+            items.append({
+                "id": f"item-{c}-{n}",
+                "course_id": course_id,
+                "display_order": n + 1,
+                "item_name": "メイン" if is_main else f"料理{c + 1}-{n + 1}",
+                "offset_minutes": 10 * n,
+                "making_place": "両方" if is_main else rng.choice(MAKING_PLACES),
+                "memo": None,
+            })
+
+    items_by_course = {}
+    for i in items:
+        items_by_course.setdefault(i["course_id"], []).append(i)
+
+    reservations = []
+    progress = []
+    for r in range(config.reservations):
+        reservation_id = f"resv-{r}"
+        course = courses[r % len(courses)]
+        time_str = TIME_OPTIONS[r % len(TIME_OPTIONS)]
+        table_no = TABLE_OPTIONS[(r // len(TIME_OPTIONS)) % len(TABLE_OPTIONS)]
+        reserved_at = datetime.combine(target_date, datetime.strptime(time_str, "%H:%M").time())
+        guest_count = rng.randint(1, 6)
+
+        pasta = sum(1 for _ in range(guest_count) if rng.random() < config.pasta_ratio)
+        main_counts = {MAIN_OPTIONS[0]: pasta, MAIN_OPTIONS[1]: guest_count - pasta}
+        main_choice = "、".join(f"{k}：{v}" for k, v in main_counts.items() if v > 0)
+
+        reservations.append({
+            "id": reservation_id,
+            "course_id": course["id"],
+            "reserved_at": reserved_at.isoformat(),
+            "guest_name": f"ゲスト{r + 1}",
+            "guest_count": guest_count,
+            "table_no": table_no,
+            "status": "reserved",
+            "note": None,
+            "main_choice": main_choice,
+            "updated_at": updated_at(),
+        })
+
+        for item in items_by_course[course["id"]]:
+            scheduled = reserved_at + timedelta(minutes=item["offset_minutes"])
+            if item["item_name"] == "メイン":
+                details = [(k, v) for k, v in main_counts.items() if v > 0]
+            else:
+                details = [(None, 1)]
+
+            for detail, qty in details:
+                is_cooked = rng.random() < config.cooked_ratio
+                is_served = is_cooked and rng.random() < config.served_ratio / max(config.cooked_ratio, 1e-9)
+                stamp = (scheduled - timedelta(hours=9)).isoformat()  # cooked_at / served_at は UTC で入る
+                row = {
+                    "id": f"prog-{len(progress)}",
+                    "reservation_id": reservation_id,
+                    "course_item_id": item["id"],
+                    "scheduled_time": scheduled.isoformat(),
+                    "is_cooked": is_cooked,
+                    "cooked_at": stamp if is_cooked else None,
+                    "is_served": is_served,
+                    "served_at": stamp if is_served else None,
+                    "quantity": qty,
+                    "updated_at": updated_at(),
+                }
+                if detail:
+                    row["main_detail"] = detail
+                progress.append(row)
+
+    return {
+        "course_master": courses,
+        "course_items": items,
+        "course_reservations": reservations,
+        "course_progress": progress,
+    }
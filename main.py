@@ -1,7 +1,7 @@
 # main.py
 
 import streamlit as st
-from modules import course_master, course_reservation, course_progress_view
+from modules import course_master, course_reservation, course_progress_view, janitor, instrumentation
 
 
 
@@ -25,27 +25,50 @@ def main():
     unsafe_allow_html=True
 )
 
+    # 過去データの削除は描画とは別スレッドで1日1回だけ行う
+    janitor.start_janitor()
+
     menu = st.sidebar.radio(
         "メニュー",
         [
             "1. コース進行ボード",
             "2. 調理済み一覧",
             "3. 配膳済み一覧",
-            # "4. コース予約登録",
-            # "5. コースマスタ管理",
+            "4. 来店済み一覧",
+            # "5. コース予約登録",
+            # "6. コースマスタ管理",
         ]
     )
 
-    if menu == "1. コース進行ボード":
-        course_progress_view.show_board()
-    elif menu == "2. 調理済み一覧":
-        course_progress_view.show_cooked_list()
-    elif menu == "3. 配膳済み一覧":
-        course_progress_view.show_served_list()
-    # elif menu == "4. コース予約登録":
-    #     course_reservation.show()
-    # elif menu == "5. コースマスタ管理":
-    #     course_master.show()
+    report = janitor.last_report()
+    if report and report.get("ok"):
+        st.sidebar.caption(
+            f"過去データ削除（{report['date']}）：予約 {report['reservations']} 件 / 進行 {report['progress']} 件"
+        )
+    elif report:
+        st.sidebar.caption(f"過去データ削除に失敗しました（{report['date']}）: {report.get('error')}")
+
+    # サイドバーの「デバッグ情報」が ON のときだけ、DB 呼び出しと描画時間を計測する
+    trace = instrumentation.begin_rerun(menu)
+
+    # ボードの操作などは st.rerun() で再実行を打ち切るので、計測の記録は finally で行う
+    try:
+        if menu == "1. コース進行ボード":
+            course_progress_view.show_board()
+        elif menu == "2. 調理済み一覧":
+            course_progress_view.show_cooked_list()
+        elif menu == "3. 配膳済み一覧":
+            course_progress_view.show_served_list()
+        elif menu == "4. 来店済み一覧":
+            course_progress_view.show_arrived_list()
+        # elif menu == "5. コース予約登録":
+        #     course_reservation.show()
+        # elif menu == "6. コースマスタ管理":
+        #     course_master.show()
+
+        instrumentation.render_debug_panel(trace)
+    finally:
+        instrumentation.end_rerun(trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+# modules/board_cards.py
+
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+
+# ビルド不要の素の HTML/JS コンポーネント（modules/static/board_cards/index.html）
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "board_cards")
+_board_cards = components.declare_component("board_cards", path=_FRONTEND_DIR)
+
+
+def board_cards(cards, bulk_mode: bool = False, key: str = None):
+    """
+    進行ボードのカード一式を 1 つのコンポーネント（iframe）で描画し、押されたボタンを返す。
+
+    cards は build_board_cards() が作る JSON。予約・商品が何件あってもウィジェットは 1 個なので、
+    再実行のたびに送るのはこのデータだけになる。
+
+    戻り値: まだ処理していないイベント {"action": "cook" | "undo_cook" | "serve" | "arrived" |
+    "undo_arrived", "ids": [...]}。無ければ None。
+    （コンポーネントの値は次の再実行でも同じものが返ってくるので、nonce で一度だけ返す）
+    """
+    event = _board_cards(cards=cards, bulk_mode=bulk_mode, key=key, default=None)
+    if not event:
+        return None
+
+    seen_key = f"{key}_seen_nonce"
+    if event.get("nonce") == st.session_state.get(seen_key):
+        return None
+    st.session_state[seen_key] = event.get("nonce")
+    return event
@@ -0,0 +1,264 @@
+# modules/board_snapshot.py
+
+import threading
+import time as time_module
+from datetime import date, timedelta
+
+import streamlit as st
+
+from .instrumentation import traced
+from .models import ProgressRow, ReservationRow
+from .realtime_feed import FULL_SYNC_INTERVAL_SEC, get_change_feed
+from .repository import repos
+from .stations import DEFAULT_STATION, get_station
+
+
+# 差分取得のたびに全件を取り直す間隔（FULL_SYNC_INTERVAL_SEC。realtime_feed で定義）。
+# 削除された行は updated_at では検知できないので、定期的にフル同期して掃除する。
+
+# コミット順と updated_at の順がずれても取りこぼさないよう、ウォーターマークを少し巻き戻して取得する
+DELTA_OVERLAP = timedelta(seconds=2)
+
+# Realtime に接続できない（変更通知が来ない）ときに、取得済みのデータを使い回す時間（秒）。
+# 端末が何台ポーリングしていても、1 つのスナップショットの取得はこの間隔に 1 回になる。
+POLL_SYNC_INTERVAL_SEC = 2
+
+# この時間どのセッションからも使われなかったスナップショットは捨てる（秒）
+SNAPSHOT_IDLE_SEC = 600
+
+
+class BoardSnapshot:
+    """
+    1日分のボード表示用データ（予約・進行・商品）を保持し、
+    updated_at のウォーターマーク以降に変わった行だけを取り込んで最新化する。
+
+    データはすべて get_board_rows（sql/005_board_rows_station.sql）の 1 回の RPC で取得し、
+    行は ReservationRow / ProgressRow（modules/models.py）に変換して持つ。
+    保持するのは「cancelled 以外の予約の、未配膳で、持ち場（station）の条件に合う進行」だけ。
+    持ち場の絞り込み（作業場所・メインの種類・フロア）は DB 側で済ませる。
+
+    スナップショットはプロセス全体で共有する（BoardSnapshotCache）。
+    ChangeFeed のその日付のバージョンが変わらない限り取得はせず、取得が重なったときは
+    lock で 1 本にまとめる（後から来たセッションは、その結果を待って使う）。
+
+    前提: course_reservations / course_progress に updated_at カラムがあり、
+    UPDATE のたびにトリガーで now() に更新されること（sql/001_add_updated_at.sql）。
+    """
+
+    def __init__(self, target_date: date, station=None, feed=None):
+        self.target_date = target_date
+        self.station = station or get_station(DEFAULT_STATION)
+        self.feed = feed or get_change_feed()
+        self.lock = threading.RLock()
+        self.reservations = {}   # reservation_id -> ReservationRow
+        self.progress = {}       # progress_id -> ProgressRow
+        self.items = {}          # course_item_id -> row（dict のまま）
+        self.watermark = None    # これまでに見た updated_at の最大値（datetime）
+        self.last_full_sync = 0.0
+        self.synced_at = None         # 最後に取得した時刻（monotonic）。None は未取得
+        self.synced_version = None    # 取得前に読んだ ChangeFeed のバージョン
+        self.seen_delete_version = 0  # 取り込み済みの削除通知のバージョン（realtime_feed）
+        self.seen_failure_count = 0   # 取り込み済みの書き込み失敗の件数（write_behind）
+        self._sorted = None           # 並べ替え済みの一覧（変更があったら作り直す）
+
+    # ---------- 同期 ----------
+
+    @traced("sync_board_snapshot")
+    def sync(self, delete_version: int = 0, failure_count: int = 0, pending=(), prefer_cached: bool = False):
+        """
+        必要なときだけ取得する。戻り値は取得したら True。
+
+        - 削除の通知（delete_version）・書き込みの失敗（failure_count）が増えていたらフル同期
+        - ChangeFeed のバージョンが変わっていたら差分同期（一定時間ごとにフル同期）
+        - どちらも無ければ取得しない（Realtime が無いときは POLL_SYNC_INTERVAL_SEC ごとに取得）
+        - prefer_cached: 直前の操作を apply_local で反映済みのセッション。通信を待たずに描画する
+
+        pending には、まだ DB に届いていない操作（write_behind の WriteJob）を記録順で渡す。
+        取得した行の上にもう一度重ねるので、送信待ちの間も画面は操作後の状態のままになる。
+        （取得の前に pending を読んでおけば、取得中に届いた操作を重ねても結果は同じ）
+        """
+        with self.lock:
+            date_key = self.target_date.isoformat()
+            force_full = (
+                delete_version != self.seen_delete_version
+                or failure_count != self.seen_failure_count
+            )
+            if not force_full and self.synced_at is not None and (prefer_cached or self._is_fresh()):
+                return False
+
+            # 取得中に届いた変更を取りこぼさないよう、バージョンは取得の前に読む
+            version = self.feed.version(date_key)
+            now = time_module.monotonic()
+            if (
+                force_full
+                or self.watermark is None
+                or now - self.last_full_sync >= FULL_SYNC_INTERVAL_SEC
+            ):
+                self._full_sync()
+                self.last_full_sync = now
+            else:
+                self._delta_sync()
+
+            for job in pending:
+                self._apply_patch(job)
+            self._prune_reservations()
+
+            self.synced_at = now
+            self.synced_version = version
+            self.seen_delete_version = delete_version
+            self.seen_failure_count = failure_count
+            self.feed.remember_reservation_dates((r.id, r.date_key) for r in self.reservations.values())
+            return True
+
+    def _is_fresh(self) -> bool:
+        if self.synced_version != self.feed.version(self.target_date.isoformat()):
+            return False
+        age = time_module.monotonic() - self.synced_at
+        if age >= FULL_SYNC_INTERVAL_SEC:
+            # 通知の取りこぼしに備えて、変更が無くても定期的にフル同期する
+            return False
+        return self.feed.is_live or age < POLL_SYNC_INTERVAL_SEC
+
+    def invalidate(self):
+        """このプロセスから直接書き込んだ後に呼ぶ（Realtime の通知を待たずに次の描画で取得させる）。"""
+        with self.lock:
+            self.synced_version = None
+
+    def apply_local(self, job):
+        """
+        操作を DB への書き込みを待たずにスナップショットへ反映する（楽観的更新）。
+        共有のスナップショットなので、同じ持ち場を見ている全セッションにすぐ反映される。
+        """
+        with self.lock:
+            self._apply_patch(job)
+            self._prune_reservations()
+
+    def _apply_patch(self, job):
+        self._sorted = None
+        for row_id in job.row_ids:
+            if job.table == "course_progress":
+                p = self.progress.get(row_id)
+                if p is None:
+                    continue
+                p.apply(job.payload)
+                if p.is_served:
+                    self.progress.pop(row_id, None)
+            elif job.table == "course_reservations":
+                r = self.reservations.get(row_id)
+                if r is None:
+                    continue
+                r.apply(job.payload)
+                if r.status == "cancelled":
+                    for pid in [pid for pid, p in self.progress.items() if p.reservation_id == row_id]:
+                        del self.progress[pid]
+
+    def _fetch_rows(self, since=None):
+        return repos().progress.board_rows(self.target_date, self.station, since=since)
+
+    def _full_sync(self):
+        rows = self._fetch_rows()
+
+        self.reservations = {}
+        self.progress = {}
+        self.watermark = None
+        self._merge(rows)
+
+    def _delta_sync(self):
+        # 予約・進行のどちらかが変わった行（配膳済みになった行・cancelled になった予約も含む）
+        rows = self._fetch_rows(since=self.watermark - DELTA_OVERLAP)
+        self._merge(rows)
+
+    def _merge(self, rows):
+        self._sorted = None
+        for row in rows:
+            p = ProgressRow(row["progress"])
+            r = ReservationRow(row["reservation"])
+            item = row["item"]
+
+            self.items[item["id"]] = item
+            self._advance_watermark(p.updated_at)
+            self._advance_watermark(r.updated_at)
+
+            if r.status == "cancelled" or p.is_served or not row.get("in_station", True):
+                # 表示対象から外れた行（差分取得では、持ち場から外れた行も返ってくる）
+                self.progress.pop(p.id, None)
+            else:
+                self.progress[p.id] = p
+            self.reservations[r.id] = r
+
+        self._prune_reservations()
+
+    def _prune_reservations(self):
+        # 表示対象の進行が 1 つも無くなった予約は外す
+        self._sorted = None
+        live_ids = {p.reservation_id for p in self.progress.values()}
+        self.reservations = {rid: r for rid, r in self.reservations.items() if rid in live_ids}
+
+    def _advance_watermark(self, updated_at):
+        if updated_at is None:
+            return
+        if self.watermark is None or updated_at > self.watermark:
+            self.watermark = updated_at
+
+    # ---------- 参照 ----------
+
+    # 並べ替えは変更があったときだけ lock の中で行い、全セッションで使い回す
+
+    def sorted_view(self):
+        """
+        (予約の一覧, reservation_id -> 進行の一覧) を返す。
+        予約は「予約時間 → テーブル順」、進行は scheduled_time 順に並べ替え済み。
+        """
+        with self.lock:
+            if self._sorted is None:
+                progress_by_res = {}
+                for p in sorted(self.progress.values(), key=lambda p: p.scheduled_time):
+                    progress_by_res.setdefault(p.reservation_id, []).append(p)
+                reservations = sorted(self.reservations.values(), key=lambda r: r.sort_key)
+                self._sorted = (reservations, progress_by_res)
+            return self._sorted
+
+    def active_reservations(self):
+        """未配膳の進行が残っている予約を「予約時間 → テーブル順」で返す。"""
+        return self.sorted_view()[0]
+
+    def progress_for(self, reservation_ids):
+        _, progress_by_res = self.sorted_view()
+        rows = [p for rid in reservation_ids for p in progress_by_res.get(rid, [])]
+        return sorted(rows, key=lambda p: p.scheduled_time)
+
+
+class BoardSnapshotCache:
+    """日付 × 持ち場ごとの BoardSnapshot をプロセス全体で共有する。"""
+
+    def __init__(self, feed):
+        self._feed = feed
+        self._lock = threading.Lock()
+        self._snapshots = {}   # (date_key, station_key) -> BoardSnapshot
+        self._last_used = {}   # (date_key, station_key) -> monotonic
+
+    def get(self, target_date: date, station_key: str) -> BoardSnapshot:
+        key = (target_date.isoformat(), station_key)
+        now = time_module.monotonic()
+        with self._lock:
+            if key not in self._snapshots:
+                self._snapshots[key] = BoardSnapshot(target_date, get_station(station_key), self._feed)
+            self._last_used[key] = now
+
+            # しばらく誰も見ていない日付・持ち場は捨てる
+            for old_key, used_at in list(self._last_used.items()):
+                if now - used_at >= SNAPSHOT_IDLE_SEC:
+                    self._snapshots.pop(old_key, None)
+                    self._last_used.pop(old_key, None)
+            return self._snapshots[key]
+
+
+@st.cache_resource
+def get_board_snapshot_cache() -> BoardSnapshotCache:
+    """プロセス全体で 1 つのスナップショットキャッシュを返す。"""
+    return BoardSnapshotCache(get_change_feed())
+
+
+def get_board_snapshot(target_date: date, station_key: str = DEFAULT_STATION) -> BoardSnapshot:
+    """日付 × 持ち場のスナップショット（全セッション共通）を返す。"""
+    return get_board_snapshot_cache().get(target_date, station_key)
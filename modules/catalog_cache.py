@@ -0,0 +1,82 @@
+# modules/catalog_cache.py
+
+import streamlit as st
+
+from .repository import repos
+
+
+# コース・商品マスタの保持時間（秒）。
+# このアプリからの変更は invalidate_catalog() で即時反映されるので、
+# ここは Supabase の管理画面など「アプリ外」で編集された場合の保険。
+CATALOG_TTL_SEC = 300
+
+
+class CourseCatalog:
+    """
+    course_master / course_items の全件をメモリ上に持つ読み取り専用のカタログ。
+    営業中はほぼ変わらないので、プロセス全体で 1 つを共有する。
+    """
+
+    def __init__(self, courses, items):
+        self.courses = courses  # created_at 順
+        self.courses_by_id = {c["id"]: c for c in courses}
+        self.items_by_id = {i["id"]: i for i in items}
+
+        # course_id → 商品一覧（display_order 順）
+        self.items_by_course = {}
+        for i in items:
+            self.items_by_course.setdefault(i["course_id"], []).append(i)
+
+        # course_id → 「メイン」枠を持つかどうか
+        self.has_main_by_course = {
+            cid: any(i["item_name"] == "メイン" for i in course_items)
+            for cid, course_items in self.items_by_course.items()
+        }
+
+        # 読み直した直後にも無かった course_id（このカタログを使う間は、同じ ID で読み直さない）
+        self.missing_course_ids = set()
+
+    def active_courses(self):
+        return [c for c in self.courses if c.get("is_active")]
+
+    def items_for_course(self, course_id):
+        return self.items_by_course.get(course_id, [])
+
+    def has_main(self, course_id) -> bool:
+        return self.has_main_by_course.get(course_id, False)
+
+    def has_main_for_courses(self, course_ids):
+        """course_id → 「メイン」枠を持つかどうか の dict を返す（存在しない ID は含まれない）。"""
+        return {cid: self.has_main(cid) for cid in course_ids if cid in self.courses_by_id}
+
+
+@st.cache_resource(ttl=CATALOG_TTL_SEC, show_spinner=False)
+def _load_catalog() -> CourseCatalog:
+    return CourseCatalog(repos().courses.list_all(), repos().items.list_all())
+
+
+def get_catalog() -> CourseCatalog:
+    """プロセス共通のカタログを返す（初回と TTL 切れ・無効化の後だけ Supabase に問い合わせる）。"""
+    return _load_catalog()
+
+
+def invalidate_catalog():
+    """コース・商品を追加／更新／削除したら呼ぶ。次の get_catalog() で読み直される。"""
+    _load_catalog.clear()
+
+
+def has_main_for_courses(course_ids):
+    """
+    course_id → 「メイン」枠を持つかどうか の dict を返す（予約一覧の全行分を 1 回で引く）。
+    カタログに無いコースがあれば（アプリ外で追加されたコースなど）一度だけ読み直す。
+    それでも無いコースは False とし、読み直したカタログが TTL 切れ・無効化で入れ替わるまでは
+    同じ ID で読み直さない（削除済みのコースを参照する予約があっても、毎回の再実行で読み直さない）。
+    """
+    course_ids = set(course_ids)
+    catalog = get_catalog()
+    if course_ids - catalog.courses_by_id.keys() - catalog.missing_course_ids:
+        invalidate_catalog()
+        catalog = get_catalog()
+        catalog.missing_course_ids.update(course_ids - catalog.courses_by_id.keys())
+    has_main = catalog.has_main_for_courses(course_ids)
+    return {cid: has_main.get(cid, False) for cid in course_ids}
@@ -1,24 +1,16 @@
 # modules/course_master.py
 
 import streamlit as st
-from .supabase_client import supabase
+from .repository import repos
+from .catalog_cache import invalidate_catalog
 
 
 def fetch_courses():
-    res = supabase.table("course_master").select("*").order("created_at", desc=False).execute()
-    return res.data or []
+    return repos().courses.list_all()
 
 
 def fetch_course_items(course_id):
-    res = (
-        supabase
-        .table("course_items")
-        .select("*")
-        .eq("course_id", course_id)
-        .order("display_order", desc=False)
-        .execute()
-    )
-    return res.data or []
+    return repos().items.list_for_course(course_id)
 
 
 def show():
@@ -54,7 +46,8 @@ def show():
                         "is_active": is_active,
                     }
                     try:
-                        supabase.table("course_master").insert(data).execute()
+                        repos().courses.insert(data)
+                        invalidate_catalog()
                         st.success("コースを追加しました。ページを再読み込みすると反映されます。")
                     except Exception as e:
                         st.error(f"コース追加に失敗しました: {e}")
@@ -87,9 +80,8 @@ def show():
 
             if update_active_btn:
                 try:
-                    supabase.table("course_master").update(
-                        {"is_active": is_active_new}
-                    ).eq("id", course["id"]).execute()
+                    repos().courses.update(course["id"], {"is_active": is_active_new})
+                    invalidate_catalog()
                     st.success("コースの有効/無効状態を更新しました。")
                     st.rerun()
                 except Exception as e:
@@ -110,7 +102,8 @@ def show():
                     st.warning("削除する場合はチェックボックスにチェックを入れてください。")
                 else:
                     try:
-                        supabase.table("course_master").delete().eq("id", course["id"]).execute()
+                        repos().courses.delete(course["id"])
+                        invalidate_catalog()
                         st.success("コースを削除しました。")
                         st.rerun()
                     except Exception as e:
@@ -192,7 +185,8 @@ def show():
                                 "making_place": making_place,
                             }
                             try:
-                                supabase.table("course_items").update(update_data).eq("id", item["id"]).execute()
+                                repos().items.update(item["id"], update_data)
+                                invalidate_catalog()
                                 st.success("商品を更新しました。")
                                 st.rerun()
                             except Exception as e:
@@ -202,10 +196,11 @@ def show():
                     if delete_btn:
                         try:
                             # 1. 先に course_progress 側の関連レコードを削除
-                            supabase.table("course_progress").delete().eq("course_item_id", item["id"]).execute()
+                            repos().progress.delete_for_item(item["id"])
 
                             # 2. 次に course_items のレコードを削除
-                            supabase.table("course_items").delete().eq("id", item["id"]).execute()
+                            repos().items.delete(item["id"])
+                            invalidate_catalog()
 
                             st.success("商品を削除しました。（関連する進行データも削除されました）")
                             st.rerun()
@@ -261,7 +256,8 @@ def show():
                         "making_place": making_place_new,
                     }
                     try:
-                        supabase.table("course_items").insert(data).execute()
+                        repos().items.insert(data)
+                        invalidate_catalog()
                         st.success("商品を追加しました。ページを再読み込みすると反映されます。")
                     except Exception as e:
                         st.error(f"商品追加に失敗しました: {e}")
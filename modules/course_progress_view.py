@@ -4,281 +4,403 @@ import streamlit as st
 from datetime import datetime, date, time, timedelta
 from collections import Counter
 from streamlit_autorefresh import st_autorefresh
-from typing import Optional
-from .time_utils import get_today_jst
+from .time_utils import get_now_jst, get_today_jst, now_utc_iso
+from .board_snapshot import get_board_snapshot
+from .daily_summary import get_daily_summary
+from .stations import DEFAULT_STATION, STATIONS, get_station
+from .timeline import EVENTS, get_timeline, invalidate_timeline
+from .realtime_feed import get_change_feed, watch_date
+from .instrumentation import span, traced
+from . import write_behind
+from .board_cards import board_cards
+from .models import display_name
 
 
 TIME_OPTIONS = ["18:00", "18:30", "20:30", "21:00"]
-from .supabase_client import supabase
-
-# テーブルの並び順（course_reservation と合わせる）
-TABLE_ORDER = {
-    "1-T1": 0,  "1-T2": 1,  "1-T3": 2,  "1-T4": 3,  "1-T5": 4,
-    "1-T6": 5,  "1-T7": 6,  "1-T8": 7,  "1-T9": 8,
-    "1-C1": 9,  "1-C4": 10, "1-C5": 11, "1-C8": 12, "レコード": 13,
-    "2-T1": 14, "2-T2": 15, "2-T3": 16, "2-T4": 17, "2-T5": 18, "2-T6": 19,
-    "2-C1": 20, "2-C4": 21, "2-C5": 22, "2-C8": 23,
-    "2-R1": 24, "2-R2": 25, "2-R3": 26,
-}
-
-
-def cleanup_old_data():
-    """
-    今日より前の日付の予約と、それに紐づく course_progress を全削除する。
-    （＝前日以前のデータは残さない運用）
-    """
-    today = get_today_jst()
-    start_today = datetime.combine(today, time(0, 0, 0))
-
-    try:
-        # 今日より前の予約を取得
-        res = (
-            supabase.table("course_reservations")
-            .select("id, reserved_at")
-            .lt("reserved_at", start_today.isoformat())
-            .execute()
-        )
-        old_reservations = res.data or []
-        if not old_reservations:
-            return  # 消すものなし
+from .repository import repos
 
-        old_ids = [r["id"] for r in old_reservations]
+# ボードに出すカードの時間幅（分）。0 は「すべて」
+BOARD_WINDOW_OPTIONS = [30, 60, 90, 120, 0]
+BOARD_WINDOW_DEFAULT = 60
 
-        # 先に進行テーブルを削除（外部キー制約対策）
-        supabase.table("course_progress").delete().in_("reservation_id", old_ids).execute()
+# 1 ページに並べるカードの枚数
+BOARD_PAGE_SIZE_OPTIONS = [5, 10, 15, 20]
+BOARD_PAGE_SIZE_DEFAULT = 10
 
-        # 予約本体を削除
-        supabase.table("course_reservations").delete().in_("id", old_ids).execute()
+# 時間幅の区切り（現在時刻をこの単位で切り捨てて、最初の時間幅の開始にする）
+BOARD_WINDOW_ALIGN_MINUTES = 15
 
-    except Exception as e:
-        st.error(f"過去データの削除に失敗しました: {e}")
-
-
-def parse_dt(dt_str: str):
-    """Supabase の TIMESTAMP(+タイムゾーン) を安全に datetime に変換する"""
-    if not dt_str:
-        return None
-    try:
-        # 通常の isoformat はまずここで試す
-        return datetime.fromisoformat(dt_str)
-    except ValueError:
-        # "2025-11-18T15:10:20.86786+00:00" などを想定
-        # タイムゾーン以降を削り、秒までで切る
-        base = dt_str.split("+")[0].split("Z")[0]
-        if len(base) > 19:
-            base = base[:19]  # "YYYY-MM-DDTHH:MM:SS" まで
-        return datetime.fromisoformat(base)
-    
-def to_jst(dt: Optional[datetime]):
-    """
-    UTC の datetime を JST(+9h) に変換して返す。
-    None の場合はそのまま None。
-    """
-    if dt is None:
-        return None
-    return dt + timedelta(hours=9)
 
-
-# 予約ステータスを更新（reserved / arrived など）
-def set_reservation_status(reservation_id: str, status: str):
-    try:
-        supabase.table("course_reservations").update(
-            {"status": status}
-        ).eq("id", reservation_id).execute()
-    except Exception as e:
-        st.error(f"予約ステータスの更新に失敗しました: {e}")
+def cooked_payload(flag: bool) -> dict:
+    # 調理済みにするときは cooked_at も現在時刻でセット、戻すときはクリア
+    return {"is_cooked": flag, "cooked_at": now_utc_iso() if flag else None}
 
 
-# 調理フラグを更新（True / False）
-def set_cooked_flag(progress_id: str, flag: bool):
-    try:
-        payload = {"is_cooked": flag}
+def arrived_payload(flag: bool) -> dict:
+    # 来店済みにするときは arrived_at も現在時刻でセット（来店済み一覧の時刻）、戻すときはクリア
+    if flag:
+        return {"status": "arrived", "arrived_at": now_utc_iso()}
+    return {"status": "reserved", "arrived_at": None}
 
-        if flag:
-            # 調理済みにするときは cooked_at も現在時刻でセット
-            payload["cooked_at"] = datetime.now().isoformat()
-        else:
-            # 戻すときは cooked_at をクリア
-            payload["cooked_at"] = None
 
-        supabase.table("course_progress").update(payload).eq("id", progress_id).execute()
-    except Exception as e:
-        st.error(f"調理フラグの更新に失敗しました: {e}")
+def served_payload(flag: bool) -> dict:
+    # 配膳済みにするときは served_at も現在時刻でセット、戻すときはクリア
+    return {"is_served": flag, "served_at": now_utc_iso() if flag else None}
 
 
 # 配膳フラグを更新（True / False）
 def set_served_flag(progress_id: str, flag: bool):
     try:
-        payload = {"is_served": flag}
-
-        if flag:
-            # 配膳済みにするときは served_at も現在時刻でセット
-            payload["served_at"] = datetime.now().isoformat()
-        else:
-            # 戻すときは served_at をクリア
-            payload["served_at"] = None
-
-        supabase.table("course_progress").update(payload).eq("id", progress_id).execute()
+        repos().progress.update(progress_id, served_payload(flag))
     except Exception as e:
         st.error(f"配膳フラグの更新に失敗しました: {e}")
 
 
-def fetch_reservations_for_date(target_date: date):
-    start_dt = datetime.combine(target_date, time(0, 0, 0))
-    end_dt = datetime.combine(target_date + timedelta(days=1), time(0, 0, 0))
-
-    res = (
-        supabase.table("course_reservations")
-        .select("*")
-        .gte("reserved_at", start_dt.isoformat())
-        .lt("reserved_at", end_dt.isoformat())
-        .neq("status", "cancelled")
-        .order("reserved_at", desc=False)
-        .execute()
-    )
-    return res.data or []
-
-
-def fetch_progress_for_reservations(reservation_ids):
-    if not reservation_ids:
-        return []
-
-    res = (
-        supabase.table("course_progress")
-        .select("*")
-        .in_("reservation_id", reservation_ids)
-        .order("scheduled_time", desc=False)
-        .execute()
-    )
-    return res.data or []
-
+def board_write(snapshot, table: str, row_ids, payload: dict, label: str, action: str = None, nonce: str = None) -> bool:
+    """
+    ボードからの書き込み。
+    write-behind が有効なら、操作をローカルのログ（SQLite）に記録してスナップショットを先に書き換え、
+    Supabase への送信はバックグラウンドに回す（通信が切れていても操作は失われない。
+    DB に拒否された操作は、次の同期で DB の状態に戻り、エラーが表示される）。
+    無効ならその場で書き込む。
+    action / nonce はカードのイベントのもの（同じ押下を二重に記録しないための冪等キーになる）。
+    """
+    if write_behind.ENABLED:
+        job = write_behind.submit(
+            table, row_ids, payload, label, snapshot.target_date.isoformat(), action=action, nonce=nonce
+        )
+        snapshot.apply_local(job)
+        # 直後の再実行では取得を待たずに、反映済みのスナップショットをそのまま描画する
+        st.session_state["board_applied_local"] = True
+        return True
+    try:
+        write_behind.write_now(table, row_ids, payload)
+        snapshot.invalidate()
+        return True
+    except Exception as e:
+        st.error(f"{label}に失敗しました: {e}")
+        return False
 
-def fetch_items_for_ids(item_ids):
-    if not item_ids:
-        return {}
 
-    res = (
-        supabase.table("course_items")
-        .select("id, item_name, offset_minutes, making_place")
-        .in_("id", item_ids)
-        .execute()
-    )
-    items = res.data or []
-    return {i["id"]: i for i in items}
+# ボードのイベント → (テーブル, payload, エラー表示用の名前)
+BOARD_ACTIONS = {
+    "arrived": ("course_reservations", lambda: arrived_payload(True), "予約ステータスの更新"),
+    "undo_arrived": ("course_reservations", lambda: arrived_payload(False), "予約ステータスの更新"),
+    "cook": ("course_progress", lambda: cooked_payload(True), "調理フラグの更新"),
+    "undo_cook": ("course_progress", lambda: cooked_payload(False), "調理フラグの更新"),
+    "serve": ("course_progress", lambda: served_payload(True), "配膳フラグの更新"),
+}
 
 
-def update_reservation_arrived(reservation_id):
-    now_iso = datetime.now().isoformat()
-    supabase.table("course_reservations").update(
-        {"status": "arrived", "arrived_at": now_iso}
-    ).eq("id", reservation_id).execute()
+def handle_board_event(snapshot, event) -> bool:
+    """
+    カードから返ってきたイベント（{"action", "ids"}）を書き込みに変換する。
+    まとめて操作では ids に複数の進行が入り、1 回の update で書き込まれる。
+    書き込めたら True（呼び出し側で再実行する）。
+    """
+    action = BOARD_ACTIONS.get(event.get("action"))
+    ids = event.get("ids") or []
+    if action is None or not ids:
+        return False
+    table, payload, label = action
+    if len(ids) > 1:
+        label = label.replace("の更新", "の一括更新")
+    return board_write(snapshot, table, ids, payload(), label, action=event["action"], nonce=event.get("nonce"))
+
+
+@traced()
+def build_board_cards(active_reservations, progress_by_res, item_map):
+    """
+    ボードに並べるカードのデータ（board_cards コンポーネントに渡す JSON）を作る。
+    持ち場での絞り込み（ピザ以外のメインは出さない 等）は get_board_rows の RPC 側で済んでいる。
+    予約・進行は並べ替え済みの ReservationRow / ProgressRow（BoardSnapshot.sorted_view）。
 
+    next_due（次に出す商品の予定時刻、datetime）は時間幅での絞り込み用で、
+    コンポーネントには board_card_payload() で外してから渡す。
+    """
+    cards = []
+    for resv in active_reservations:
+        rows = []
+        next_due = None
+        for p in progress_by_res.get(resv.id, []):
+            item = item_map.get(p.course_item_id)
+            if not item:
+                continue
+            if next_due is None:
+                next_due = p.scheduled_time  # scheduled_time 順なので最初の 1 件が一番早い
+            rows.append({
+                "id": p.id,
+                "time": p.time_label,
+                "name": display_name(item, p, resv),
+                "is_cooked": p.is_cooked,
+                "is_served": p.is_served,
+            })
+
+        cards.append({
+            "id": resv.id,
+            "time": resv.time_label,
+            "next_due": next_due or resv.reserved_at,  # 商品が無ければ予約時刻
+            "guest_name": resv.guest_name or "お名前未入力",
+            "guest_count": resv.guest_count or "-",
+            "table_no": resv.table_no or "-",
+            "arrived": resv.status == "arrived",
+            "items": rows,
+        })
+    return cards
+
+
+def board_card_payload(cards):
+    """コンポーネントに渡す JSON（next_due を外す）。"""
+    return [{k: v for k, v in c.items() if k != "next_due"} for c in cards]
+
+
+def _floor_to_window_align(dt: datetime) -> datetime:
+    minutes = (dt.hour * 60 + dt.minute) // BOARD_WINDOW_ALIGN_MINUTES * BOARD_WINDOW_ALIGN_MINUTES
+    return dt.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+
+
+def window_board_cards(cards, target_date: date, window_minutes, offset: int, page: int, page_size: int):
+    """
+    カードを「次の商品の予定時刻」で時間幅に絞り、さらに page_size 枚ずつのページに分ける。
 
-def update_cooked(progress_id):
-    now_iso = datetime.now().isoformat()
-    supabase.table("course_progress").update(
-        {"is_cooked": True, "cooked_at": now_iso}
-    ).eq("id", progress_id).execute()
+    時間幅の開始は、今日なら現在時刻（15 分単位で切り捨て）、それ以外の日は最初の予定時刻。
+    window_minutes が 0 なら時間での絞り込みはしない（ページ分けだけ）。
+    offset は時間幅いくつ分ずらすか（0 = 現在）。offset 0 のときは、予定時刻を過ぎても
+    まだ出ていない商品のある予約も表示する。
 
+    戻り値: (このページのカード, 表示範囲の情報 dict)
+    """
+    start = end = None
+    in_window = cards
+    if window_minutes and cards:
+        window = timedelta(minutes=window_minutes)
+        now = get_now_jst()
+        if target_date == now.date():
+            base = _floor_to_window_align(now)
+        else:
+            base = _floor_to_window_align(min(c["next_due"] for c in cards))
+        start = base + window * offset
+        end = start + window
+
+        in_window = []
+        for c in cards:
+            due = c["next_due"]
+            if due < end and (due >= start or offset == 0):
+                in_window.append(c)
+
+    pages = max(1, -(-len(in_window) // page_size))
+    page = min(max(page, 0), pages - 1)
+    visible = in_window[page * page_size:(page + 1) * page_size]
+    return visible, {
+        "start": start,
+        "end": end,
+        "total": len(in_window),
+        "all": len(cards),
+        "page": page,
+        "pages": pages,
+    }
+
+
+def _reset_board_window():
+    st.session_state["board_window_offset"] = 0
+    st.session_state["board_page"] = 0
+
+
+def _move_board_window(delta: int):
+    st.session_state["board_window_offset"] = st.session_state.get("board_window_offset", 0) + delta
+    st.session_state["board_page"] = 0
+
+
+def _move_board_page(delta: int):
+    st.session_state["board_page"] = max(0, st.session_state.get("board_page", 0) + delta)
+
+
+def render_board_window_controls():
+    """時間幅・ページの切り替え。値は session_state に入れ、(時間幅, 1ページの枚数) を返す。"""
+    c1, c2, c3, c4, c5 = st.columns([1, 1, 1, 1, 1])
+    with c1:
+        window_minutes = st.selectbox(
+            "表示する時間幅",
+            BOARD_WINDOW_OPTIONS,
+            index=BOARD_WINDOW_OPTIONS.index(BOARD_WINDOW_DEFAULT),
+            format_func=lambda m: f"{m}分" if m else "すべて",
+            key="board_window_minutes",
+            on_change=_reset_board_window,
+            help="次に出す商品の予定時刻が、この時間幅に入る予約だけを表示します",
+        )
+    with c2:
+        page_size = st.selectbox(
+            "1ページの枚数",
+            BOARD_PAGE_SIZE_OPTIONS,
+            index=BOARD_PAGE_SIZE_OPTIONS.index(BOARD_PAGE_SIZE_DEFAULT),
+            key="board_page_size",
+            on_change=_reset_board_window,
+        )
+    windowed = bool(window_minutes)
+    with c3:
+        st.button("◀ 前の時間帯", on_click=_move_board_window, args=(-1,), disabled=not windowed,
+                  key="board_window_prev", use_container_width=True)
+    with c4:
+        st.button("現在", on_click=_reset_board_window, disabled=not windowed,
+                  key="board_window_now", use_container_width=True)
+    with c5:
+        st.button("次の時間帯 ▶", on_click=_move_board_window, args=(1,), disabled=not windowed,
+                  key="board_window_next", use_container_width=True)
+    return window_minutes, page_size
+
+
+def render_board_page_info(info):
+    """表示中の範囲・件数と、ページ送りのボタン。"""
+    if info["start"] is not None:
+        range_label = f"{info['start'].strftime('%H:%M')}〜{info['end'].strftime('%H:%M')}"
+        if st.session_state.get("board_window_offset", 0) == 0:
+            range_label = f"〜{info['end'].strftime('%H:%M')}（遅れている商品を含む）"
+        label = f"{range_label} に次の商品がある予約：{info['total']}件（全 {info['all']}件）"
+    else:
+        label = f"予約：{info['total']}件"
+
+    c1, c2, c3 = st.columns([4, 1, 1])
+    with c1:
+        page_label = f" / {info['page'] + 1} / {info['pages']} ページ" if info["pages"] > 1 else ""
+        st.caption(label + page_label)
+    if info["pages"] > 1:
+        with c2:
+            st.button("◀ 前のページ", on_click=_move_board_page, args=(-1,), disabled=info["page"] == 0,
+                      key="board_page_prev", use_container_width=True)
+        with c3:
+            st.button("次のページ ▶", on_click=_move_board_page, args=(1,),
+                      disabled=info["page"] >= info["pages"] - 1,
+                      key="board_page_next", use_container_width=True)
+
+
+def _on_station_change():
+    # 端末ごとにブックマークできるよう、持ち場は URL（?station=kitchen など）にも残す
+    st.query_params["station"] = st.session_state["board_station"]
+    _reset_board_window()
+
+
+def render_board_summary(target_date: date, station):
+    """ボード上部の 1 行サマリー（その日の予約・人数・メインの内訳・この持ち場の未配膳数）。"""
+    try:
+        summary = get_daily_summary(target_date)
+    except Exception as e:
+        st.caption(f"集計を取得できませんでした: {e}")
+        return
 
-def update_served(progress_id):
-    # 既存コードとの互換用ヘルパー（配膳済みにする）
-    set_served_flag(progress_id, True)
+    parts = [f"予約 {summary['reservations']}件（{summary['covers']}名・キャンセル除く）"]
+    if summary["mains"]:
+        parts.append("メイン " + "・".join(f"{name} {n}" for name, n in sorted(summary["mains"].items())))
+    parts.append(f"未配膳（{station.label}）{summary['pending_by_station'].get(station.key, 0)}品")
+    st.caption(" / ".join(parts))
 
 
 def show_board():
-    cleanup_old_data()
-
     # ---- 自動更新 ON/OFF ----
     if "auto_refresh_board" not in st.session_state:
         st.session_state["auto_refresh_board"] = True  # デフォルトON
 
+    # ---- 持ち場（初回は URL の ?station= から）----
+    if "board_station" not in st.session_state:
+        st.session_state["board_station"] = get_station(st.query_params.get("station", DEFAULT_STATION)).key
+
     col_left, col_right = st.columns([3, 1])
+    with col_left:
+        station_key = st.selectbox(
+            "持ち場",
+            list(STATIONS),
+            format_func=lambda k: STATIONS[k].label,
+            key="board_station",
+            on_change=_on_station_change,
+            help="この端末で表示する商品（作業場所・フロア）を選びます",
+        )
+        station = get_station(station_key)
     with col_right:
         st.session_state["auto_refresh_board"] = st.checkbox(
             "自動更新",
             value=st.session_state["auto_refresh_board"],
             help="1〜2秒ごとに最新の状態を反映します",
         )
-
-    if st.session_state["auto_refresh_board"]:
-        # 2000ms = 2秒ごとにスクリプトを再実行（画面はほぼそのまま）
-        st_autorefresh(interval=5000, key="board_autorefresh_counter")
+        bulk_mode = st.checkbox(
+            "まとめて操作",
+            key="board_bulk_mode",
+            help="複数の商品を選んで、まとめて調理済み・配膳済みにします",
+        )
 
     col_date, col_info = st.columns([1, 1])
     with col_date:
-        target_date = st.date_input("対象日", value=get_today_jst())
+        target_date = st.date_input("対象日", value=get_today_jst(), on_change=_reset_board_window)
     with col_info:
-        st.caption("※ 予約数が多い日は、画面下の横スクロールバーで左右に移動できます。")
+        st.caption("※ 予約数が多い日は、時間帯・ページを切り替えるか、画面下の横スクロールバーで左右に移動できます。")
 
-    reservations = fetch_reservations_for_date(target_date)
-    if not reservations:
-        st.info("該当日のコース予約はありません。")
-        return
+    window_minutes, page_size = render_board_window_controls()
 
-    # 時間 → テーブル順で並べ替え
-    def sort_key_resv(r):
-        dt = datetime.fromisoformat(r["reserved_at"])
-        table = r.get("table_no") or ""
-        table_idx = TABLE_ORDER.get(table, 999)
-        return (dt, table_idx)
-
-    reservations = sorted(reservations, key=sort_key_resv)
+    if st.session_state["auto_refresh_board"]:
+        # Realtime の変更通知があったときだけ再実行。接続できない場合は 5 秒ポーリング
+        if not watch_date(target_date, "board"):
+            st_autorefresh(interval=5000, key="board_autorefresh_counter")
+
+    # バックグラウンドの書き込みに失敗した操作（画面は次の同期で元に戻る）
+    if write_behind.ENABLED:
+        for job in write_behind.pop_failures():
+            st.error(f"{job.label}に失敗したため、元の状態に戻しました: {job.error}")
+
+    # 日付 × 持ち場のスナップショット（全セッション共通）を、変更があったときだけ差分同期する
+    # 削除の通知が来ていたら、差分では拾えないのでフル同期する
+    # 書き込みに失敗した操作があったら、それもフル同期で DB の状態に戻す
+    feed = get_change_feed()
+    snapshot = get_board_snapshot(target_date, station.key)
+    date_key = target_date.isoformat()
+    # まだ Supabase に送れていない操作（取得より先に読む）
+    pending = write_behind.pending_for(date_key) if write_behind.ENABLED else []
+    try:
+        snapshot.sync(
+            delete_version=feed.delete_version(date_key),
+            failure_count=write_behind.failure_count(date_key) if write_behind.ENABLED else 0,
+            pending=pending,
+            prefer_cached=st.session_state.pop("board_applied_local", False),
+        )
+    except Exception as e:
+        if snapshot.synced_at is None:
+            st.error(f"ボードデータの取得に失敗しました: {e}")
+        else:
+            # 取得済みのデータと、手元に記録した操作で表示を続ける
+            st.warning(f"Supabase に接続できないため、最後に取得した状態で表示しています: {e}")
 
-    # ここでコンテナの横幅を「予約数 × 300px」で決める（初期値）
-    per_card_width = 300
-    width_px = max(300, per_card_width * len(reservations))
+    if pending:
+        st.caption(f"未送信の操作：{len(pending)}件（Supabase とつながると、操作した順に送信します）")
 
-    st.markdown(f"""
-    <style>
-    .block-container {{
-        min-width: {width_px}px;
-        margin-left: 0 !important;
-        margin-right: auto !important;
-    }}
-    </style>
-    """, unsafe_allow_html=True)
+    render_board_summary(target_date, station)
 
-    # ===== ここからボード表示のための progress 集計 =====
-    reservation_ids = [r["id"] for r in reservations]
-    progress_rows = fetch_progress_for_reservations(reservation_ids)
+    # スナップショットには持ち場の条件に合う未配膳の進行と、その予約だけが入っている
+    # （絞り込みは get_board_rows の RPC 側で済んでいる）
+    # 予約は「時間 → テーブル順」、進行は予定時刻順に、スナップショット側で並べ替え済み
+    active_reservations, progress_by_res = snapshot.sorted_view()
+    if not active_reservations:
+        st.info(f"配膳待ちの商品はありません（持ち場：{station.label}）。")
+        return
 
     # item_id → item 情報（作業場所も含む）
-    item_ids = list({p["course_item_id"] for p in progress_rows})
-    item_map = fetch_items_for_ids(item_ids)
-
-    # PIZZA専用：作業場所が「ピザ」または「両方」の商品だけを対象にする
-    pizza_progress_rows = []
-    for p in progress_rows:
-        item = item_map.get(p["course_item_id"])
-        if not item:
-            continue
-        making_place = item.get("making_place")
-        if making_place in ("ピザ", "両方"):
-            pizza_progress_rows.append(p)
-
-    # 予約ごとの progress 集計（ピザ対象のみ）
-    progress_by_res = {}
-    has_unserved = set()
-
-    for p in pizza_progress_rows:
-        rid = p["reservation_id"]
-        progress_by_res.setdefault(rid, []).append(p)
-        if not p.get("is_served", False):
-            has_unserved.add(rid)
-
-    # ピザ対象の商品で「未配膳が1つでも残っている予約」だけをアクティブ表示
-    active_reservations = [
-        r for r in reservations
-        if r["id"] in has_unserved
-    ]
-
-    if not active_reservations:
-        st.info("配膳待ちのピザ商品はありません。")
+    item_map = snapshot.items
+
+    # カードのデータは全予約分作り（Python の処理だけなので軽い）、
+    # 描画するのは時間幅・ページに入った分だけにする
+    cards = build_board_cards(active_reservations, progress_by_res, item_map)
+    cards, window_info = window_board_cards(
+        cards,
+        target_date,
+        window_minutes,
+        offset=st.session_state.get("board_window_offset", 0),
+        page=st.session_state.get("board_page", 0),
+        page_size=page_size,
+    )
+    render_board_page_info(window_info)
+    if not cards:
+        st.info("この時間帯に次の商品がある予約はありません。「前の時間帯」「次の時間帯」で切り替えられます。")
         return
 
-    # アクティブ予約数に合わせて横幅を再計算（上書き）
-    width_px = max(300, per_card_width * len(active_reservations))
+    # ここでコンテナの横幅を「表示する予約数 × 300px」で決める
+    per_card_width = 300
+    width_px = max(300, per_card_width * len(cards))
     st.markdown(f"""
     <style>
     .block-container {{
@@ -289,228 +411,79 @@ def show_board():
     </style>
     """, unsafe_allow_html=True)
 
-    # 予約順に並べてカラム表示（アクティブな予約のみ）
-    cols = st.columns(len(active_reservations))
-
-    for idx, resv in enumerate(active_reservations):
-        with cols[idx]:
-            resv_id = resv["id"]
-            resv_time = datetime.fromisoformat(resv["reserved_at"])
-            items_for_res = sorted(
-                progress_by_res.get(resv_id, []),
-                key=lambda x: x["scheduled_time"],
-            )
-
-            # ===== 見出し：時間 / 名前＋人数 / テーブル =====
-            guest_name = (resv.get("guest_name") or "お名前未入力")
-            guest_count = resv.get("guest_count") or "-"
-            table_label = f"{resv.get('table_no') or '-'}"
-            st.markdown(
-                f"""
-                <div style="
-                    background-color:#f2f2f2;
-                    border-radius:10px;
-                    padding:10px 4px;
-                    text-align:center;
-                    font-weight:600;
-                    font-size:18px;
-                    margin-bottom:8px;
-                ">
-                    <div style="color:#d9534f; font-weight:700; font-size:20px;">
-                        {resv_time.strftime('%H:%M')}
-                    </div>
-                    <div>
-                        {guest_name} 様（{guest_count} 名）
-                    </div>
-                    <div style="
-                        font-weight:700;
-                        font-size:20px;
-                        margin-bottom:8px;
-                        text-align: center;
-                        color: #d9534f;
-                    ">
-                        {table_label}
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-
-            # 来店済みボタン（トグル式）
-            current_status = resv.get("status") or "reserved"
-
-            if current_status != "arrived":
-                if st.button("来店済みにする", key=f"arrived_{idx}_{resv_id}"):
-                    set_reservation_status(resv_id, "arrived")
-                    st.rerun()
-            else:
-                st.success("来店済み")
-                if st.button("来店済みを取り消す", key=f"undo_arrived_{idx}_{resv_id}"):
-                    set_reservation_status(resv_id, "reserved")
-                    st.rerun()
-
-            st.markdown("---")
-
-            if not items_for_res:
-                st.caption("※ この予約には、表示可能なピザ商品がありません。")
-                continue
-
-            # ===== 各商品の行（未配膳のものだけ） =====
-            total_items = len(items_for_res)
-
-            for row_idx, p in enumerate(items_for_res):
-                item = item_map.get(p["course_item_id"])
-                if not item:
-                    continue
-
-                sched_time = datetime.fromisoformat(p["scheduled_time"])
-                time_str = sched_time.strftime('%H:%M')
-
-                is_cooked = p.get("is_cooked", False)
-                is_served = p.get("is_served", False)  # ここは全部 False のはずだが念のため
-
-                # メイン枠なら、予約ごとのメイン料理名で上書き
-                display_name = item["item_name"]
-                if item["item_name"] == "メイン":
-                    detail = p.get("main_detail")
-                    qty = p.get("quantity", 1)
+    # カードはすべて 1 つのコンポーネントで描画する（ウィジェットは予約数によらず 1 個）
+    with span("render_board_cards"):
+        event = board_cards(
+            board_card_payload(cards), bulk_mode=bulk_mode, key=f"board_cards_{target_date.isoformat()}"
+        )
 
-                    # ★ ピザ以外のメインは表示しない
-                    if detail and ("ピザ" not in detail):
-                        continue  # ← 表示せず次のループへ
+    if event and handle_board_event(snapshot, event):
+        st.rerun()
 
-                    if detail:
-                        display_name = f"{detail}：{qty}"
-                    else:
-                        # フォールバック（旧 main_choice）
-                        main_choice = resv.get("main_choice")
-                        if main_choice:
-                            # 旧 main_choice 中に "ピザ" が含まれていなければスキップ
-                            if "ピザ" not in main_choice:
-                                continue
-                            display_name = main_choice
 
 
-                # 商品見出し：時間(赤)＋商品名
-                st.markdown(
-                    f"""
-                    <div style="margin-top:4px; margin-bottom:4px;">
-                        <div style="font-size:16px; font-weight:600;">
-                            <span style="color:#d9534f; font-weight:700; margin-right:4px;">
-                                {time_str}
-                            </span>
-                            <span>{display_name}</span>
-                        </div>
-                        <div style="font-size:16px; color:#6495ED; margin-left:2px; font-weight:bold;">
-                            テーブル：{resv.get('table_no') or '-'}
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+# ===== 調理済み・配膳済み一覧 =====
 
-                # ボタン行
-                c1, c2 = st.columns(2)
-                with c1:
-                    if not is_cooked:
-                        if st.button("調理済み", key=f"cook_{idx}_{row_idx}_{p['id']}"):
-                            set_cooked_flag(p["id"], True)
-                            st.rerun()
-                    else:
-                        st.error("調理済み")
-                        if st.button("調理済みを戻す", key=f"undo_cook_{idx}_{row_idx}_{p['id']}"):
-                            set_cooked_flag(p["id"], False)
-                            st.rerun()
-
-                with c2:
-                    if not is_served:
-                        if st.button("配膳済み", key=f"serve_{idx}_{row_idx}_{p['id']}"):
-                            update_served(p["id"])
-                            st.rerun()
-
-                # 商品と商品の間の区切り線
-                if row_idx < total_items - 1:
-                    st.markdown(
-                        "<hr style='margin:8px 0; border:none; border-top:1px solid #333333;'/>",
-                        unsafe_allow_html=True
-                    )
+# 一覧ごとの表示設定（出来事の種類は modules/timeline.py の EVENTS）
+TIMELINE_VIEWS = {
+    "cooked": {"title": "調理済み一覧", "date_label": "対象日（調理日）"},
+    # 配膳済みは「戻す」ボタンで進行ボードへ戻せる
+    "served": {
+        "title": "配膳済み一覧",
+        "date_label": "対象日（配膳日）",
+        "undo": ("配膳済みを戻す", lambda entry: set_served_flag(entry["progress"].id, False)),
+    },
+    "arrived": {"title": "来店済み一覧", "date_label": "対象日（予約日）"},
+}
 
 
+def _timeline_entry_name(event_key: str, entry, resv) -> str:
+    if entry["item"] is None:
+        return EVENTS[event_key].label
+    # メイン枠なら、予約ごとのメイン料理名で上書き（進行ボードと同じ）
+    return display_name(entry["item"], entry["progress"], resv)
 
-# ===== 調理済み・配膳済み一覧 =====
 
-def show_cooked_list():
-    cleanup_old_data()
-    st.subheader("調理済み一覧")
+def show_timeline_list(event_key: str):
+    """
+    調理済み・配膳済み・来店済み一覧の共通の描画。
+    データはその日の出来事をまとめて取った TimelineDay（プロセス共通のキャッシュ）から作るので、
+    どの一覧をどの端末で開いても、変更が無い間は DB に問い合わせない。
+    """
+    view = TIMELINE_VIEWS[event_key]
+    event = EVENTS[event_key]
+    st.subheader(view["title"])
 
-    if "auto_refresh_cooked" not in st.session_state:
-        st.session_state["auto_refresh_cooked"] = True
+    auto_key = f"auto_refresh_{event_key}"
+    if auto_key not in st.session_state:
+        st.session_state[auto_key] = True
 
     col_left, col_right = st.columns([3, 1])
     with col_right:
-        st.session_state["auto_refresh_cooked"] = st.checkbox(
+        st.session_state[auto_key] = st.checkbox(
             "自動更新",
-            value=st.session_state["auto_refresh_cooked"],
-            key="chk_auto_refresh_cooked",
+            value=st.session_state[auto_key],
+            key=f"chk_auto_refresh_{event_key}",
         )
 
-    if st.session_state["auto_refresh_cooked"]:
-        st_autorefresh(interval=5000, key="cooked_autorefresh_counter")
-
-    target_date = st.date_input("対象日（調理日）", value=get_today_jst(), key="cooked_date")
-    start_dt = datetime.combine(target_date, time(0, 0, 0))
-    end_dt = datetime.combine(target_date + timedelta(days=1), time(0, 0, 0))
-
-    # この日に「調理済み」になったものだけ取得
-    res = (
-        supabase.table("course_progress")
-        .select("*")
-        .eq("is_cooked", True)
-        .gte("cooked_at", start_dt.isoformat())
-        .lt("cooked_at", end_dt.isoformat())
-        .order("scheduled_time", desc=False)
-        .execute()
-    )
-    rows = res.data or []
-    if not rows:
-        st.info("該当日の調理済みデータはありません。")
-        return
+    target_date = st.date_input(view["date_label"], value=get_today_jst(), key=f"{event_key}_date")
 
-    # 関連する予約・商品情報を取得
-    reservation_ids = list({r["reservation_id"] for r in rows})
-    item_ids = list({r["course_item_id"] for r in rows})
+    if st.session_state[auto_key]:
+        # Realtime の変更通知があったときだけ再実行。接続できない場合は 5 秒ポーリング
+        if not watch_date(target_date, f"{event_key}_list"):
+            st_autorefresh(interval=5000, key=f"{event_key}_autorefresh_counter")
 
-    # 予約情報
-    res_resv = (
-        supabase.table("course_reservations")
-        .select("id, reserved_at, guest_name, guest_count, table_no, main_choice")
-        .in_("id", reservation_ids)
-        .execute()
-    )
-    reservations = res_resv.data or []
-    if not reservations:
-        st.info("該当する予約データがありません。")
+    try:
+        day = get_timeline(target_date)
+    except Exception as e:
+        st.error(f"{view['title']}の取得に失敗しました: {e}")
         return
 
-    # 商品マスタ
-    item_map = fetch_items_for_ids(item_ids)
-
-    # 予約ごとに progress をまとめる
-    progress_by_res = {}
-    for r in rows:
-        progress_by_res.setdefault(r["reservation_id"], []).append(r)
-
-    # 「調理済みが1つでもある予約」のみに絞る
-    reservations = [r for r in reservations if r["id"] in progress_by_res]
-
-    # 予約を「予約時間 → テーブル順」で並べ替え（進行ボードと同じ）
-    def sort_key_resv(r):
-        dt = datetime.fromisoformat(r["reserved_at"])
-        table = r.get("table_no") or ""
-        table_idx = TABLE_ORDER.get(table, 999)
-        return (dt, table_idx)
-
-    reservations = sorted(reservations, key=sort_key_resv)
+    # 予約は「予約時間 → テーブル順」（進行ボードと同じ）で並べ替え済み
+    reservations, entries_by_res = day.entries(event_key)
+    if not reservations:
+        st.info(f"該当日の{event.label}データはありません。")
+        return
 
     # 横スクロールできるように幅を調整（進行ボードと同じ考え方）
     per_card_width = 300
@@ -532,13 +505,12 @@ def show_cooked_list():
     cols = st.columns(len(reservations))
 
     for idx, resv in enumerate(reservations):
-        with cols[idx]:
-            resv_time = datetime.fromisoformat(resv["reserved_at"])
-            guest_name = (resv.get("guest_name") or "お名前未入力")
-            guest_count = resv.get("guest_count") or "-"
-            table_no = resv.get("table_no") or "-"
+        with cols[idx], span("render_card"):
+            guest_name = (resv.guest_name or "お名前未入力")
+            guest_count = resv.guest_count or "-"
+            table_no = resv.table_no or "-"
 
-            # 予約ヘッダー（時間＋名前＋人数）※来店済み表記は無し
+            # 予約ヘッダー（時間＋名前＋人数＋テーブル）※ステータス表記なし
             st.markdown(
                 f"""
                 <div style="
@@ -551,47 +523,26 @@ def show_cooked_list():
                     margin-bottom:8px;
                 ">
                     <div style="color:#d9534f; font-weight:700; font-size:20px;">
-                        {resv_time.strftime('%H:%M')}
+                        {resv.time_label}
                     </div>
                     <div>
                         {guest_name} 様（{guest_count} 名）
                     </div>
                     <div style="font-size:20px; color:#d9534f; margin-left:2px; font-weight:bold;">
-                        {resv.get('table_no') or '-'}
+                        {table_no}
                     </div>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-            items_for_res = sorted(
-                progress_by_res.get(resv["id"], []),
-                key=lambda x: x["scheduled_time"],
-            )
-            if not items_for_res:
-                st.caption("※ この予約の調理済み商品はありません。")
-                continue
-
-            total_items = len(items_for_res)
-
-            # この予約で「調理済み」になっている商品だけを表示
-            for row_idx, p in enumerate(items_for_res):
-                item = item_map.get(p["course_item_id"])
-                if not item:
-                    continue
-
-                cooked_at = parse_dt(p["cooked_at"])
-                cooked_at_jst = to_jst(cooked_at)
-
-                # メイン枠なら、予約ごとのメイン料理名で上書き
-                display_name = item["item_name"]
-                if item["item_name"] == "メイン":
-                    main_choice = resv.get("main_choice")
-                    if main_choice:
-                        display_name = main_choice
+            entries = entries_by_res[resv.id]
+            total_items = len(entries)
 
-                # 安全のため None チェック
-                time_label = cooked_at_jst.strftime('%H:%M') if cooked_at_jst else "--:--"
+            for row_idx, entry in enumerate(entries):
+                # 時刻は読み込み時に JST にそろえてある（modules/models.py）。安全のため None チェック
+                time_label = entry["at"].strftime('%H:%M') if entry["at"] else "--:--"
+                display_name = _timeline_entry_name(event_key, entry, resv)
 
                 st.markdown(
                     f"""
@@ -607,6 +558,13 @@ def show_cooked_list():
                     unsafe_allow_html=True
                 )
 
+                # 「〜を戻す」ボタン（→ 進行ボードへ戻す）
+                if view.get("undo"):
+                    undo_label, undo = view["undo"]
+                    if st.button(undo_label, key=f"undo_{event_key}_{idx}_{row_idx}_{entry['progress'].id}"):
+                        undo(entry)
+                        invalidate_timeline(target_date)
+                        st.rerun()
 
                 # 区切り線
                 if row_idx < total_items - 1:
@@ -616,185 +574,13 @@ def show_cooked_list():
                     )
 
 
-def show_served_list():
-    cleanup_old_data()
-    st.subheader("配膳済み一覧")
-
-    if "auto_refresh_cooked" not in st.session_state:
-        st.session_state["auto_refresh_cooked"] = True
-
-    col_left, col_right = st.columns([3, 1])
-    with col_right:
-        st.session_state["auto_refresh_cooked"] = st.checkbox(
-            "自動更新",
-            value=st.session_state["auto_refresh_cooked"],
-            key="chk_auto_refresh_cooked",
-        )
-
-    if st.session_state["auto_refresh_cooked"]:
-        st_autorefresh(interval=5000, key="cooked_autorefresh_counter")
-
-    target_date = st.date_input("対象日（配膳日）", value=get_today_jst(), key="served_date")
-    start_dt = datetime.combine(target_date, time(0, 0, 0))
-    end_dt = datetime.combine(target_date + timedelta(days=1), time(0, 0, 0))
-
-    # この日に「配膳済み」になったものだけ取得
-    res = (
-        supabase.table("course_progress")
-        .select("*")
-        .eq("is_served", True)
-        .gte("served_at", start_dt.isoformat())
-        .lt("served_at", end_dt.isoformat())
-        .order("scheduled_time", desc=False)
-        .execute()
-    )
-    rows = res.data or []
-    if not rows:
-        st.info("該当日の配膳済みデータはありません。")
-        return
-
-    # 関連する予約・商品情報を取得
-    reservation_ids = list({r["reservation_id"] for r in rows})
-    item_ids = list({r["course_item_id"] for r in rows})
-
-    # 予約情報
-    res_resv = (
-        supabase.table("course_reservations")
-        .select("id, reserved_at, guest_name, guest_count, table_no, main_choice")
-        .in_("id", reservation_ids)
-        .execute()
-    )
-    reservations = res_resv.data or []
-    if not reservations:
-        st.info("該当する予約データがありません。")
-        return
-
-    # 商品マスタ
-    item_map = fetch_items_for_ids(item_ids)
-
-    # 予約ごとに progress をまとめる
-    progress_by_res = {}
-    for r in rows:
-        progress_by_res.setdefault(r["reservation_id"], []).append(r)
-
-    # 「配膳済みが1つでもある予約」のみに絞る
-    reservations = [r for r in reservations if r["id"] in progress_by_res]
-
-    # 予約を「予約時間 → テーブル順」で並べ替え（進行ボードと同じ）
-    def sort_key_resv(r):
-        dt = datetime.fromisoformat(r["reserved_at"])
-        table = r.get("table_no") or ""
-        table_idx = TABLE_ORDER.get(table, 999)
-        return (dt, table_idx)
-
-    reservations = sorted(reservations, key=sort_key_resv)
-
-    # 横スクロールできるように幅を調整（進行ボードと同じ考え方）
-    per_card_width = 300
-    width_px = max(300, per_card_width * len(reservations))
-    st.markdown(
-        f"""
-        <style>
-        .block-container {{
-            min-width: {width_px}px;
-            margin-left: 0 !important;
-            margin-right: auto !important;
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    # 予約単位でカラムを作成（左から順番に並ぶ）
-    cols = st.columns(len(reservations))
-
-    for idx, resv in enumerate(reservations):
-        with cols[idx]:
-            resv_time = datetime.fromisoformat(resv["reserved_at"])
-            guest_name = (resv.get("guest_name") or "お名前未入力")
-            guest_count = resv.get("guest_count") or "-"
-            table_no = resv.get("table_no") or "-"
-
-            # 予約ヘッダー（時間＋名前＋人数＋テーブル）※ステータス表記なし
-            st.markdown(
-                f"""
-                <div style="
-                    background-color:#f2f2f2;
-                    border-radius:10px;
-                    padding:10px 4px;
-                    text-align:center;
-                    font-weight:600;
-                    font-size:18px;
-                    margin-bottom:8px;
-                ">
-                    <div style="color:#d9534f; font-weight:700; font-size:20px;">
-                        {resv_time.strftime('%H:%M')}
-                    </div>
-                    <div>
-                        {guest_name} 様（{guest_count} 名）
-                    </div>
-                    <div style="font-size:20px; color:#d9534f; margin-left:2px; font-weight:bold;">
-                        {table_no}
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-
-            items_for_res = sorted(
-                progress_by_res.get(resv["id"], []),
-                key=lambda x: x["scheduled_time"],
-            )
-            if not items_for_res:
-                st.caption("※ この予約の配膳済み商品はありません。")
-                continue
-
-            total_items = len(items_for_res)
-
-            # この予約で「配膳済み」になっている商品だけを表示
-            for row_idx, p in enumerate(items_for_res):
-                item = item_map.get(p["course_item_id"])
-                if not item:
-                    continue
-
-                served_at = parse_dt(p["served_at"])
-                served_at_jst = to_jst(served_at)
-
-                # メイン枠なら、予約ごとのメイン料理名で上書き
-                display_name = item["item_name"]
-                if item["item_name"] == "メイン":
-                    main_choice = resv.get("main_choice")
-                    if main_choice:
-                        display_name = main_choice
+def show_cooked_list():
+    show_timeline_list("cooked")
 
-                time_label = served_at_jst.strftime('%H:%M') if served_at_jst else "--:--"
-
-                st.markdown(
-                    f"""
-                    <div style="margin-top:4px; margin-bottom:4px;">
-                        <div style="font-size:16px; font-weight:600;">
-                            <span style="color:#d9534f; font-weight:700; margin-right:4px;">
-                                {time_label}
-                            </span>
-                            <span>{display_name}</span>
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
 
+def show_served_list():
+    show_timeline_list("served")
 
-                # ★ここで「配膳済みを戻す」ボタン（→ 進行ボードへ戻す）
-                if st.button(
-                    "配膳済みを戻す",
-                    key=f"undo_served_{idx}_{row_idx}_{p['id']}",
-                ):
-                    set_served_flag(p["id"], False)
-                    st.rerun()
 
-                # 区切り線
-                if row_idx < total_items - 1:
-                    st.markdown(
-                        "<hr style='margin:8px 0; border:none; border-top:1px solid #333333;'/>",
-                        unsafe_allow_html=True
-                    )
+def show_arrived_list():
+    show_timeline_list("arrived")
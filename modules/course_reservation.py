@@ -1,11 +1,16 @@
 # modules/course_reservation.py
 
+import csv
+import io
 import streamlit as st
 from datetime import datetime, date, time, timedelta
-from collections import Counter
-from .supabase_client import supabase
+from .repository import repos
 from typing import Optional
 from .time_utils import get_today_jst
+from .catalog_cache import get_catalog, has_main_for_courses
+from .daily_summary import get_daily_summary
+from .instrumentation import span, traced
+from .occupancy import OccupancyIndex, get_occupancy
 
 # テーブル番号の選択肢
 TABLE_OPTIONS = [
@@ -71,37 +76,12 @@ def counts_to_main_choice(counts) -> Optional[str]:
 
 
 def course_has_main_item(course_id: str) -> bool:
-    res = (
-        supabase.table("course_items")
-        .select("id, item_name")
-        .eq("course_id", course_id)
-        .execute()
-    )
-    rows = res.data or []
-    return any(r["item_name"] == "メイン" for r in rows)
+    return get_catalog().has_main(course_id)
 
 
 def fetch_courses():
     # 予約で選べるのは「有効なコース」のみにする
-    res = (
-        supabase.table("course_master")
-        .select("*")
-        .eq("is_active", True)
-        .order("created_at", desc=False)
-        .execute()
-    )
-    return res.data or []
-
-
-def fetch_course_items(course_id):
-    res = (
-        supabase.table("course_items")
-        .select("id, display_order, offset_minutes, item_name")
-        .eq("course_id", course_id)
-        .order("display_order", desc=False)
-        .execute()
-    )
-    return res.data or []
+    return get_catalog().active_courses()
 
 
 # 予約時間の選択肢（固定）
@@ -116,51 +96,46 @@ TIME_CONFLICT_RULES = {
 }
 
 
-def is_slot_conflicted(reserved_at: datetime, table_no: str, exclude_reservation_id: str = None) -> bool:
-    """
-    指定された reserved_at / table_no の組み合わせが予約ルール違反かどうかを判定する。
-
-    ルール:
-      - 同じテーブルに18:00の予約がある → 18:00, 18:30 はNG
-      - 同じテーブルに18:30の予約がある → 18:00, 18:30, 20:30 はNG
-      - 同じテーブルに20:30の予約がある → 18:30, 20:30, 21:00 はNG
-      - 同じテーブルに21:00の予約がある → 20:30, 21:00 はNG
-
-    status = 'cancelled' は空きとみなす。
-    exclude_reservation_id が指定されている場合、その予約IDは除外して判定。
-    """
-    # 対象日の0:00〜24:00の範囲で、そのテーブルの予約を取得
-    target_date = reserved_at.date()
-    start_dt = datetime.combine(target_date, time(0, 0, 0))
-    end_dt = start_dt + timedelta(days=1)
-
-    target_time_str = reserved_at.strftime("%H:%M")
-    conflict_times = TIME_CONFLICT_RULES.get(target_time_str, {target_time_str})
-
-    query = (
-        supabase.table("course_reservations")
-        .select("id, reserved_at, status")
-        .gte("reserved_at", start_dt.isoformat())
-        .lt("reserved_at", end_dt.isoformat())
-        .eq("table_no", table_no)
-        .neq("status", "cancelled")
-    )
-    if exclude_reservation_id:
-        query = query.neq("id", exclude_reservation_id)
+@traced()
+def get_occupancy_for(target_date: date):
+    """この画面のテーブル・時間帯・バッティングルールで作った、指定日の空き状況索引。"""
+    return get_occupancy(target_date, TABLE_OPTIONS, TIME_OPTIONS, TIME_CONFLICT_RULES)
 
-    res = query.execute()
-    rows = res.data or []
 
-    for row in rows:
-        existing_time_str = datetime.fromisoformat(row["reserved_at"]).strftime("%H:%M")
-        # 既存予約の時間が、この時間帯のNGリストに含まれていればバッティング
-        if existing_time_str in conflict_times:
-            return True
+def render_availability_grid(target_date: date, selected_time: str = None):
+    """テーブル × 時間帯の空き状況を表にする（予約済み=赤、入れられない=グレー）。"""
+    occupancy = get_occupancy_for(target_date)
+    cell_style = {
+        "occupied": "background:#f8d7da; color:#842029;",
+        "blocked": "background:#e0e0e0; color:#888888;",
+        "free": "background:#ffffff; color:#198754;",
+    }
+    cell_label = {"occupied": "予約", "blocked": "×", "free": "○"}
 
-    return False
+    header = "".join(
+        f"<th style='padding:2px 8px; {'color:#d9534f;' if t == selected_time else ''}'>{t}</th>"
+        for t in TIME_OPTIONS
+    )
+    body = []
+    for table_no, cells in occupancy.grid(TIME_OPTIONS):
+        tds = "".join(
+            f"<td style='text-align:center; padding:2px 8px; {cell_style[c]}'>{cell_label[c]}</td>"
+            for c in cells
+        )
+        body.append(f"<tr><th style='padding:2px 8px; text-align:left;'>{table_no}</th>{tds}</tr>")
 
+    st.markdown(
+        f"""
+        <table style="border-collapse:collapse; font-size:13px;">
+            <tr><th></th>{header}</tr>
+            {''.join(body)}
+        </table>
+        """,
+        unsafe_allow_html=True,
+    )
 
 
+@traced()
 def create_reservation_and_progress(
     course_id,
     reserved_at,
@@ -171,11 +146,8 @@ def create_reservation_and_progress(
     main_choice=None,
     main_detail_counts=None,  # ★ 追加: {"パスタ": 1, "ピザ": 1} みたいな dict
 ):
-    # 1. 同じ時間・同じテーブルに予約がないか確認
-    if is_slot_conflicted(reserved_at, table_no):
-        return False, "この時間帯は同じテーブルに別の予約が入っているため、登録できません。"
-
-    # 2. 予約を登録
+    # バッティングの確認・予約の登録・コース進行の作成は、DB 側で 1 トランザクションにまとめて行う
+    # （sql/008_create_reservation_with_progress.sql。途中で失敗しても予約だけが残ることはない）
     reservation_data = {
         "course_id": course_id,
         "reserved_at": reserved_at.isoformat(),
@@ -186,75 +158,316 @@ def create_reservation_and_progress(
         "note": note or None,
         "main_choice": main_choice,
     }
+    time_str = reserved_at.strftime("%H:%M")
+    conflict_times = TIME_CONFLICT_RULES.get(time_str, {time_str})
     try:
-        res = supabase.table("course_reservations").insert(reservation_data).execute()
-        reservation = res.data[0]
-        reservation_id = reservation["id"]
+        result = repos().reservations.create_with_progress(reservation_data, conflict_times, main_detail_counts)
     except Exception as e:
         return False, f"予約登録に失敗しました: {e}"
 
-    # 3. コースアイテム取得
-    items = fetch_course_items(course_id)
-    if not items:
+    if result.get("conflict"):
+        return False, "この時間帯は同じテーブルに別の予約が入っているため、登録できません。"
+
+    get_occupancy_for(reserved_at.date()).add(result["reservation"])
+
+    if not result.get("progress_count"):
         # 予約は作れたが、コースに商品が無い場合
         return True, "予約は登録しましたが、このコースには商品が登録されていません。"
 
-    # 4. course_progress をまとめて作成
-    progress_rows = []
-    for item in items:
-        scheduled_time = reserved_at + timedelta(minutes=int(item["offset_minutes"]))
-
-        if item["item_name"] == "メイン" and main_detail_counts:
-            # ★ メインは種類ごとに別レコードで作成
-            for name, cnt in main_detail_counts.items():
-                if cnt <= 0:
-                    continue
-                progress_rows.append(
-                    {
-                        "reservation_id": reservation_id,
-                        "course_item_id": item["id"],
-                        "scheduled_time": scheduled_time.isoformat(),
-                        "is_cooked": False,
-                        "is_served": False,
-                        "main_detail": name,       # パスタ / ピザ
-                        "quantity": int(cnt),      # 皿数
-                    }
-                )
-        else:
-            # メイン以外は従来どおり 1レコード
-            progress_rows.append(
-                {
-                    "reservation_id": reservation_id,
-                    "course_item_id": item["id"],
-                    "scheduled_time": scheduled_time.isoformat(),
-                    "is_cooked": False,
-                    "is_served": False,
-                    "quantity": 1,              # 新カラム（デフォルト1）
-                }
-            )
+    return True, "予約とコース進行を登録しました。"
+
+
+
+# ==========================================================
+# CSV 一括取り込み（団体・イベント予約）
+# ==========================================================
+
+# CSV の列（メイン・メモは省略可）
+IMPORT_COLUMNS = ["予約日", "時間", "お名前", "人数", "テーブル", "コース", "メイン", "メモ"]
+IMPORT_REQUIRED_COLUMNS = ["予約日", "時間", "お名前", "人数", "テーブル", "コース"]
+
+# 1回の insert で登録する予約の件数
+IMPORT_BATCH_SIZE = 200
+
+
+def _decode_csv(data: bytes) -> str:
+    # Excel で保存した CSV は Shift_JIS のことが多いので、UTF-8 でなければそちらで読む
+    for encoding in ("utf-8-sig", "cp932"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("文字コードを判別できませんでした。UTF-8 か Shift_JIS で保存してください。")
+
+
+def _parse_import_date(value: str) -> date:
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"予約日「{value}」を読み取れません（例: 2025-01-31）")
+
 
+def _parse_import_time(value: str) -> str:
     try:
-        supabase.table("course_progress").insert(progress_rows).execute()
-    except Exception as e:
-        return False, f"予約は登録しましたが、進行テーブルの作成に失敗しました: {e}"
+        time_str = datetime.strptime(value, "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ValueError(f"時間「{value}」を読み取れません（例: 18:00）")
+    if time_str not in TIME_OPTIONS:
+        raise ValueError(f"時間「{value}」は予約できる時間帯ではありません（{' / '.join(TIME_OPTIONS)}）")
+    return time_str
 
-    return True, "予約とコース進行を登録しました。"
 
+def import_template_csv() -> bytes:
+    """取り込み用 CSV のひな形（Excel で開けるよう BOM 付き UTF-8）。"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(IMPORT_COLUMNS)
+    writer.writerow(["2025-01-31", "18:00", "山田", "4", "1-T1", "", "パスタ：2、ピザ：2", ""])
+    return buf.getvalue().encode("utf-8-sig")
+
+
+@traced()
+def parse_reservation_csv(data: bytes):
+    """
+    CSV を読み、1 回の走査で全行を検証する（DB への書き込みはしない）。
+
+    バッティングは、既存の予約は日付ごとの空き状況索引で、
+    ファイル内の行どうしは同じ形の一時索引で判定する。
+
+    戻り値: (valid_rows, errors)
+      valid_rows: 登録できる行（import_reservations にそのまま渡す）
+      errors:     [{"行": 行番号, "内容": エラー内容}, ...]
+    """
+    try:
+        reader = csv.DictReader(io.StringIO(_decode_csv(data)))
+        header = [h.strip() for h in (reader.fieldnames or [])]
+    except (ValueError, csv.Error) as e:
+        return [], [{"行": 1, "内容": str(e)}]
+
+    missing = [c for c in IMPORT_REQUIRED_COLUMNS if c not in header]
+    if missing:
+        return [], [{"行": 1, "内容": f"列が足りません: {'、'.join(missing)}"}]
+    reader.fieldnames = header
+
+    courses_by_name = {c["name"]: c for c in fetch_courses()}
+    occupancy_by_date = {}  # date -> (既存の予約の索引, ファイル内の行の索引)
+
+    valid_rows = []
+    errors = []
+    for raw in reader:
+        line = reader.line_num
+        row = {k: (v or "").strip() for k, v in raw.items() if k is not None}
+        if not any(row.values()):
+            continue  # 空行
+
+        problems = []
+        reserved_at = None
+        try:
+            reserved_at = datetime.combine(
+                _parse_import_date(row["予約日"]),
+                datetime.strptime(_parse_import_time(row["時間"]), "%H:%M").time(),
+            )
+        except ValueError as e:
+            problems.append(str(e))
+
+        guest_name = row["お名前"]
+        if not guest_name:
+            problems.append("お名前が空です")
+
+        guest_count = None
+        try:
+            guest_count = int(row["人数"])
+            if not 1 <= guest_count <= 20:
+                raise ValueError
+        except ValueError:
+            problems.append(f"人数「{row['人数']}」は 1〜20 の数字で入力してください")
+            guest_count = None
+
+        table_no = row["テーブル"]
+        if table_no not in TABLE_ORDER:
+            problems.append(f"テーブル「{table_no}」は存在しません")
+
+        course = courses_by_name.get(row["コース"])
+        if course is None:
+            problems.append(f"コース「{row['コース']}」は有効なコースにありません")
+
+        # メインがあるコースは、フォームと同じく内訳の合計＝人数を必須にする
+        main_counts = None
+        main_choice = None
+        if course is not None and course_has_main_item(course["id"]):
+            main_counts = parse_main_choice_to_counts(row.get("メイン"))
+            main_choice = counts_to_main_choice(main_counts)
+            if guest_count is not None and sum(main_counts.values()) != guest_count:
+                problems.append(
+                    f"メイン料理の人数合計（{sum(main_counts.values())}名）が"
+                    f"人数（{guest_count}名）と一致していません"
+                )
+
+        if not problems:
+            time_str = reserved_at.strftime("%H:%M")
+            target_date = reserved_at.date()
+            if target_date not in occupancy_by_date:
+                staged = OccupancyIndex(target_date, TABLE_OPTIONS, TIME_OPTIONS, TIME_CONFLICT_RULES)
+                staged.load([])
+                occupancy_by_date[target_date] = (get_occupancy_for(target_date), staged)
+            existing, staged = occupancy_by_date[target_date]
+
+            if existing.is_conflicted(table_no, time_str):
+                problems.append("この時間帯は同じテーブルに別の予約が入っています")
+            elif staged.is_conflicted(table_no, time_str):
+                problems.append("ファイル内の別の行と同じテーブル・時間帯が重なっています")
+            else:
+                staged.add({
+                    "id": f"csv-{line}",
+                    "reserved_at": reserved_at.isoformat(),
+                    "table_no": table_no,
+                    "status": "reserved",
+                })
+
+        if problems:
+            errors.append({"行": line, "内容": " / ".join(problems)})
+            continue
+
+        valid_rows.append({
+            "line": line,
+            "course_id": course["id"],
+            "course_name": course["name"],
+            "reserved_at": reserved_at,
+            "guest_name": guest_name,
+            "guest_count": guest_count,
+            "table_no": table_no,
+            "note": row.get("メモ") or None,
+            "main_choice": main_choice,
+            "main_counts": main_counts,
+        })
+
+    return valid_rows, errors
+
+
+@traced()
+def import_reservations(valid_rows, batch_size: int = IMPORT_BATCH_SIZE):
+    """
+    parse_reservation_csv で検証済みの行を、batch_size 件ごとに
+    import_reservations_with_progress RPC（sql/011）1 回で登録する。
+
+    バッティングの確認は DB 側で、テーブル・日のロックを取ったうえで行ごとに行う
+    （検証してから登録ボタンが押されるまでに別の端末で入った予約とも重ならない）。
+    バッチの途中で失敗したときは、そのバッチは 1 件も登録されない。
+
+    戻り値: (登録した件数, errors)
+    """
+    created = 0
+    errors = []
+
+    for start in range(0, len(valid_rows), batch_size):
+        chunk = valid_rows[start:start + batch_size]
+
+        batch = []
+        for row in chunk:
+            time_str = row["reserved_at"].strftime("%H:%M")
+            reservation_data = {
+                "course_id": row["course_id"],
+                "reserved_at": row["reserved_at"].isoformat(),
+                "guest_name": row["guest_name"],
+                "guest_count": row["guest_count"],
+                "table_no": row["table_no"],
+                "status": "reserved",
+                "note": row["note"],
+                "main_choice": row["main_choice"],
+            }
+            batch.append((reservation_data, TIME_CONFLICT_RULES.get(time_str, {time_str}), row["main_counts"]))
+
+        try:
+            results = repos().reservations.import_with_progress(batch)
+        except Exception as e:
+            errors.extend({"行": row["line"], "内容": f"予約登録に失敗しました（登録していません）: {e}"} for row in chunk)
+            continue
+
+        for row, result in zip(chunk, results):
+            if result.get("conflict"):
+                errors.append({"行": row["line"], "内容": "この時間帯は同じテーブルに別の予約が入っています"})
+                continue
+            reservation = result["reservation"]
+            get_occupancy_for(datetime.fromisoformat(reservation["reserved_at"]).date()).add(reservation)
+            created += 1
+
+    errors.sort(key=lambda e: e["行"])
+    return created, errors
+
+
+def render_bulk_import():
+    """CSV 一括取り込みの画面（アップロード → 検証結果の確認 → まとめて登録）。"""
+    result = st.session_state.pop("bulk_import_result", None)
+    if result:
+        st.success(f"{result['created']}件の予約を登録しました。")
+        if result["errors"]:
+            st.warning(f"{len(result['errors'])}件は登録できませんでした。")
+            st.dataframe(result["errors"], hide_index=True, use_container_width=True)
+
+    st.caption(
+        "列: " + " / ".join(IMPORT_COLUMNS)
+        + "（メインは「パスタ：2、ピザ：1」の形式。メイン・メモは省略可）"
+    )
+    st.download_button(
+        "ひな形 CSV をダウンロード",
+        data=import_template_csv(),
+        file_name="reservations_template.csv",
+        mime="text/csv",
+    )
+
+    # 登録が終わったら key を変えてアップロード欄を空にする
+    import_version = st.session_state.get("bulk_import_version", 0)
+    uploaded = st.file_uploader(
+        "予約 CSV ファイル",
+        type=["csv"],
+        key=f"bulk_import_file_v{import_version}",
+    )
+    if uploaded is None:
+        return
+
+    valid_rows, errors = parse_reservation_csv(uploaded.getvalue())
+
+    st.markdown(f"登録できる行：**{len(valid_rows)}件** / エラー：**{len(errors)}件**")
+    if errors:
+        st.warning("エラーのある行は登録されません。CSV を直して再度アップロードすることもできます。")
+        st.dataframe(errors, hide_index=True, use_container_width=True)
+
+    if not valid_rows:
+        return
+
+    st.dataframe(
+        [
+            {
+                "行": row["line"],
+                "予約日時": row["reserved_at"].strftime("%Y-%m-%d %H:%M"),
+                "お名前": row["guest_name"],
+                "人数": row["guest_count"],
+                "テーブル": row["table_no"],
+                "コース": row["course_name"],
+                "メイン": row["main_choice"] or "",
+            }
+            for row in valid_rows
+        ],
+        hide_index=True,
+        use_container_width=True,
+    )
 
+    if st.button(f"エラーのない {len(valid_rows)} 件を登録", key=f"bulk_import_submit_v{import_version}"):
+        with st.spinner("登録しています..."):
+            created, import_errors = import_reservations(valid_rows)
+        st.session_state["bulk_import_result"] = {"created": created, "errors": import_errors}
+        st.session_state["bulk_import_version"] = import_version + 1
+        st.rerun()
 
+
+@traced()
 def fetch_reservations_for_date(target_date: date):
-    start_dt = datetime.combine(target_date, time(0, 0, 0))
-    end_dt = datetime.combine(target_date + timedelta(days=1), time(0, 0, 0))
-
-    res = (
-        supabase.table("course_reservations")
-        .select("id, reserved_at, guest_name, guest_count, table_no, status, note, course_id, main_choice")
-        .gte("reserved_at", start_dt.isoformat())
-        .lt("reserved_at", end_dt.isoformat())
-        .order("reserved_at", desc=False)  # 時間でざっくりソート
-        .execute()
+    rows = repos().reservations.list_for_date(
+        target_date,
+        columns="id, reserved_at, guest_name, guest_count, table_no, status, note, course_id, main_choice",
     )
-    rows = res.data or []
 
     # 時間 → テーブル順に並べ替え（Python側）
     def sort_key(r):
@@ -268,6 +481,7 @@ def fetch_reservations_for_date(target_date: date):
 
 
 
+@traced()
 def update_reservation_basic(
     reservation_id: str,
     guest_name: str,
@@ -281,12 +495,10 @@ def update_reservation_basic(
     """
     予約の基本情報を更新（コースと日時は今回は編集対象外）。
     同じ時間×テーブルの重複チェックも行う。
-    メイン人数が変更された場合は、メインの商品進行も作り直す。
+    メイン人数が変更された場合は、メインの商品進行を差分だけ更新する
+    （皿数は上書き・増えた内訳は追加・無くなった内訳は削除。調理済みなどの状態は残る）。
+    ここまでを DB 側で 1 トランザクションにまとめて行う（sql/009_update_reservation_with_mains.sql）。
     """
-    # 同じ時間・テーブルの重複チェック（自分自身は除外）
-    if is_slot_conflicted(reserved_at, table_no, exclude_reservation_id=reservation_id):
-        return False, "この時間帯は同じテーブルに別の予約が入っているため、変更できません。"
-
     update_data = {
         "guest_name": guest_name,
         "guest_count": guest_count,
@@ -295,70 +507,22 @@ def update_reservation_basic(
         "note": note or None,
         "main_choice": main_choice,
     }
+    time_str = reserved_at.strftime("%H:%M")
+    conflict_times = TIME_CONFLICT_RULES.get(time_str, {time_str})
+    main_counts = parse_main_choice_to_counts(main_choice) if main_choice else {}
 
     try:
-        supabase.table("course_reservations").update(update_data).eq("id", reservation_id).execute()
+        result = repos().reservations.update_with_mains(reservation_id, update_data, conflict_times, main_counts)
     except Exception as e:
         return False, f"予約情報の更新に失敗しました: {e}"
 
-    # ★ メインの内訳を course_progress にも反映
-    try:
-        # この予約の course_id を取得
-        res = (
-            supabase.table("course_reservations")
-            .select("course_id")
-            .eq("id", reservation_id)
-            .single()
-            .execute()
-        )
-        course_id = res.data["course_id"]
-
-        if course_has_main_item(course_id):
-            # メイン用の course_item 一覧
-            res_items = (
-                supabase.table("course_items")
-                .select("id, offset_minutes, item_name")
-                .eq("course_id", course_id)
-                .eq("item_name", "メイン")
-                .execute()
-            )
-            main_items = res_items.data or []
-            main_item_ids = [i["id"] for i in main_items]
-
-            if main_item_ids:
-                # 既存のメイン progress を削除
-                supabase.table("course_progress").delete() \
-                    .eq("reservation_id", reservation_id) \
-                    .in_("course_item_id", main_item_ids) \
-                    .execute()
-
-                # main_choice から人数 dict を再生成
-                counts = parse_main_choice_to_counts(main_choice) if main_choice else {}
-
-                if counts:
-                    progress_rows = []
-                    for item in main_items:
-                        scheduled_time = reserved_at + timedelta(minutes=int(item["offset_minutes"]))
-                        for name, cnt in counts.items():
-                            if cnt <= 0:
-                                continue
-                            progress_rows.append(
-                                {
-                                    "reservation_id": reservation_id,
-                                    "course_item_id": item["id"],
-                                    "scheduled_time": scheduled_time.isoformat(),
-                                    "is_cooked": False,
-                                    "is_served": False,
-                                    "main_detail": name,
-                                    "quantity": int(cnt),
-                                }
-                            )
-                    if progress_rows:
-                        supabase.table("course_progress").insert(progress_rows).execute()
+    if result.get("conflict"):
+        return False, "この時間帯は同じテーブルに別の予約が入っているため、変更できません。"
+    if result.get("reservation") is None:
+        return False, "予約が見つかりませんでした（削除された可能性があります）。"
 
-    except Exception as e:
-        # 予約自体は更新できているので、ここは警告に留める
-        st.warning(f"メイン料理の進行データ更新に失敗しました: {e}")
+    # テーブル変更・キャンセルを索引にも反映
+    get_occupancy_for(reserved_at.date()).update(result["reservation"])
 
     return True, "予約情報を更新しました。"
 
@@ -372,7 +536,9 @@ def delete_reservation(reservation_id: str):
     ここではとりあえず reservations からの削除を試みる。
     """
     try:
-        supabase.table("course_reservations").delete().eq("id", reservation_id).execute()
+        deleted = repos().reservations.delete(reservation_id)
+        for r in deleted:
+            get_occupancy_for(datetime.fromisoformat(r["reserved_at"]).date()).remove(reservation_id)
         return True, "予約を削除しました。"
     except Exception as e:
         return False, f"予約の削除に失敗しました: {e}"
@@ -401,6 +567,28 @@ def show():
 
     form_key_suffix = f"_v{form_version}"
 
+    # 予約日・時間はフォームの外に出し、選び直したらすぐ空き状況に反映されるようにする
+    col_date, col_time = st.columns(2)
+    with col_date:
+        date_input_val = st.date_input(
+            "予約日",
+            value=get_today_jst(),
+            key=f"reservation_date{form_key_suffix}",
+        )
+    with col_time:
+        time_str = st.selectbox(
+            "予約時間",
+            TIME_OPTIONS,
+            key=f"reservation_time{form_key_suffix}",
+        )
+    time_input_val = datetime.strptime(time_str, "%H:%M").time()
+
+    # この日時に入れられないテーブル（索引から判定するのでクエリは発生しない）
+    blocked_tables = get_occupancy_for(date_input_val).blocked_tables(time_str)
+
+    with st.expander(f"空き状況（{date_input_val.strftime('%m/%d')}）"):
+        render_availability_grid(date_input_val, selected_time=time_str)
+
     # エラー時は入力を残したいので clear_on_submit=False
     with st.form(f"reservation_form{form_key_suffix}", clear_on_submit=False):
         col1, col2 = st.columns(2)
@@ -438,23 +626,12 @@ def show():
                 "テーブル番号（必須）",
                 options=table_select_options,
                 index=0,
+                # 選んだ日時に入れられないテーブルは「予約不可」と表示する
+                format_func=lambda t: f"{t}（予約不可）" if t in blocked_tables else t,
                 key=f"table_no_input{form_key_suffix}",
             )
 
         with col2:
-            date_input_val = st.date_input(
-                "予約日",
-                value=get_today_jst(),
-                key=f"reservation_date{form_key_suffix}",
-            )
-
-            time_str = st.selectbox(
-                "予約時間",
-                TIME_OPTIONS,
-                key=f"reservation_time{form_key_suffix}",
-            )
-            time_input_val = datetime.strptime(time_str, "%H:%M").time()
-
             note = st.text_area(
                 "メモ（任意）",
                 key=f"reservation_note{form_key_suffix}",
@@ -528,6 +705,15 @@ def show():
 
 
 
+    # ======================
+    # CSV 一括取り込み
+    # ======================
+    with st.expander(
+        "CSV から一括登録（団体・イベント予約）",
+        expanded="bulk_import_result" in st.session_state,
+    ):
+        render_bulk_import()
+
     # ======================
     # 予約一覧（任意の日付）＋ 編集・削除
     # ======================
@@ -545,190 +731,227 @@ def show():
 
     # -------------------------
     # 予約件数 + 時間帯別件数 + コース別件数
+    # （件数は変更のたびに差分で更新している集計から読む。modules/daily_summary.py）
     # -------------------------
-    total_count = len(reservations)
-
-    # 時間帯ごとにカウント
-    time_counter = Counter()
-    for r in reservations:
-        dt = datetime.fromisoformat(r["reserved_at"])
-        time_str = dt.strftime("%H:%M")
-        if time_str in TIME_OPTIONS:
-            time_counter[time_str] += 1
+    summary = get_daily_summary(list_date)
 
-    # メイン表示（総件数）
+    # メイン表示（キャンセルを除いた件数。以前の表示と同じキャンセル込みの件数も並べる）
     st.markdown(
-        f"#### {list_date.strftime('%Y/%m/%d')} の予約件数：**{total_count}件**"
+        f"#### {list_date.strftime('%Y/%m/%d')} の予約件数（キャンセル除く）：**{summary['reservations']}件**"
+        f"（{summary['covers']}名）"
     )
+    if summary["cancelled"]:
+        st.caption(
+            f"キャンセル：{summary['cancelled']}件"
+            f"（キャンセルを含む全件数：{summary['reservations'] + summary['cancelled']}件）"
+        )
 
     # 時間帯ごとの件数表示（すべてのスロットを表示）
     time_lines = []
     for slot in TIME_OPTIONS:  # ["18:00", "18:30", "20:30", "21:00"]
-        count = time_counter.get(slot, 0)
-        time_lines.append(f"{slot}: {count}件")
+        count, covers = summary["by_slot"].get(slot, (0, 0))
+        time_lines.append(f"{slot}: {count}件（{covers}名）")
     st.caption("時間帯別：" + " / ".join(time_lines))
 
-    # コース別件数
-    course_counter = Counter()
-    for r in reservations:
-        cid = r.get("course_id")
-        if cid:
-            course_counter[cid] += 1
-
+    # コース別件数（無効にしたコースの予約も数える）
     course_lines = []
-    for c in courses:
-        cid = c["id"]
-        cnt = course_counter.get(cid, 0)
-        if cnt > 0:
-            course_lines.append(f"{c['name']}: {cnt}件")
+    for c in get_catalog().courses:
+        count, covers = summary["by_course"].get(c["id"], (0, 0))
+        if count > 0:
+            course_lines.append(f"{c['name']}: {count}件（{covers}名）")
 
     if course_lines:
         st.caption("コース別：" + " / ".join(course_lines))
 
-    for r in reservations:
-        res_time = datetime.fromisoformat(r["reserved_at"])
-        main_label = ""
-        if r.get("main_choice"):
-            main_label = f" / メイン: {r['main_choice']}"
-        
-        title = (
-            f"{res_time.strftime('%Y-%m-%d %H:%M')} / "
-            f"{(r['guest_name'] or 'お名前未入力')} 様 / "
-            f"テーブル: {r['table_no'] or '-'} / "
-            f"コース: {course_map.get(r['course_id'], '不明')}"
-            f"{main_label}"
-        )
+    # メインの内訳（皿数）
+    if summary["mains"]:
+        mains = sorted(summary["mains"].items(), key=lambda x: (x[0] not in MAIN_OPTIONS, x[0]))
+        st.caption("メイン：" + " / ".join(f"{name}: {n}" for name, n in mains))
+
+    # 一覧は表 1 つで表示し、編集フォームは選んだ予約の分だけ作る
+    # （予約が増えても、画面のウィジェット数・描画時間はほぼ変わらない）
+    st.dataframe(
+        [reservation_summary_row(r, course_map) for r in reservations],
+        hide_index=True,
+        use_container_width=True,
+    )
 
-        with st.expander(title):
-            with st.form(f"edit_reservation_form_{r['id']}"):
-                c1, c2 = st.columns(2)
+    reservations_by_id = {r["id"]: r for r in reservations}
+    selected_id = st.selectbox(
+        "編集する予約",
+        options=list(reservations_by_id),
+        index=None,
+        placeholder="予約を選択してください",
+        format_func=lambda rid: reservation_label(reservations_by_id[rid], course_map),
+        key="edit_reservation_id",
+    )
+    if selected_id is None:
+        return
 
-                with c1:
-                    guest_name_edit = st.text_input(
-                        "お名前（必須）",
-                        value=r.get("guest_name") or "",
-                        key=f"name_{r['id']}",
-                    )
+    r = reservations_by_id[selected_id]
+    # この予約のコースに「メイン」枠があるかどうか
+    has_main_for_row = has_main_for_courses([r["course_id"]]).get(r["course_id"], False)
+    with span("render_reservation_row"):
+        render_reservation_edit_form(r, has_main_for_row)
+
+
+def reservation_summary_row(r, course_map):
+    """予約一覧の表の 1 行。"""
+    return {
+        "時間": datetime.fromisoformat(r["reserved_at"]).strftime("%H:%M"),
+        "テーブル": r.get("table_no") or "-",
+        "お名前": r.get("guest_name") or "お名前未入力",
+        "人数": r.get("guest_count"),
+        "コース": course_map.get(r.get("course_id"), "不明"),
+        "メイン": r.get("main_choice") or "",
+        "ステータス": r.get("status") or "reserved",
+        "メモ": r.get("note") or "",
+    }
+
+
+def reservation_label(r, course_map) -> str:
+    """「編集する予約」の選択肢の表示。"""
+    res_time = datetime.fromisoformat(r["reserved_at"])
+    return (
+        f"{res_time.strftime('%H:%M')} / "
+        f"{(r['guest_name'] or 'お名前未入力')} 様 / "
+        f"テーブル: {r['table_no'] or '-'} / "
+        f"コース: {course_map.get(r['course_id'], '不明')}"
+    )
+
+
+def render_reservation_edit_form(r, has_main_for_row: bool):
+    """選んだ 1 件の予約の編集・削除フォーム。"""
+    res_time = datetime.fromisoformat(r["reserved_at"])
+
+    with st.form(f"edit_reservation_form_{r['id']}"):
+        c1, c2 = st.columns(2)
 
-                    guest_count_edit = st.number_input(
-                        "人数",
-                        min_value=1,
+        with c1:
+            guest_name_edit = st.text_input(
+                "お名前（必須）",
+                value=r.get("guest_name") or "",
+                key=f"name_{r['id']}",
+            )
+
+            guest_count_edit = st.number_input(
+                "人数",
+                min_value=1,
+                max_value=20,
+                value=int(r.get("guest_count") or 1),
+                step=1,
+                key=f"count_{r['id']}",
+            )
+
+            # テーブル番号（必須、プルダウン）
+            table_current = r.get("table_no") or ""
+            if table_current in TABLE_OPTIONS:
+                table_index = TABLE_OPTIONS.index(table_current)
+            else:
+                table_index = 0
+            table_no_edit = st.selectbox(
+                "テーブル番号（必須）",
+                options=TABLE_OPTIONS,
+                index=table_index,
+                key=f"table_{r['id']}",
+            )
+
+        with c2:
+            # ステータス編集
+            status_options = ["reserved", "arrived", "cancelled", "completed"]
+            status_current = r.get("status") or "reserved"
+            if status_current in status_options:
+                status_index = status_options.index(status_current)
+            else:
+                status_index = 0
+            status_edit = st.selectbox(
+                "ステータス",
+                options=status_options,
+                index=status_index,
+                key=f"status_{r['id']}",
+            )
+
+            note_edit = st.text_area(
+                "メモ（任意）",
+                value=r.get("note") or "",
+                key=f"note_{r['id']}",
+            )
+
+            # メイン人数（編集用）
+            main_counts_edit = None
+            if has_main_for_row:
+                st.markdown("メイン料理の内訳（編集）")
+
+                # 既存の main_choice を人数dictにパース
+                main_counts_edit = parse_main_choice_to_counts(r.get("main_choice"))
+
+                for name in MAIN_OPTIONS:
+                    main_counts_edit[name] = st.number_input(
+                        f"{name} の人数",
+                        min_value=0,
                         max_value=20,
-                        value=int(r.get("guest_count") or 1),
+                        value=main_counts_edit.get(name, 0),
                         step=1,
-                        key=f"count_{r['id']}",
+                        key=f"edit_main_{name}_{r['id']}",
                     )
 
-                    # テーブル番号（必須、プルダウン）
-                    table_current = r.get("table_no") or ""
-                    if table_current in TABLE_OPTIONS:
-                        table_index = TABLE_OPTIONS.index(table_current)
-                    else:
-                        table_index = 0
-                    table_no_edit = st.selectbox(
-                        "テーブル番号（必須）",
-                        options=TABLE_OPTIONS,
-                        index=table_index,
-                        key=f"table_{r['id']}",
-                    )
+            # 予約日時は今回は編集不可（必要なら後で実装）
+            st.caption(f"予約日時（変更不可）: {res_time.strftime('%Y-%m-%d %H:%M')}")
 
-                with c2:
-                    # ステータス編集
-                    status_options = ["reserved", "arrived", "cancelled", "completed"]
-                    status_current = r.get("status") or "reserved"
-                    if status_current in status_options:
-                        status_index = status_options.index(status_current)
-                    else:
-                        status_index = 0
-                    status_edit = st.selectbox(
-                        "ステータス",
-                        options=status_options,
-                        index=status_index,
-                        key=f"status_{r['id']}",
-                    )
-
-                    note_edit = st.text_area(
-                        "メモ（任意）",
-                        value=r.get("note") or "",
-                        key=f"note_{r['id']}",
-                    )
+        col_btn1, col_btn2 = st.columns(2)
+        with col_btn1:
+            update_btn = st.form_submit_button("この予約を更新")
+        with col_btn2:
+            delete_btn = st.form_submit_button("この予約を削除")
 
-                    # この予約のコースに「メイン」アイテムがあるかどうか
-                    has_main_for_row = course_has_main_item(r["course_id"])
-
-                    # メイン人数（編集用）
-                    main_counts_edit = None
-                    if has_main_for_row:
-                        st.markdown("メイン料理の内訳（編集）")
-
-                        # 既存の main_choice を人数dictにパース
-                        main_counts_edit = parse_main_choice_to_counts(r.get("main_choice"))
-
-                        for name in MAIN_OPTIONS:
-                            main_counts_edit[name] = st.number_input(
-                                f"{name} の人数",
-                                min_value=0,
-                                max_value=20,
-                                value=main_counts_edit.get(name, 0),
-                                step=1,
-                                key=f"edit_main_{name}_{r['id']}",
-                            )
-
-                    # 予約日時は今回は編集不可（必要なら後で実装）
-                    st.caption(f"予約日時（変更不可）: {res_time.strftime('%Y-%m-%d %H:%M')}")
-
-                col_btn1, col_btn2 = st.columns(2)
-                with col_btn1:
-                    update_btn = st.form_submit_button("この予約を更新")
-                with col_btn2:
-                    delete_btn = st.form_submit_button("この予約を削除")
-
-                # 更新処理
-                if update_btn:
-                    if not guest_name_edit.strip():
-                        st.warning("お名前を入力してください。")
-                    elif not table_no_edit:
-                        st.warning("テーブル番号を選択してください。")
-                    else:
-                        # メイン人数のチェックと main_choice の再生成
-                        main_choice_edit = None
-                        if has_main_for_row:
-                            # main_counts_edit は上で number_input を通して更新済み
-                            total_main_edit = sum(main_counts_edit.values())
-                            guest_count_int_edit = int(guest_count_edit)
-
-                            if total_main_edit != guest_count_int_edit:
-                                st.warning(
-                                    f"メイン料理の人数合計（{total_main_edit}名）が "
-                                    f"人数（{guest_count_int_edit}名）と一致していません。"
-                                )
-                                st.stop()
-
-                            main_choice_edit = counts_to_main_choice(main_counts_edit)
-
-                        ok, msg = update_reservation_basic(
-                            reservation_id=r["id"],
-                            guest_name=guest_name_edit.strip(),
-                            guest_count=int(guest_count_edit),
-                            table_no=table_no_edit,
-                            status=status_edit,
-                            note=note_edit.strip(),
-                            reserved_at=res_time,
-                            main_choice=main_choice_edit,
+        # 更新処理
+        if update_btn:
+            if not guest_name_edit.strip():
+                st.warning("お名前を入力してください。")
+            elif not table_no_edit:
+                st.warning("テーブル番号を選択してください。")
+            else:
+                # メイン人数のチェックと main_choice の再生成
+                main_choice_edit = None
+                if has_main_for_row:
+                    # main_counts_edit は上で number_input を通して更新済み
+                    total_main_edit = sum(main_counts_edit.values())
+                    guest_count_int_edit = int(guest_count_edit)
+
+                    if total_main_edit != guest_count_int_edit:
+                        st.warning(
+                            f"メイン料理の人数合計（{total_main_edit}名）が "
+                            f"人数（{guest_count_int_edit}名）と一致していません。"
                         )
-                        if ok:
-                            st.success(msg)
-                            st.rerun()
-                        else:
-                            st.error(msg)
-
-
-                # 削除処理
-                if delete_btn:
-                    # 軽い確認（本格的な確認UIが必要ならチェックボックスを追加してもOK）
-                    ok, msg = delete_reservation(r["id"])
-                    if ok:
-                        st.success(msg)
-                        st.rerun()
-                    else:
-                        st.error(msg)
+                        st.stop()
+
+                    main_choice_edit = counts_to_main_choice(main_counts_edit)
+
+                ok, msg = update_reservation_basic(
+                    reservation_id=r["id"],
+                    guest_name=guest_name_edit.strip(),
+                    guest_count=int(guest_count_edit),
+                    table_no=table_no_edit,
+                    status=status_edit,
+                    note=note_edit.strip(),
+                    reserved_at=res_time,
+                    main_choice=main_choice_edit,
+                )
+                if ok:
+                    st.success(msg)
+                    st.rerun()
+                else:
+                    st.error(msg)
+
+
+        # 削除処理
+        if delete_btn:
+            # 軽い確認（本格的な確認UIが必要ならチェックボックスを追加してもOK）
+            ok, msg = delete_reservation(r["id"])
+            if ok:
+                # 消した予約を選んだままにしない
+                st.session_state.pop("edit_reservation_id", None)
+                st.success(msg)
+                st.rerun()
+            else:
+                st.error(msg)
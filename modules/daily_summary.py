@@ -0,0 +1,329 @@
+# modules/daily_summary.py
+
+import threading
+import time as time_module
+from collections import Counter
+from datetime import date
+
+import streamlit as st
+
+from .catalog_cache import get_catalog
+from .instrumentation import traced
+from .realtime_feed import get_change_feed
+from .repository import repos
+from .stations import STATIONS
+from .time_utils import parse_wall_jst
+
+
+# Realtime が使えないとき（変更通知が来ないとき）に、集計を作り直すまでの時間（秒）
+SUMMARY_TTL_SEC = 30
+
+# Realtime が使えていても、通知の取りこぼしに備えてこの間隔で作り直す（秒）
+SUMMARY_REBUILD_SEC = 600
+
+# この時間どのセッションからも読まれなかった日付の集計は捨てる（秒。BoardSnapshotCache と同じ）
+SUMMARY_IDLE_SEC = 600
+
+# 集計に使う列（作り直すときはこれだけ読む）
+RESERVATION_COLUMNS = ("id", "reserved_at", "table_no", "status", "course_id", "guest_count", "main_choice")
+PROGRESS_COLUMNS = ("id", "reservation_id", "course_item_id", "is_served", "main_detail", "quantity")
+
+
+class DailySummary:
+    """
+    1 日分の集計。
+      - 予約件数・人数（cancelled は別に件数だけ）
+      - 時間帯別・コース別の件数と人数
+      - メインの内訳（main_detail ごとの皿数）
+      - 持ち場ごとの未配膳の商品数（ボードに出ている進行の数）
+
+    作るときだけ予約と進行を読み込み、その後は ChangeFeed に流れてくる行の変更 1 件ごとに、
+    その行の分だけ足し引きする。行ごとに「いま集計に足している分」を覚えておき、
+    変更が来たらそれを引いてから新しい行の分を足す（同じ変更が 2 回来ても結果は変わらない）。
+    """
+
+    def __init__(self, target_date: date):
+        self.target_date = target_date
+        self._lock = threading.Lock()
+        self.build_lock = threading.Lock()   # 作り直しを 1 本にまとめる
+
+        self._items = {}             # item_id -> 商品（作り直したときのカタログ）
+        self._reservations = {}      # reservation_id -> 行（RESERVATION_COLUMNS）
+        self._progress = {}          # progress_id -> 行（PROGRESS_COLUMNS）
+        self._progress_by_res = {}   # reservation_id -> set(progress_id)
+        self._res_parts = {}         # reservation_id -> 集計に足している分
+        self._progress_parts = {}    # progress_id -> 集計に足している分
+
+        self._reset_counts()
+        self._buffer = None          # 作り直している間に届いた変更（読み込み後に当て直す）
+        self.built_at = 0.0
+        self.needs_rebuild = False
+
+    def _reset_counts(self):
+        self.reservation_count = 0
+        self.cancelled_count = 0
+        self.covers = 0
+        self.count_by_slot = Counter()
+        self.covers_by_slot = Counter()
+        self.count_by_course = Counter()
+        self.covers_by_course = Counter()
+        self.mains = Counter()
+        self.pending_by_station = Counter()
+
+    # ---------- 作り直し ----------
+
+    def is_stale(self, feed) -> bool:
+        age = time_module.monotonic() - self.built_at
+        return (
+            self.built_at == 0.0
+            or self.needs_rebuild
+            or age >= SUMMARY_REBUILD_SEC
+            or (not feed.is_live and age >= SUMMARY_TTL_SEC)
+        )
+
+    @traced("build_daily_summary")
+    def rebuild(self):
+        """予約・進行を読み込んで集計し直す（クエリは予約 1 回 + 進行 1 回）。"""
+        with self._lock:
+            self._buffer = []
+        try:
+            reservations = repos().reservations.list_for_date(self.target_date, columns=", ".join(RESERVATION_COLUMNS))
+            progress = repos().progress.list_for_reservations(
+                [r["id"] for r in reservations], columns=", ".join(PROGRESS_COLUMNS)
+            )
+            items = dict(get_catalog().items_by_id)
+        except Exception:
+            with self._lock:
+                self._buffer = None
+            raise
+
+        with self._lock:
+            self._items = items
+            self._reservations = {}
+            self._progress = {}
+            self._progress_by_res = {}
+            self._res_parts = {}
+            self._progress_parts = {}
+            self._reset_counts()
+            self.needs_rebuild = False
+
+            for r in reservations:
+                self._set_reservation(r)
+            for p in progress:
+                self._set_progress(p)
+
+            # 読み込みの前後に届いた変更を当て直す（すでに反映済みの変更でも結果は同じ）
+            buffer, self._buffer = self._buffer, None
+            for event in buffer:
+                self._apply(*event)
+            self.built_at = time_module.monotonic()
+
+    # ---------- 変更の反映 ----------
+
+    def apply(self, table: str, event_type: str, record: dict, old_record: dict = None):
+        """ChangeFeed からの変更 1 件を反映する。"""
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.append((table, event_type, record, old_record))
+                return
+            if self.built_at == 0.0:
+                return
+            try:
+                self._apply(table, event_type, record, old_record)
+            except Exception:
+                # 想定外の行で集計がずれたかもしれないので、次に読むときに作り直す
+                self.needs_rebuild = True
+
+    def _apply(self, table, event_type, record, old_record):
+        is_delete = (event_type or "").upper() == "DELETE"
+        row = old_record if is_delete else record
+        if not row or not row.get("id"):
+            return
+
+        if table == "course_reservations":
+            if is_delete:
+                self._remove_reservation(row["id"])
+            elif parse_wall_jst(row["reserved_at"]).date() == self.target_date:
+                self._set_reservation(row)
+            else:
+                # 別の日付に移った予約
+                self._remove_reservation(row["id"])
+
+        elif table == "course_progress":
+            if is_delete:
+                self._remove_progress(row["id"])
+            elif row.get("reservation_id") in self._reservations:
+                if row.get("course_item_id") not in self._items:
+                    # カタログを読んだ後に追加された商品
+                    self.needs_rebuild = True
+                self._set_progress(row)
+            else:
+                self._remove_progress(row["id"])
+
+    def _set_reservation(self, row):
+        rid = row["id"]
+        old = self._res_parts.pop(rid, None)
+        if old is not None:
+            self._count_reservation(old, -1)
+
+        self._reservations[rid] = {c: row.get(c) for c in RESERVATION_COLUMNS}
+        parts = self._reservation_parts(self._reservations[rid])
+        self._res_parts[rid] = parts
+        self._count_reservation(parts, 1)
+
+        # テーブル・ステータス・メインが変わると、進行の集計先（持ち場）も変わる
+        for pid in list(self._progress_by_res.get(rid, ())):
+            self._set_progress(self._progress[pid])
+
+    def _remove_reservation(self, rid):
+        for pid in list(self._progress_by_res.get(rid, ())):
+            self._remove_progress(pid)
+        old = self._res_parts.pop(rid, None)
+        if old is not None:
+            self._count_reservation(old, -1)
+        self._reservations.pop(rid, None)
+        self._progress_by_res.pop(rid, None)
+
+    def _set_progress(self, row):
+        pid = row["id"]
+        old = self._progress_parts.pop(pid, None)
+        if old is not None:
+            self._count_progress(old, -1)
+
+        progress = {c: row.get(c) for c in PROGRESS_COLUMNS}
+        self._progress[pid] = progress
+        self._progress_by_res.setdefault(progress["reservation_id"], set()).add(pid)
+        parts = self._progress_parts_for(progress)
+        self._progress_parts[pid] = parts
+        self._count_progress(parts, 1)
+
+    def _remove_progress(self, pid):
+        old = self._progress_parts.pop(pid, None)
+        if old is not None:
+            self._count_progress(old, -1)
+        progress = self._progress.pop(pid, None)
+        if progress is not None:
+            self._progress_by_res.get(progress["reservation_id"], set()).discard(pid)
+
+    # ---------- 1 行分の集計 ----------
+
+    @staticmethod
+    def _reservation_parts(r):
+        # (cancelled か, 時間帯, course_id, 人数)
+        return (
+            r.get("status") == "cancelled",
+            parse_wall_jst(r["reserved_at"]).strftime("%H:%M"),
+            r.get("course_id"),
+            int(r.get("guest_count") or 0),
+        )
+
+    def _count_reservation(self, parts, sign: int):
+        cancelled, time_str, course_id, covers = parts
+        if cancelled:
+            self.cancelled_count += sign
+            return
+        self.reservation_count += sign
+        self.covers += sign * covers
+        self.count_by_slot[time_str] += sign
+        self.covers_by_slot[time_str] += sign * covers
+        self.count_by_course[course_id] += sign
+        self.covers_by_course[course_id] += sign * covers
+
+    def _progress_parts_for(self, p):
+        # (メインの内訳 (main_detail, 皿数) or None, 未配膳として数える持ち場のキー)
+        r = self._reservations.get(p["reservation_id"])
+        item = self._items.get(p["course_item_id"])
+        if r is None or item is None or r.get("status") == "cancelled":
+            return (None, ())
+        main = None
+        if item["item_name"] == "メイン" and p.get("main_detail"):
+            main = (p["main_detail"], int(p.get("quantity") or 1))
+        stations = ()
+        if not p.get("is_served"):
+            stations = tuple(key for key, station in STATIONS.items() if station.includes(r, p, item))
+        return (main, stations)
+
+    def _count_progress(self, parts, sign: int):
+        main, stations = parts
+        if main is not None:
+            self.mains[main[0]] += sign * main[1]
+        for key in stations:
+            self.pending_by_station[key] += sign
+
+    # ---------- 参照 ----------
+
+    def counts(self) -> dict:
+        """
+        画面に出す集計のコピー（DB には問い合わせない）。
+        by_slot / by_course は {キー: (件数, 人数)}、mains は {main_detail: 皿数}、
+        pending_by_station は {持ち場のキー: 未配膳の商品数}。0 件のキーは含まない。
+        """
+        with self._lock:
+            return {
+                "reservations": self.reservation_count,
+                "cancelled": self.cancelled_count,
+                "covers": self.covers,
+                "by_slot": {
+                    t: (n, self.covers_by_slot[t]) for t, n in sorted(self.count_by_slot.items()) if n > 0
+                },
+                "by_course": {
+                    cid: (n, self.covers_by_course[cid]) for cid, n in self.count_by_course.items() if n > 0
+                },
+                "mains": {name: n for name, n in self.mains.items() if n > 0},
+                "pending_by_station": {key: n for key, n in self.pending_by_station.items() if n > 0},
+            }
+
+
+class DailySummaryRegistry:
+    """日付ごとの DailySummary（全セッションで共有）。ChangeFeed の変更をそれぞれに配る。"""
+
+    def __init__(self, feed):
+        self._feed = feed
+        self._lock = threading.Lock()
+        self._summaries = {}   # date_key -> DailySummary
+        self._last_used = {}   # date_key -> monotonic
+
+    def apply(self, table, event_type, record, old_record=None):
+        with self._lock:
+            summaries = list(self._summaries.values())
+        for summary in summaries:
+            summary.apply(table, event_type, record, old_record)
+
+    def get(self, target_date: date) -> DailySummary:
+        key = target_date.isoformat()
+        now = time_module.monotonic()
+        with self._lock:
+            if key not in self._summaries:
+                self._summaries[key] = DailySummary(target_date)
+            self._last_used[key] = now
+
+            # しばらく誰も見ていない日付は捨てる（捨てた集計には変更を配らない）
+            for old_key, used_at in list(self._last_used.items()):
+                if now - used_at >= SUMMARY_IDLE_SEC:
+                    self._summaries.pop(old_key, None)
+                    self._last_used.pop(old_key, None)
+            summary = self._summaries[key]
+
+        if summary.is_stale(self._feed):
+            with summary.build_lock:
+                # 待っている間に別のセッションが作り直し終えていれば、それを使う
+                if summary.is_stale(self._feed):
+                    summary.rebuild()
+        return summary
+
+
+@st.cache_resource
+def get_summary_registry() -> DailySummaryRegistry:
+    """プロセス全体で 1 つの集計レジストリを返す（ChangeFeed の変更を購読する）。"""
+    feed = get_change_feed()
+    registry = DailySummaryRegistry(feed)
+    feed.subscribe(registry.apply)
+    return registry
+
+
+def get_daily_summary(target_date: date) -> dict:
+    """
+    指定日の集計（DailySummary.counts() の形）を返す。
+    初回と、Realtime が使えないときの SUMMARY_TTL_SEC ごとにだけ作り直し、それ以外は DB に問い合わせない。
+    """
+    return get_summary_registry().get(target_date).counts()
@@ -0,0 +1,263 @@
+# modules/instrumentation.py
+
+import contextvars
+import functools
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+
+# 「JSONL に記録」を ON にしたときの出力先
+LOG_PATH = os.environ.get(
+    "COURSE_TRACE_LOG",
+    os.path.join(tempfile.gettempdir(), "course_rerun_trace.jsonl"),
+)
+
+# 今の再実行で記録中のトレース（計測 OFF のときは None）
+_current_trace = contextvars.ContextVar("course_rerun_trace", default=None)
+
+
+class RerunTrace:
+    """1回の再実行（rerun）の中で、区間（span）ごとの時間と DB 呼び出しを集計する。"""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.started = time.perf_counter()
+        self.finished = None
+        self.rendered = False  # render_debug_panel まで到達したか（st.rerun() などで中断されると False のまま）
+        self.spans = {}      # name -> {"count", "ms"}
+        self.queries = {}    # "table.op" -> {"count", "ms", "bytes", "span": {span_name: count}}
+        self._stack = []
+
+    def total_ms(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def add_span(self, name: str, ms: float):
+        s = self.spans.setdefault(name, {"count": 0, "ms": 0.0})
+        s["count"] += 1
+        s["ms"] += ms
+
+    def add_query(self, key: str, ms: float, size: int):
+        q = self.queries.setdefault(key, {"count": 0, "ms": 0.0, "bytes": 0, "span": {}})
+        q["count"] += 1
+        q["ms"] += ms
+        q["bytes"] += size
+        owner = self._stack[-1] if self._stack else "(top)"
+        q["span"][owner] = q["span"].get(owner, 0) + 1
+
+    def to_dict(self):
+        return {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "page": self.page,
+            "total_ms": round(self.total_ms(), 2),
+            "spans": self.spans,
+            "queries": self.queries,
+        }
+
+
+# ==========================================================
+# 計測用の API
+# ==========================================================
+
+@contextmanager
+def span(name: str):
+    """with span("render_card"): ... の区間の時間を記録する（計測 OFF のときは何もしない）。"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    trace._stack.append(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace._stack.pop()
+        trace.add_span(name, (time.perf_counter() - started) * 1000)
+
+
+def traced(name: str = None):
+    """関数全体を span で囲むデコレータ。name を省略すると関数名を使う。"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _payload_size(data) -> int:
+    try:
+        return len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _TracedQuery:
+    """postgrest のクエリビルダーを包み、execute() の時間と応答サイズを記録する。"""
+
+    _OPS = ("select", "insert", "update", "upsert", "delete")
+
+    def __init__(self, builder, table_name: str, op: str = "select"):
+        self._builder = builder
+        self._table_name = table_name
+        self._op = op
+
+    def __getattr__(self, attr):
+        value = getattr(self._builder, attr)
+        if hasattr(value, "execute"):
+            # プロパティでビルダーを返すもの（postgrest の not_ など）も包む
+            return _TracedQuery(value, self._table_name, self._op)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            op = attr if attr in self._OPS else self._op
+            if hasattr(result, "execute"):
+                return _TracedQuery(result, self._table_name, op)
+            return result
+        return call
+
+    def execute(self):
+        trace = _current_trace.get()
+        if trace is None:
+            return self._builder.execute()
+
+        started = time.perf_counter()
+        res = self._builder.execute()
+        trace.add_query(
+            f"{self._table_name}.{self._op}",
+            (time.perf_counter() - started) * 1000,
+            _payload_size(getattr(res, "data", None)),
+        )
+        return res
+
+
+class TracedClient:
+    """Supabase クライアント（または InMemoryBackend）の table() / rpc() を計測付きにする。"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, table_name: str):
+        return _TracedQuery(self._client.table(table_name), table_name)
+
+    def rpc(self, name: str, params: dict = None):
+        return _TracedQuery(self._client.rpc(name, params or {}), f"rpc:{name}", "call")
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
+
+
+# ==========================================================
+# 再実行ごとの開始・終了とデバッグパネル
+# ==========================================================
+
+def begin_rerun(page: str):
+    """サイドバーの「デバッグ情報」が ON のときだけ計測を開始し、RerunTrace を返す。"""
+    enabled = st.sidebar.checkbox("デバッグ情報", key="debug_panel_enabled")
+    if not enabled:
+        _current_trace.set(None)
+        return None
+
+    trace = RerunTrace(page)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_rerun(trace):
+    """
+    計測を終了して記録する（main の finally で呼ぶ）。
+    ボードの操作などは st.rerun() で再実行を途中で打ち切るので、そうした再実行も
+    ここで JSONL に書き、次の再実行のデバッグパネルに出せるよう session_state に残す。
+    """
+    if trace is None:
+        return
+
+    trace.finished = time.perf_counter()
+    _current_trace.set(None)
+
+    record = trace.to_dict()
+    if not trace.rendered:
+        # 最後まで描画されなかった再実行（st.rerun() / st.stop() / 例外で中断）
+        record["interrupted"] = True
+        st.session_state["debug_panel_interrupted"] = record
+
+    if st.session_state.get("debug_panel_log"):
+        with open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _render_queries(queries):
+    st.table([
+        {
+            "query": key,
+            "回数": q["count"],
+            "ms": round(q["ms"], 1),
+            "KB": round(q["bytes"] / 1024, 1),
+            "呼び出し元": ", ".join(q["span"]),
+        }
+        for key, q in sorted(queries.items(), key=lambda kv: -kv[1]["ms"])
+    ])
+
+
+def _render_spans(spans):
+    st.table([
+        {"span": name, "回数": s["count"], "ms": round(s["ms"], 1)}
+        for name, s in sorted(spans.items(), key=lambda kv: -kv[1]["ms"])
+    ])
+
+
+def render_debug_panel(trace):
+    """この再実行の集計をサイドバーに表示する（直前に中断された再実行があれば、それも表示する）。"""
+    if trace is None:
+        return
+    trace.rendered = True
+
+    with st.sidebar.expander("デバッグ情報（この再実行）", expanded=True):
+        query_count = sum(q["count"] for q in trace.queries.values())
+        query_ms = sum(q["ms"] for q in trace.queries.values())
+        query_bytes = sum(q["bytes"] for q in trace.queries.values())
+        st.caption(
+            f"合計 {trace.total_ms():.0f} ms / DB {query_count} 回・{query_ms:.0f} ms・{query_bytes / 1024:.1f} KB"
+        )
+
+        if trace.queries:
+            st.markdown("**DB 呼び出し**")
+            _render_queries(trace.queries)
+
+        if trace.spans:
+            st.markdown("**区間**")
+            _render_spans(trace.spans)
+
+        # st.rerun() で打ち切られた再実行ではこのチェックボックスが描画されず、ウィジェットの値が消えるので、
+        # ON/OFF はウィジェットとは別のキーに持つ（end_rerun はこちらを見る）
+        log_enabled = st.checkbox(
+            "JSONL に記録",
+            value=st.session_state.get("debug_panel_log", False),
+            key="debug_panel_log_checkbox",
+        )
+        st.session_state["debug_panel_log"] = log_enabled
+        if log_enabled:
+            st.caption(f"記録先: {LOG_PATH}")
+
+    # 操作のあとの st.rerun() で打ち切られた再実行（操作の書き込みにかかった時間はこちらに出る）
+    previous = st.session_state.pop("debug_panel_interrupted", None)
+    if previous:
+        with st.sidebar.expander("デバッグ情報（直前の中断された再実行）", expanded=False):
+            query_count = sum(q["count"] for q in previous["queries"].values())
+            st.caption(f"{previous['at']} / 合計 {previous['total_ms']:.0f} ms / DB {query_count} 回")
+            if previous["queries"]:
+                _render_queries(previous["queries"])
+            if previous["spans"]:
+                _render_spans(previous["spans"])
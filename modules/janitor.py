@@ -0,0 +1,162 @@
+# modules/janitor.py
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time as time_module
+from datetime import datetime, time
+
+import streamlit as st
+
+from .realtime_feed import get_change_feed
+from .repository import repos
+from .time_utils import get_today_jst
+
+
+# 1回の削除で扱う予約の件数（大量に溜まっていても1リクエストが重くならないように）
+CLEANUP_BATCH_SIZE = 200
+
+# 日付が変わったかを確認する間隔（秒）
+CHECK_INTERVAL_SEC = 60
+
+# 複数の Streamlit ワーカー（プロセス）で共有するロック・実行記録
+LOCK_PATH = os.path.join(tempfile.gettempdir(), "course_janitor.lock")
+STATE_PATH = os.path.join(tempfile.gettempdir(), "course_janitor_state.json")
+
+# 直近の実行結果（STATE_PATH の last_report）のメモリ上の写し。
+# 掃除スレッドが確認・実行のたびに更新するので、画面の再実行ではファイルを読まない
+_UNSET = object()
+_last_report = _UNSET
+
+
+def cleanup_old_data(batch_size: int = CLEANUP_BATCH_SIZE):
+    """
+    今日より前の日付の予約と、それに紐づく course_progress を全削除する。
+    （＝前日以前のデータは残さない運用）
+
+    batch_size 件ずつ削除し、削除した件数をまとめた dict を返す。
+    """
+    today = get_today_jst()
+    start_today = datetime.combine(today, time(0, 0, 0))
+
+    report = {"reservations": 0, "progress": 0, "batches": 0}
+
+    while True:
+        # 今日より前の予約を batch_size 件だけ取得
+        old_ids = [r["id"] for r in repos().reservations.list_before(start_today, limit=batch_size)]
+        if not old_ids:
+            break  # 消すものなし
+
+        # 先に進行テーブルを削除（外部キー制約対策）
+        report["progress"] += len(repos().progress.delete_for_reservations(old_ids))
+
+        # 予約本体を削除
+        deleted = len(repos().reservations.delete_by_ids(old_ids))
+        report["reservations"] += deleted
+        report["batches"] += 1
+
+        if deleted == 0:
+            # 1 件も消せなかった（権限など）。同じ予約を取り直し続けないように止める
+            break
+
+        if len(old_ids) < batch_size:
+            break
+
+    return report
+
+
+def _load_state():
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _remember(report):
+    global _last_report
+    _last_report = report
+
+
+def _save_state(state):
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def run_if_due():
+    """
+    JST の今日の分がまだ実行されていなければ cleanup_old_data を実行する。
+    ファイルロックで排他し、別プロセスが実行中・実行済みなら何もしない。
+    実行した場合はその結果（dict）を、しなかった場合は None を返す。
+    """
+    today_str = get_today_jst().isoformat()
+
+    with open(LOCK_PATH, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None  # 他のワーカーが実行中
+
+        try:
+            state = _load_state()
+            _remember(state.get("last_report"))  # 別のプロセスが実行した結果も拾う
+            if state.get("last_run_date") == today_str:
+                return None
+
+            report = {"date": today_str, "started_at": datetime.now().isoformat()}
+            try:
+                report.update(cleanup_old_data())
+                report["ok"] = True
+            except Exception as e:
+                # 失敗した日は記録しないので、次のチェックで再実行される
+                report["ok"] = False
+                report["error"] = str(e)
+                _save_state({**state, "last_report": report})
+                _remember(report)
+                return report
+
+            report["finished_at"] = datetime.now().isoformat()
+            _save_state({"last_run_date": today_str, "last_report": report})
+            _remember(report)
+            return report
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def last_report():
+    """
+    直近の実行結果（dict）を返す。まだ一度も動いていなければ None。
+    ファイルを読むのはプロセスで最初の 1 回だけ（その後は掃除スレッドが更新するメモリ上の写し）。
+    """
+    if _last_report is _UNSET:
+        _remember(_load_state().get("last_report"))
+    return _last_report
+
+
+def _loop():
+    while True:
+        try:
+            run_if_due()
+        except Exception:
+            pass  # ロックファイルの I/O エラーなど。次のチェックで再試行する
+        try:
+            # 掃除を実行しなかったプロセスでも、前日以前の予約の対応（変更通知の宛先）は捨てる
+            get_change_feed().forget_dates_before(get_today_jst().isoformat())
+        except Exception:
+            pass
+        time_module.sleep(CHECK_INTERVAL_SEC)
+
+
+@st.cache_resource
+def start_janitor():
+    """
+    プロセスごとに1回だけ、日付が変わるたびに過去データを掃除するスレッドを起動する。
+    描画処理からは切り離されているので、画面の再実行ではメンテナンス用のクエリは発生しない。
+    """
+    thread = threading.Thread(target=_loop, name="course-janitor", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,115 @@
+# modules/models.py
+
+# ==========================================================
+# ボード・一覧で使う行（予約・進行）
+#   Supabase から受け取った dict を、読み込み時に 1 回だけ変換しておく。
+#   日時のパース（すべて JST の aware datetime にそろえる。modules/time_utils.py）・
+#   テーブルの並び順・メインの表示名は、ここで済ませて再実行のたびに文字列を解析し直さないようにする。
+# ==========================================================
+
+from .time_utils import parse_ts_jst, parse_wall_jst
+
+
+# テーブルの並び順（course_reservation の TABLE_OPTIONS と合わせる）
+TABLE_ORDER = {
+    "1-T1": 0,  "1-T2": 1,  "1-T3": 2,  "1-T4": 3,  "1-T5": 4,
+    "1-T6": 5,  "1-T7": 6,  "1-T8": 7,  "1-T9": 8,
+    "1-C1": 9,  "1-C4": 10, "1-C5": 11, "1-C8": 12, "レコード": 13,
+    "2-T1": 14, "2-T2": 15, "2-T3": 16, "2-T4": 17, "2-T5": 18, "2-T6": 19,
+    "2-C1": 20, "2-C4": 21, "2-C5": 22, "2-C8": 23,
+    "2-R1": 24, "2-R2": 25, "2-R3": 26,
+}
+
+# 想定外のテーブルは末尾へ
+UNKNOWN_TABLE_ORDER = 999
+
+
+class ReservationRow:
+    """course_reservations の 1 行（ボード・一覧で使う列だけ）。"""
+
+    __slots__ = (
+        "id", "reserved_at", "time_label", "table_no", "table_order", "sort_key",
+        "guest_name", "guest_count", "status", "main_choice", "arrived_at", "updated_at",
+    )
+
+    # timestamptz の列（apply() で文字列が来たら JST の datetime にする）
+    TIMESTAMP_FIELDS = ("arrived_at", "updated_at")
+
+    def __init__(self, row: dict):
+        self.id = row["id"]
+        self.reserved_at = parse_wall_jst(row["reserved_at"])
+        self.time_label = self.reserved_at.strftime("%H:%M")
+        self.table_no = row.get("table_no")
+        self.table_order = TABLE_ORDER.get(self.table_no or "", UNKNOWN_TABLE_ORDER)
+        # 並び順は「予約時間 → テーブル順」
+        self.sort_key = (self.reserved_at, self.table_order)
+        self.guest_name = row.get("guest_name")
+        self.guest_count = row.get("guest_count")
+        self.status = row.get("status") or "reserved"
+        self.main_choice = row.get("main_choice")
+        self.arrived_at = parse_ts_jst(row.get("arrived_at"))
+        self.updated_at = parse_ts_jst(row.get("updated_at"))
+
+    def apply(self, payload: dict):
+        """書き込みの payload（例: {"status": "arrived"}）を反映する。"""
+        _apply(self, payload)
+        if "table_no" in payload:
+            self.table_order = TABLE_ORDER.get(self.table_no or "", UNKNOWN_TABLE_ORDER)
+            self.sort_key = (self.reserved_at, self.table_order)
+
+    @property
+    def date_key(self) -> str:
+        return self.reserved_at.date().isoformat()
+
+
+class ProgressRow:
+    """course_progress の 1 行。"""
+
+    __slots__ = (
+        "id", "reservation_id", "course_item_id", "scheduled_time", "time_label",
+        "is_cooked", "is_served", "cooked_at", "served_at",
+        "main_detail", "quantity", "main_label", "updated_at",
+    )
+
+    TIMESTAMP_FIELDS = ("cooked_at", "served_at", "updated_at")
+
+    def __init__(self, row: dict):
+        self.id = row["id"]
+        self.reservation_id = row["reservation_id"]
+        self.course_item_id = row["course_item_id"]
+        self.scheduled_time = parse_wall_jst(row["scheduled_time"])
+        self.time_label = self.scheduled_time.strftime("%H:%M")
+        self.is_cooked = bool(row.get("is_cooked", False))
+        self.is_served = bool(row.get("is_served", False))
+        self.cooked_at = parse_ts_jst(row.get("cooked_at"))
+        self.served_at = parse_ts_jst(row.get("served_at"))
+        self.main_detail = row.get("main_detail")
+        self.quantity = row.get("quantity", 1)
+        # メイン枠の表示名（例: "ピザ：2"）。main_detail が無い行は None
+        self.main_label = f"{self.main_detail}：{self.quantity}" if self.main_detail else None
+        self.updated_at = parse_ts_jst(row.get("updated_at"))
+
+    def apply(self, payload: dict):
+        """書き込みの payload（例: {"is_cooked": True, "cooked_at": ...}）を反映する。"""
+        _apply(self, payload)
+
+
+def _apply(model, payload: dict):
+    for key, value in payload.items():
+        if key not in model.__slots__:
+            continue
+        if key in model.TIMESTAMP_FIELDS and isinstance(value, str):
+            value = parse_ts_jst(value)
+        elif key.startswith("is_"):
+            value = bool(value)
+        setattr(model, key, value)
+
+
+def display_name(item: dict, progress: ProgressRow, reservation: ReservationRow) -> str:
+    """
+    商品の表示名。メイン枠なら、予約ごとのメイン料理名（main_detail、無ければ旧 main_choice）で上書きする。
+    """
+    name = item["item_name"]
+    if name != "メイン":
+        return name
+    return progress.main_label or reservation.main_choice or name
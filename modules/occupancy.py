@@ -0,0 +1,202 @@
+# modules/occupancy.py
+
+import threading
+import time as time_module
+from datetime import date, datetime
+
+import streamlit as st
+
+from .instrumentation import traced
+from .realtime_feed import get_change_feed
+from .repository import repos
+from .time_utils import get_today_jst
+
+
+# Realtime が使えないときに、索引を作り直すまでの時間（秒）
+OCCUPANCY_TTL_SEC = 30
+
+
+class OccupancyIndex:
+    """
+    1日分の「テーブル × 時間帯」の埋まり具合を持つ索引。
+
+    テーブルごとに、予約が入っている時間帯をビットで持つ（bit i = times[i]）。
+    時間帯ごとのバッティングルールもビットマスクにしておき、
+    「この時間帯に入れられるか」は AND 1回で判定する。
+    """
+
+    def __init__(self, target_date: date, tables, times, conflict_rules):
+        self.target_date = target_date
+        self.tables = list(tables)
+        self.times = list(times)
+        self._slot_index = {t: i for i, t in enumerate(self.times)}
+        self._conflict_rules = conflict_rules
+
+        self._occupied = {}     # table_no -> bitmask
+        self._occupants = {}    # (table_no, slot) -> set(reservation_id)
+        self._where = {}        # reservation_id -> (table_no, slot)
+
+        self.built_at = 0.0
+        self.feed_version = None
+        self._lock = threading.Lock()
+
+    # ---------- 構築・更新 ----------
+
+    def _slot(self, time_str: str) -> int:
+        # 選択肢にない時間（昔の予約など）は、その場で末尾に追加する
+        if time_str not in self._slot_index:
+            self._slot_index[time_str] = len(self.times)
+            self.times.append(time_str)
+        return self._slot_index[time_str]
+
+    def _conflict_mask(self, time_str: str) -> int:
+        mask = 0
+        for t in self._conflict_rules.get(time_str, {time_str}):
+            mask |= 1 << self._slot(t)
+        return mask
+
+    def _recompute(self, table_no: str):
+        mask = 0
+        for (t, slot), ids in self._occupants.items():
+            if t == table_no and ids:
+                mask |= 1 << slot
+        self._occupied[table_no] = mask
+
+    def load(self, reservations):
+        """cancelled 以外の予約一覧から作り直す。"""
+        with self._lock:
+            self._occupied = {}
+            self._occupants = {}
+            self._where = {}
+            for r in reservations:
+                self._add_locked(r)
+            self.built_at = time_module.monotonic()
+
+    def _add_locked(self, reservation):
+        if reservation.get("status") == "cancelled" or not reservation.get("table_no"):
+            return
+        time_str = datetime.fromisoformat(reservation["reserved_at"]).strftime("%H:%M")
+        table_no = reservation["table_no"]
+        slot = self._slot(time_str)
+
+        self._occupants.setdefault((table_no, slot), set()).add(reservation["id"])
+        self._where[reservation["id"]] = (table_no, slot)
+        self._occupied[table_no] = self._occupied.get(table_no, 0) | (1 << slot)
+
+    def _remove_locked(self, reservation_id):
+        where = self._where.pop(reservation_id, None)
+        if where is None:
+            return
+        self._occupants.get(where, set()).discard(reservation_id)
+        self._recompute(where[0])
+
+    def add(self, reservation: dict):
+        with self._lock:
+            self._add_locked(reservation)
+
+    def remove(self, reservation_id: str):
+        with self._lock:
+            self._remove_locked(reservation_id)
+
+    def update(self, reservation: dict):
+        """テーブル変更・キャンセルなど。reserved_at / table_no / status を含む行を渡す。"""
+        with self._lock:
+            self._remove_locked(reservation["id"])
+            self._add_locked(reservation)
+
+    # ---------- 参照 ----------
+
+    def _occupied_mask(self, table_no: str, exclude_reservation_id: str = None) -> int:
+        mask = self._occupied.get(table_no, 0)
+        if exclude_reservation_id and exclude_reservation_id in self._where:
+            t, slot = self._where[exclude_reservation_id]
+            if t == table_no and self._occupants.get((t, slot)) == {exclude_reservation_id}:
+                mask &= ~(1 << slot)
+        return mask
+
+    def is_conflicted(self, table_no: str, time_str: str, exclude_reservation_id: str = None) -> bool:
+        with self._lock:
+            return bool(
+                self._occupied_mask(table_no, exclude_reservation_id) & self._conflict_mask(time_str)
+            )
+
+    def is_occupied(self, table_no: str, time_str: str) -> bool:
+        with self._lock:
+            return bool(self._occupied.get(table_no, 0) & (1 << self._slot(time_str)))
+
+    def blocked_tables(self, time_str: str):
+        """その時間帯に入れられないテーブルの集合。"""
+        with self._lock:
+            mask = self._conflict_mask(time_str)
+            return {t for t, occupied in self._occupied.items() if occupied & mask}
+
+    def grid(self, times=None):
+        """
+        画面表示用の 2 次元配列。
+        [(table_no, ["occupied" | "blocked" | "free", ...]), ...]（列は times の順）
+        """
+        times = list(times or self.times)
+        with self._lock:
+            masks = {t: self._conflict_mask(t) for t in times}
+            bits = {t: 1 << self._slot(t) for t in times}
+            rows = []
+            for table_no in self.tables:
+                occupied = self._occupied.get(table_no, 0)
+                cells = []
+                for t in times:
+                    if occupied & bits[t]:
+                        cells.append("occupied")
+                    elif occupied & masks[t]:
+                        cells.append("blocked")
+                    else:
+                        cells.append("free")
+                rows.append((table_no, cells))
+            return rows
+
+
+@st.cache_resource
+def _registry():
+    # 日付文字列 -> OccupancyIndex（全セッションで共有）
+    return {"lock": threading.Lock(), "indexes": {}}
+
+
+@traced("build_occupancy")
+def _build(index: OccupancyIndex, feed_version):
+    reservations = repos().reservations.list_for_date(
+        index.target_date,
+        columns="id, reserved_at, table_no, status",
+        include_cancelled=False,
+    )
+    index.load(reservations)
+    index.feed_version = feed_version
+
+
+def get_occupancy(target_date: date, tables, times, conflict_rules) -> OccupancyIndex:
+    """
+    指定日の索引を返す。初回と、その日の予約（course_reservations）に変更通知があったとき
+    （Realtime が使えない場合は OCCUPANCY_TTL_SEC 経過後）だけ 1 回のクエリで作り直す。
+    """
+    registry = _registry()
+    key = target_date.isoformat()
+    feed = get_change_feed()
+    feed_version = feed.table_version("course_reservations", key) if feed.is_live else None
+
+    with registry["lock"]:
+        # 過去の日付の索引は捨てる
+        today_key = get_today_jst().isoformat()
+        for old_key in [k for k in registry["indexes"] if k < today_key and k != key]:
+            del registry["indexes"][old_key]
+
+        index = registry["indexes"].get(key)
+        if index is None:
+            index = OccupancyIndex(target_date, tables, times, conflict_rules)
+            registry["indexes"][key] = index
+
+        stale = (
+            index.built_at == 0.0
+            or (feed_version is not None and feed_version != index.feed_version)
+            or (feed_version is None and time_module.monotonic() - index.built_at >= OCCUPANCY_TTL_SEC)
+        )
+        if stale:
+            _build(index, feed_version)
+    return index
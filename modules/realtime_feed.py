@@ -0,0 +1,266 @@
+# modules/realtime_feed.py
+
+import asyncio
+import threading
+import time as time_module
+from datetime import timedelta
+
+import streamlit as st
+
+from .repository import InMemoryBackend, repos
+
+
+# 全日付のセッションを起こしたいとき（日付が特定できない DELETE など）に使うキー
+ALL_DATES = "*"
+
+# 監視するテーブル
+WATCHED_TABLES = ("course_reservations", "course_progress")
+
+# 画面側が変更の有無を確認する間隔。DB には問い合わせず、メモリ上のバージョンを見るだけ。
+WATCH_INTERVAL = timedelta(milliseconds=500)
+
+# 変更通知が無くても、この間隔（秒）で画面を再実行する（通知の取りこぼしに備える）。
+# board_snapshot も、この間隔で変更が無くてもフル同期する。
+FULL_SYNC_INTERVAL_SEC = 60
+
+# Realtime の接続・購読状態を確認する間隔（秒）
+HEALTH_CHECK_INTERVAL_SEC = 5
+
+# この時間つながらなければ、クライアントを作り直して接続し直す（秒）
+RECONNECT_AFTER_SEC = 30
+
+
+class ChangeFeed:
+    """
+    プロセス内の変更通知ハブ。
+
+    日付（"YYYY-MM-DD"）ごとにバージョン番号を持ち、変更が publish されるたびに +1 する。
+    各セッションは自分の見ている日付のバージョンだけを比較し、変わったときだけ再描画する。
+    Supabase Realtime を使わない環境（ローカル・テスト）では、このクラス単体で動く。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}          # date_key -> int
+        self._delete_versions = {}   # date_key -> int（削除があったときだけ増える）
+        self._table_versions = {}    # (table, date_key) -> int
+        self._reservation_dates = {} # reservation_id -> date_key
+        self._listeners = []         # 変更 1 件ごとに呼ぶ callback(table, event_type, record, old_record)
+        # 変更通知が届く状態か。購読が確認できるまでは False（画面はポーリングで動く）
+        self.is_live = False
+
+    # ---------- 通知 ----------
+
+    def publish(self, table: str, event_type: str, record: dict, old_record: dict = None):
+        """テーブルの変更 1 件を受け取り、影響する日付のバージョンを上げる。"""
+        row = record or old_record or {}
+        is_delete = (event_type or "").upper() == "DELETE"
+
+        # 集計などの購読者を先に更新しておく（バージョンが上がって再実行された画面が、更新後の値を読むように）
+        for callback in self._listeners:
+            callback(table, event_type, record, old_record)
+
+        with self._lock:
+            date_key = self._date_key_for(table, row)
+            self._bump(self._versions, date_key)
+            self._bump(self._table_versions, (table, date_key))
+            if is_delete:
+                self._bump(self._delete_versions, date_key)
+                if table == "course_reservations":
+                    # 消えた予約の進行の変更はもう来ないので、対応も忘れる
+                    self._reservation_dates.pop(row.get("id"), None)
+
+    def set_live(self, live: bool):
+        """
+        Realtime の購読状態を反映する。
+        つながったとき（つなぎ直したときも）は、切れていた間の変更を取りこぼしているかもしれないので、
+        全日付のバージョンと削除バージョンを上げて、キャッシュをフル同期させる。
+        """
+        with self._lock:
+            was_live = self.is_live
+            self.is_live = live
+            if live and not was_live:
+                self._bump(self._versions, ALL_DATES)
+                self._bump(self._delete_versions, ALL_DATES)
+
+    def subscribe(self, callback):
+        """
+        変更 1 件ごとに callback(table, event_type, record, old_record) を呼ぶ
+        （行の中身から集計を差分で更新したいとき用。modules/daily_summary.py）。
+        """
+        self._listeners.append(callback)
+
+    def _date_key_for(self, table: str, row: dict) -> str:
+        if table == "course_reservations":
+            reserved_at = row.get("reserved_at")
+            if reserved_at:
+                date_key = reserved_at[:10]
+                if row.get("id"):
+                    self._reservation_dates[row["id"]] = date_key
+                return date_key
+            return self._reservation_dates.get(row.get("id"), ALL_DATES)
+
+        if table == "course_progress":
+            return self._reservation_dates.get(row.get("reservation_id"), ALL_DATES)
+
+        return ALL_DATES
+
+    @staticmethod
+    def _bump(versions: dict, date_key: str):
+        versions[date_key] = versions.get(date_key, 0) + 1
+
+    def touch(self, date_key: str):
+        """DB の変更が無くても、その日付を見ている画面を再実行させる（書き込み失敗の通知など）。"""
+        with self._lock:
+            self._bump(self._versions, date_key)
+
+    def remember_reservation_dates(self, pairs):
+        """
+        (予約 ID, "YYYY-MM-DD") の組で、予約 ID → 日付の対応を覚えておく
+        （進行の変更をどの日付に通知するか決めるため）。
+        """
+        with self._lock:
+            for reservation_id, date_key in pairs:
+                self._reservation_dates[reservation_id] = date_key
+
+    def forget_dates_before(self, date_key: str):
+        """date_key より前の日付の予約 ID → 日付の対応を捨てる（日付が変わった後の掃除用。modules/janitor.py）。"""
+        with self._lock:
+            for reservation_id, reserved_date in list(self._reservation_dates.items()):
+                if reserved_date < date_key:
+                    del self._reservation_dates[reservation_id]
+
+    # ---------- 参照 ----------
+
+    def version(self, date_key: str) -> int:
+        with self._lock:
+            return self._versions.get(date_key, 0) + self._versions.get(ALL_DATES, 0)
+
+    def table_version(self, table: str, date_key: str) -> int:
+        """特定テーブルの変更だけを数えたバージョン。"""
+        with self._lock:
+            return (
+                self._table_versions.get((table, date_key), 0)
+                + self._table_versions.get((table, ALL_DATES), 0)
+            )
+
+    def delete_version(self, date_key: str) -> int:
+        with self._lock:
+            return self._delete_versions.get(date_key, 0) + self._delete_versions.get(ALL_DATES, 0)
+
+
+class SupabaseRealtimeListener:
+    """
+    Supabase Realtime の postgres_changes を購読し、ChangeFeed に流すバックグラウンドスレッド。
+    （Supabase 側で course_reservations / course_progress を Realtime の publication に追加しておくこと）
+    """
+
+    def __init__(self, feed: ChangeFeed):
+        self.feed = feed
+        self._thread = threading.Thread(target=self._run, name="supabase-realtime", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        # 接続できない・切れたまま戻らない場合はポーリングに戻し、しばらくしてから接続し直す
+        while True:
+            try:
+                asyncio.run(self._listen())
+            except Exception:
+                pass
+            self.feed.set_live(False)
+            time_module.sleep(RECONNECT_AFTER_SEC)
+
+    async def _listen(self):
+        from supabase import acreate_client
+        from .supabase_client import SUPABASE_URL, SUPABASE_API_KEY
+
+        client = await acreate_client(SUPABASE_URL, SUPABASE_API_KEY)
+        await client.realtime.connect()
+
+        channel = client.channel("course-board-changes")
+        for table in WATCHED_TABLES:
+            channel.on_postgres_changes(
+                "*",
+                schema="public",
+                table=table,
+                callback=self._on_change,
+            )
+        # SUBSCRIBED が返ってきたときだけ is_live にする（CHANNEL_ERROR / TIMED_OUT / CLOSED はポーリング）
+        await channel.subscribe(self._on_subscribe)
+
+        # 切断時の再接続は realtime クライアントに任せ、ここでは状態だけ見張る。
+        # ソケットが切れた・チャンネルから外れたときは購読のコールバックが呼ばれないことがあるので、
+        # 定期的に確認して is_live に反映する。長く戻らなければ作り直す（_run）。
+        down_since = None
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL_SEC)
+            if client.realtime.is_connected and channel.is_joined():
+                down_since = None
+                self.feed.set_live(True)
+                continue
+            self.feed.set_live(False)
+            down_since = down_since or time_module.monotonic()
+            if time_module.monotonic() - down_since >= RECONNECT_AFTER_SEC:
+                await client.realtime.close()
+                return
+
+    def _on_subscribe(self, status, error=None):
+        self.feed.set_live(status == "SUBSCRIBED")
+
+    def _on_change(self, payload: dict):
+        data = payload.get("data", payload)
+        self.feed.publish(
+            table=data.get("table"),
+            event_type=data.get("type") or data.get("eventType"),
+            record=data.get("record"),
+            old_record=data.get("old_record"),
+        )
+
+
+@st.cache_resource
+def get_change_feed() -> ChangeFeed:
+    """プロセス全体で 1 つの ChangeFeed を返す（初回だけ Realtime の購読を開始）。"""
+    feed = ChangeFeed()
+    client = repos().client
+    if isinstance(client, InMemoryBackend):
+        # メモリバックエンドでは、書き込みをそのまま変更通知として受け取る
+        client.subscribe(feed.publish)
+        feed.set_live(True)
+    else:
+        SupabaseRealtimeListener(feed).start()
+    return feed
+
+
+def watch_date(target_date, session_key: str):
+    """
+    指定日のバージョンが変わったときだけアプリ全体を再実行する監視フラグメントを置く。
+    変更が無い間は DB へのクエリは一切発生しない。
+
+    Realtime に接続できなかった場合は False を返すので、呼び出し側でポーリングに切り替える。
+    変更が無くても FULL_SYNC_INTERVAL_SEC ごとに再実行する（通知の取りこぼしで画面が止まらないように）。
+    """
+    feed = get_change_feed()
+    if not feed.is_live:
+        return False
+
+    date_key = target_date.isoformat()
+    state_key = f"{session_key}_seen_version"
+    st.session_state[state_key] = feed.version(date_key)
+    started_at = time_module.monotonic()
+
+    @st.fragment(run_every=WATCH_INTERVAL)
+    def _watch():
+        if not feed.is_live:
+            # 途中で Realtime が切れたら、全体を再実行してポーリングに切り替えさせる
+            st.rerun(scope="app")
+        if time_module.monotonic() - started_at >= FULL_SYNC_INTERVAL_SEC:
+            st.rerun(scope="app")
+        current = feed.version(date_key)
+        if current != st.session_state.get(state_key):
+            st.session_state[state_key] = current
+            st.rerun(scope="app")
+
+    _watch()
+    return True
@@ -0,0 +1,793 @@
+# modules/repository.py
+
+import copy
+import os
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+from .instrumentation import TracedClient
+from .stations import in_station
+from .time_utils import jst_day_bounds_utc, parse_dt
+
+
+# ==========================================================
+# バックエンド（Supabase / メモリ）
+# ==========================================================
+
+def _to_comparable(value):
+    """タイムスタンプ文字列は datetime（naive は UTC とみなす）にして比較できるようにする。"""
+    if isinstance(value, str) and len(value) >= 10 and value[4:5] == "-" and value[7:8] == "-":
+        try:
+            dt = parse_dt(value)
+        except ValueError:
+            return value
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+    return value
+
+
+def _sort_key(value):
+    # Postgres の昇順と同じく NULL は最後
+    return (value is None, _to_comparable(value) if value is not None else 0)
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class InMemoryQuery:
+    """
+    supabase-py（postgrest）のクエリビルダーと同じ書き方で使えるメモリ上のクエリ。
+    このリポジトリ層で使っているフィルタ・並び替え・一括操作だけを実装している。
+    """
+
+    def __init__(self, backend, table_name: str):
+        self._backend = backend
+        self._table_name = table_name
+        self._op = "select"
+        self._columns = None
+        self._payload = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._single = False
+
+    # ---- 操作 ----
+
+    def select(self, columns: str = "*"):
+        self._op = "select"
+        if columns.strip() != "*":
+            self._columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self._op = "insert"
+        self._payload = rows
+        return self
+
+    def update(self, data: dict):
+        self._op = "update"
+        self._payload = data
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    # ---- フィルタ ----
+
+    def _add(self, column, predicate):
+        self._filters.append((column, predicate))
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, lambda v: v is not None and _to_comparable(v) == _to_comparable(value))
+
+    def neq(self, column, value):
+        # SQL と同じく NULL は neq でも一致しない
+        return self._add(column, lambda v: v is not None and _to_comparable(v) != _to_comparable(value))
+
+    def in_(self, column, values):
+        values = {_to_comparable(v) for v in values}
+        return self._add(column, lambda v: v is not None and _to_comparable(v) in values)
+
+    def gt(self, column, value):
+        return self._add(column, lambda v: v is not None and _to_comparable(v) > _to_comparable(value))
+
+    def gte(self, column, value):
+        return self._add(column, lambda v: v is not None and _to_comparable(v) >= _to_comparable(value))
+
+    def lt(self, column, value):
+        return self._add(column, lambda v: v is not None and _to_comparable(v) < _to_comparable(value))
+
+    def lte(self, column, value):
+        return self._add(column, lambda v: v is not None and _to_comparable(v) <= _to_comparable(value))
+
+    def is_(self, column, value):
+        if value in (None, "null"):
+            return self._add(column, lambda v: v is None)
+        return self._add(column, lambda v: v is value)
+
+    def order(self, column, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    # ---- 実行 ----
+
+    def _matches(self, row):
+        return all(predicate(row.get(column)) for column, predicate in self._filters)
+
+    def _project(self, row):
+        if self._columns is None:
+            return copy.deepcopy(row)
+        return {c: copy.deepcopy(row.get(c)) for c in self._columns}
+
+    def execute(self):
+        with self._backend.lock:
+            data = self._execute_locked()
+        self._backend.record(self._table_name, data)
+
+        if self._op != "select":
+            event_type = {"insert": "INSERT", "update": "UPDATE", "delete": "DELETE"}[self._op]
+            for row in data:
+                if event_type == "DELETE":
+                    self._backend.notify(self._table_name, event_type, None, row)
+                else:
+                    self._backend.notify(self._table_name, event_type, row, None)
+        return _Result(data)
+
+    def _execute_locked(self):
+        rows = self._backend.tables.setdefault(self._table_name, [])
+
+        if self._op == "insert":
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            inserted = []
+            for data in payload:
+                row = self._backend.new_row(self._table_name, data)
+                rows.append(row)
+                inserted.append(copy.deepcopy(row))
+            return inserted
+
+        matched = [r for r in rows if self._matches(r)]
+
+        if self._op == "update":
+            now = self._backend.now_iso()
+            flag_timestamps = self._backend.FLAG_TIMESTAMPS.get(self._table_name, ())
+            for r in matched:
+                before = {flag: r.get(flag) for flag, _ in flag_timestamps}
+                r.update(copy.deepcopy(self._payload))
+                if self._table_name in self._backend.TIMESTAMPED_TABLES:
+                    r["updated_at"] = now
+                for flag, time_column in flag_timestamps:
+                    if r.get(flag) and not before[flag]:
+                        r[time_column] = self._backend.flag_time(r.get(time_column), now)
+                    elif not r.get(flag):
+                        r[time_column] = None
+            return [copy.deepcopy(r) for r in matched]
+
+        if self._op == "delete":
+            matched_ids = {id(r) for r in matched}
+            self._backend.tables[self._table_name] = [r for r in rows if id(r) not in matched_ids]
+            return [copy.deepcopy(r) for r in matched]
+
+        # select
+        for column, desc in reversed(self._order):
+            matched.sort(key=lambda r: _sort_key(r.get(column)), reverse=desc)
+        if self._limit is not None:
+            matched = matched[: self._limit]
+        data = [self._project(r) for r in matched]
+        if self._single:
+            if len(data) != 1:
+                raise ValueError(f"single() expected 1 row, got {len(data)}")
+            return data[0]
+        return data
+
+
+class InMemoryRpc:
+    def __init__(self, backend, name, params):
+        self._backend = backend
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        func = self._backend.functions[self._name]
+        with self._backend.lock:
+            data = func(self._backend, **self._params)
+            events, self._backend.pending_events = self._backend.pending_events, []
+        self._backend.record(f"rpc:{self._name}", data)
+
+        # 関数の中で書き込んだ行は、テーブルへの insert / update / delete と同じく変更通知する
+        for table_name, event_type, record, old_record in events:
+            self._backend.notify(table_name, event_type, record, old_record)
+        return _Result(data)
+
+
+class InMemoryBackend:
+    """
+    Supabase の代わりに使えるメモリ上のデータベース。
+    ネットワーク無しでのベンチマーク・負荷試験用。
+    クエリの往復回数と受け取った行数を stats に記録する。
+    """
+
+    # updated_at を自動で更新するテーブル（sql/001_add_updated_at.sql のトリガー相当）
+    TIMESTAMPED_TABLES = ("course_reservations", "course_progress")
+
+    # フラグが True になった時刻を DB 側で付ける列（sql/004 / sql/010_progress_flag_tap_time.sql 相当）
+    FLAG_TIMESTAMPS = {
+        "course_progress": (("is_cooked", "cooked_at"), ("is_served", "served_at")),
+    }
+
+    # 送られてきた時刻（ボタンを押した時刻）をそのまま使う範囲（sql/010）
+    FLAG_TAP_TIME_MAX_AGE = timedelta(days=1)
+
+    def __init__(self, tables=None):
+        self.lock = threading.RLock()
+        self.tables = copy.deepcopy(tables) if tables else {}
+        self.functions = {
+            "get_board_rows": _rpc_get_board_rows,
+            "get_timeline_rows": _rpc_get_timeline_rows,
+            "create_reservation_with_progress": _rpc_create_reservation_with_progress,
+            "update_reservation_with_mains": _rpc_update_reservation_with_mains,
+            "import_reservations_with_progress": _rpc_import_reservations_with_progress,
+        }
+        self.stats = {"round_trips": 0, "rows": 0, "by_table": {}}
+        self._listeners = []
+        self.pending_events = []   # rpc の関数の中で書き込んだ行（実行後に notify する）
+
+        now = self.now_iso()
+        for table_name in self.TIMESTAMPED_TABLES:
+            for row in self.tables.get(table_name, []):
+                row.setdefault("updated_at", now)
+
+    def subscribe(self, callback):
+        """
+        行の変更を callback(table, event_type, record, old_record) で通知する。
+        Supabase Realtime の postgres_changes の代わり（realtime_feed から使う）。
+        """
+        self._listeners.append(callback)
+
+    def notify(self, table_name: str, event_type: str, record: dict = None, old_record: dict = None):
+        for callback in self._listeners:
+            callback(table_name, event_type, record, old_record)
+
+    def table(self, table_name: str) -> InMemoryQuery:
+        return InMemoryQuery(self, table_name)
+
+    def rpc(self, name: str, params: dict = None) -> InMemoryRpc:
+        return InMemoryRpc(self, name, params or {})
+
+    def now_iso(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def flag_time(self, sent: str, now: str) -> str:
+        """フラグが True になった行の時刻（sql/010）。送られてきた時刻が過去 1 日以内ならそれを使う。"""
+        if not sent:
+            return now
+        try:
+            sent_dt, now_dt = parse_dt(sent), parse_dt(now)
+        except (TypeError, ValueError):
+            return now
+        if sent_dt.tzinfo is None or not (now_dt - self.FLAG_TAP_TIME_MAX_AGE <= sent_dt <= now_dt):
+            return now
+        return sent
+
+    def new_row(self, table_name: str, data: dict) -> dict:
+        row = copy.deepcopy(data)
+        row.setdefault("id", str(uuid.uuid4()))
+        now = self.now_iso()
+        row.setdefault("created_at", now)
+        if table_name in self.TIMESTAMPED_TABLES:
+            row["updated_at"] = now
+        return row
+
+    def insert_row(self, table_name: str, data: dict) -> dict:
+        """rpc の関数の中から 1 行登録する（lock を持った状態で呼ぶ）。"""
+        row = self.new_row(table_name, data)
+        self.tables.setdefault(table_name, []).append(row)
+        self.pending_events.append((table_name, "INSERT", copy.deepcopy(row), None))
+        return copy.deepcopy(row)
+
+    def update_row(self, table_name: str, row: dict, data: dict) -> dict:
+        """rpc の関数の中から、tables の行 row を更新する（lock を持った状態で呼ぶ）。"""
+        row.update(copy.deepcopy(data))
+        if table_name in self.TIMESTAMPED_TABLES:
+            row["updated_at"] = self.now_iso()
+        self.pending_events.append((table_name, "UPDATE", copy.deepcopy(row), None))
+        return copy.deepcopy(row)
+
+    def delete_rows(self, table_name: str, rows):
+        """rpc の関数の中から、tables の行をまとめて削除する（lock を持った状態で呼ぶ）。"""
+        ids = {id(r) for r in rows}
+        self.tables[table_name] = [r for r in self.tables.get(table_name, []) if id(r) not in ids]
+        for r in rows:
+            self.pending_events.append((table_name, "DELETE", None, copy.deepcopy(r)))
+
+    def record(self, key: str, data):
+        rows = len(data) if isinstance(data, list) else 1
+        self.stats["round_trips"] += 1
+        self.stats["rows"] += rows
+        per_table = self.stats["by_table"].setdefault(key, {"round_trips": 0, "rows": 0})
+        per_table["round_trips"] += 1
+        per_table["rows"] += rows
+
+    def reset_stats(self):
+        self.stats = {"round_trips": 0, "rows": 0, "by_table": {}}
+
+
+def _rpc_get_board_rows(backend, p_date, p_places, p_since=None, p_mains=None, p_table_prefixes=None):
+    """sql/005_board_rows_station.sql（get_board_rows）と同じ結果を返すメモリ版。"""
+    target_date = date.fromisoformat(p_date)
+    start = _to_comparable(datetime.combine(target_date, time(0, 0, 0)).isoformat())
+    end = _to_comparable(datetime.combine(target_date + timedelta(days=1), time(0, 0, 0)).isoformat())
+    since = _to_comparable(p_since) if p_since else None
+    places = set(p_places)
+
+    reservations = {r["id"]: r for r in backend.tables.get("course_reservations", [])}
+    items = {i["id"]: i for i in backend.tables.get("course_items", [])}
+
+    rows = []
+    for p in backend.tables.get("course_progress", []):
+        r = reservations.get(p["reservation_id"])
+        item = items.get(p["course_item_id"])
+        if r is None or item is None:
+            continue
+        if not (start <= _to_comparable(r["reserved_at"]) < end):
+            continue
+        if item.get("making_place") not in places:
+            continue
+        included = in_station(r, p, item, p_mains, p_table_prefixes)
+        if since is None:
+            if r.get("status") == "cancelled" or p.get("is_served") or not included:
+                continue
+        else:
+            changed_at = max(_to_comparable(p["updated_at"]), _to_comparable(r["updated_at"]))
+            if changed_at < since:
+                continue
+        rows.append({
+            "progress": copy.deepcopy(p),
+            "reservation": copy.deepcopy(r),
+            "item": {k: item.get(k) for k in ("id", "item_name", "offset_minutes", "making_place")},
+            "in_station": included,
+        })
+
+    rows.sort(key=lambda x: (_sort_key(x["reservation"]["reserved_at"]), _sort_key(x["progress"]["scheduled_time"])))
+    return rows
+
+
+def _rpc_get_timeline_rows(backend, p_date):
+    """sql/007_timeline_rows_jst.sql と同じ結果を返すメモリ版。"""
+    target_date = date.fromisoformat(p_date)
+    # reserved_at（JST の壁時計時刻）はその日の 0:00〜、cooked_at などの timestamptz は JST の 1 日で比べる
+    start, end = (_to_comparable(v) for v in _day_range(target_date))
+    ts_start, ts_end = (_to_comparable(v) for v in jst_day_bounds_utc(target_date))
+
+    def on_day(value):
+        return value is not None and start <= _to_comparable(value) < end
+
+    def on_day_ts(value):
+        return value is not None and ts_start <= _to_comparable(value) < ts_end
+
+    reservations = {r["id"]: r for r in backend.tables.get("course_reservations", [])}
+    items = {i["id"]: i for i in backend.tables.get("course_items", [])}
+
+    rows = []
+    for p in backend.tables.get("course_progress", []):
+        r = reservations.get(p["reservation_id"])
+        item = items.get(p["course_item_id"])
+        if r is None or item is None:
+            continue
+        if not (
+            (p.get("is_cooked") and on_day_ts(p.get("cooked_at")))
+            or (p.get("is_served") and on_day_ts(p.get("served_at")))
+        ):
+            continue
+        rows.append({
+            "progress": copy.deepcopy(p),
+            "reservation": copy.deepcopy(r),
+            "item": {k: item.get(k) for k in ("id", "item_name", "offset_minutes", "making_place")},
+        })
+
+    for r in reservations.values():
+        if r.get("status") == "arrived" and on_day(r.get("reserved_at")):
+            rows.append({"progress": None, "reservation": copy.deepcopy(r), "item": None})
+    return rows
+
+
+# course_reservations に登録する列（sql/008 の insert と同じ）
+_RESERVATION_COLUMNS = (
+    "course_id", "reserved_at", "guest_name", "guest_count", "table_no", "status", "note", "main_choice",
+)
+
+
+def _rpc_create_reservation_with_progress(backend, p_reservation, p_conflict_times, p_main_counts=None):
+    """sql/008_create_reservation_with_progress.sql と同じ処理をするメモリ版（lock の中で動くので一括）。"""
+    reserved_at = parse_dt(p_reservation["reserved_at"])
+    start, end = (_to_comparable(v) for v in _day_range(reserved_at.date()))
+    conflict_times = set(p_conflict_times)
+
+    for r in backend.tables.get("course_reservations", []):
+        if r.get("table_no") != p_reservation.get("table_no") or r.get("status") == "cancelled":
+            continue
+        if start <= _to_comparable(r["reserved_at"]) < end and r["reserved_at"][11:16] in conflict_times:
+            return {"conflict": True}
+
+    data = {c: p_reservation.get(c) for c in _RESERVATION_COLUMNS}
+    data["status"] = data["status"] or "reserved"
+    reservation = backend.insert_row("course_reservations", data)
+
+    main_counts = [m for m in (p_main_counts or []) if int(m["quantity"]) > 0]
+    items = [i for i in backend.tables.get("course_items", []) if i.get("course_id") == reservation["course_id"]]
+    progress_count = 0
+    for item in sorted(items, key=lambda i: _sort_key(i.get("display_order"))):
+        scheduled_time = (reserved_at + timedelta(minutes=int(item["offset_minutes"]))).isoformat()
+        details = main_counts if item["item_name"] == "メイン" and main_counts else [{"main_detail": None, "quantity": 1}]
+        for m in details:
+            backend.insert_row("course_progress", {
+                "reservation_id": reservation["id"],
+                "course_item_id": item["id"],
+                "scheduled_time": scheduled_time,
+                "is_cooked": False,
+                "is_served": False,
+                "main_detail": m["main_detail"],
+                "quantity": int(m["quantity"]),
+            })
+            progress_count += 1
+
+    return {"conflict": False, "reservation": reservation, "progress_count": progress_count}
+
+
+def _rpc_import_reservations_with_progress(backend, p_rows):
+    """sql/011_import_reservations_with_progress.sql と同じ処理をするメモリ版（行ごとに sql/008 のメモリ版を呼ぶ）。"""
+    return [
+        _rpc_create_reservation_with_progress(
+            backend, row["reservation"], row["conflict_times"], row.get("main_counts")
+        )
+        for row in p_rows
+    ]
+
+
+def _rpc_update_reservation_with_mains(backend, p_reservation_id, p_changes, p_conflict_times, p_main_counts=None):
+    """sql/009_update_reservation_with_mains.sql と同じ処理をするメモリ版。"""
+    current = next((r for r in backend.tables.get("course_reservations", []) if r["id"] == p_reservation_id), None)
+    if current is None:
+        return {"conflict": False, "reservation": None}
+
+    new = {**current, **{c: v for c, v in p_changes.items() if c in _RESERVATION_COLUMNS}}
+    start, end = (_to_comparable(v) for v in _day_range(parse_dt(new["reserved_at"]).date()))
+    conflict_times = set(p_conflict_times)
+    for r in backend.tables.get("course_reservations", []):
+        if r["id"] == p_reservation_id or r.get("table_no") != new.get("table_no") or r.get("status") == "cancelled":
+            continue
+        if start <= _to_comparable(r["reserved_at"]) < end and r["reserved_at"][11:16] in conflict_times:
+            return {"conflict": True}
+
+    reservation = backend.update_row(
+        "course_reservations",
+        current,
+        {c: new.get(c) for c in ("guest_name", "guest_count", "table_no", "status", "note", "main_choice")},
+    )
+
+    # メイン枠のあるべき内訳（main_detail -> quantity）
+    wanted = {m["main_detail"]: int(m["quantity"]) for m in (p_main_counts or []) if int(m["quantity"]) > 0}
+    if not wanted:
+        wanted = {None: 1}
+
+    main_items = [
+        i for i in backend.tables.get("course_items", [])
+        if i.get("course_id") == reservation["course_id"] and i["item_name"] == "メイン"
+    ]
+    main_item_ids = {i["id"] for i in main_items}
+    existing = [
+        p for p in backend.tables.get("course_progress", [])
+        if p["reservation_id"] == p_reservation_id and p["course_item_id"] in main_item_ids
+    ]
+
+    removed = [p for p in existing if p.get("main_detail") not in wanted]
+    backend.delete_rows("course_progress", removed)
+
+    updated = 0
+    for p in existing:
+        if p.get("main_detail") in wanted and p.get("quantity") != wanted[p.get("main_detail")]:
+            backend.update_row("course_progress", p, {"quantity": wanted[p.get("main_detail")]})
+            updated += 1
+
+    inserted = 0
+    reserved_at = parse_dt(reservation["reserved_at"])
+    for item in main_items:
+        have = {p.get("main_detail") for p in existing if p["course_item_id"] == item["id"]}
+        for main_detail, quantity in wanted.items():
+            if main_detail in have:
+                continue
+            backend.insert_row("course_progress", {
+                "reservation_id": p_reservation_id,
+                "course_item_id": item["id"],
+                "scheduled_time": (reserved_at + timedelta(minutes=int(item["offset_minutes"]))).isoformat(),
+                "is_cooked": False,
+                "is_served": False,
+                "main_detail": main_detail,
+                "quantity": quantity,
+            })
+            inserted += 1
+
+    return {
+        "conflict": False,
+        "reservation": reservation,
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": len(removed),
+    }
+
+
+# ==========================================================
+# リポジトリ
+# ==========================================================
+
+def _day_range(target_date: date):
+    """timestamp の列（reserved_at など、JST の壁時計時刻）をその日で絞る範囲。"""
+    start_dt = datetime.combine(target_date, time(0, 0, 0))
+    end_dt = datetime.combine(target_date + timedelta(days=1), time(0, 0, 0))
+    return start_dt.isoformat(), end_dt.isoformat()
+
+
+def _main_counts_param(main_counts):
+    """{"パスタ": 1, "ピザ": 2} を rpc の p_main_counts（[{"main_detail", "quantity"}, ...]）にする。"""
+    return [
+        {"main_detail": name, "quantity": int(cnt)}
+        for name, cnt in (main_counts or {}).items()
+        if cnt > 0
+    ]
+
+
+class ReservationRepository:
+    TABLE = "course_reservations"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self):
+        return self.client.table(self.TABLE)
+
+    def list_for_date(self, target_date: date, columns: str = "*", include_cancelled: bool = True):
+        start, end = _day_range(target_date)
+        query = (
+            self._table()
+            .select(columns)
+            .gte("reserved_at", start)
+            .lt("reserved_at", end)
+        )
+        if not include_cancelled:
+            query = query.neq("status", "cancelled")
+        return query.order("reserved_at", desc=False).execute().data or []
+
+    def list_before(self, before: datetime, limit: int, columns: str = "id"):
+        return (
+            self._table()
+            .select(columns)
+            .lt("reserved_at", before.isoformat())
+            .limit(limit)
+            .execute()
+        ).data or []
+
+    def create_with_progress(self, data: dict, conflict_times, main_counts=None) -> dict:
+        """
+        create_reservation_with_progress RPC（バッティング確認・予約・進行の作成を 1 往復・1 トランザクションで行う）。
+        main_counts は {"パスタ": 1, "ピザ": 2} の形。戻り値は sql/008 の説明を参照。
+        """
+        return self.client.rpc(
+            "create_reservation_with_progress",
+            {
+                "p_reservation": data,
+                "p_conflict_times": sorted(conflict_times),
+                "p_main_counts": _main_counts_param(main_counts),
+            },
+        ).execute().data
+
+    def import_with_progress(self, rows) -> list:
+        """
+        import_reservations_with_progress RPC（一括取り込みの 1 バッチを、テーブル・日のロックを取ったうえで
+        1 往復・1 トランザクションで登録する）。rows は (data, conflict_times, main_counts) の並び。
+        戻り値は rows と同じ順の create_with_progress の戻り値（sql/011 の説明を参照）。
+        """
+        if not rows:
+            return []
+        params = [
+            {
+                "reservation": data,
+                "conflict_times": sorted(conflict_times),
+                "main_counts": _main_counts_param(main_counts),
+            }
+            for data, conflict_times, main_counts in rows
+        ]
+        return self.client.rpc("import_reservations_with_progress", {"p_rows": params}).execute().data or []
+
+    def update_with_mains(self, reservation_id: str, data: dict, conflict_times, main_counts=None) -> dict:
+        """
+        update_reservation_with_mains RPC（バッティング確認・予約の更新・メイン枠の進行の差分反映を
+        1 往復・1 トランザクションで行う）。戻り値は sql/009 の説明を参照。
+        """
+        return self.client.rpc(
+            "update_reservation_with_mains",
+            {
+                "p_reservation_id": reservation_id,
+                "p_changes": data,
+                "p_conflict_times": sorted(conflict_times),
+                "p_main_counts": _main_counts_param(main_counts),
+            },
+        ).execute().data
+
+    def update(self, reservation_id: str, data: dict):
+        return self._table().update(data).eq("id", reservation_id).execute().data or []
+
+    def delete(self, reservation_id: str):
+        return self._table().delete().eq("id", reservation_id).execute().data or []
+
+    def delete_by_ids(self, ids):
+        if not ids:
+            return []
+        return self._table().delete().in_("id", list(ids)).execute().data or []
+
+
+class ProgressRepository:
+    TABLE = "course_progress"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self):
+        return self.client.table(self.TABLE)
+
+    def list_for_reservations(self, reservation_ids, columns: str = "*"):
+        if not reservation_ids:
+            return []
+        return (
+            self._table()
+            .select(columns)
+            .in_("reservation_id", list(reservation_ids))
+            .order("scheduled_time", desc=False)
+            .execute()
+        ).data or []
+
+    def board_rows(self, target_date: date, station, since: datetime = None):
+        """get_board_rows RPC（予約 × 進行 × 商品を、持ち場で絞って 1 往復で取得）。"""
+        return self.client.rpc(
+            "get_board_rows",
+            {
+                "p_date": target_date.isoformat(),
+                "p_since": since.isoformat() if since else None,
+                **station.rpc_params(),
+            },
+        ).execute().data or []
+
+    def timeline_rows(self, target_date: date):
+        """get_timeline_rows RPC（その日の調理済み・配膳済みの進行と来店済みの予約を 1 往復で取得）。"""
+        return self.client.rpc(
+            "get_timeline_rows",
+            {"p_date": target_date.isoformat()},
+        ).execute().data or []
+
+    def update(self, progress_id: str, data: dict):
+        return self._table().update(data).eq("id", progress_id).execute().data or []
+
+    def update_many(self, progress_ids, data: dict):
+        if not progress_ids:
+            return []
+        return self._table().update(data).in_("id", list(progress_ids)).execute().data or []
+
+    def delete_for_reservations(self, reservation_ids):
+        if not reservation_ids:
+            return []
+        return self._table().delete().in_("reservation_id", list(reservation_ids)).execute().data or []
+
+    def delete_for_item(self, item_id: str):
+        return self._table().delete().eq("course_item_id", item_id).execute().data or []
+
+
+class CourseRepository:
+    TABLE = "course_master"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self):
+        return self.client.table(self.TABLE)
+
+    def list_all(self):
+        return self._table().select("*").order("created_at", desc=False).execute().data or []
+
+    def insert(self, data: dict):
+        return self._table().insert(data).execute().data or []
+
+    def update(self, course_id: str, data: dict):
+        return self._table().update(data).eq("id", course_id).execute().data or []
+
+    def delete(self, course_id: str):
+        return self._table().delete().eq("id", course_id).execute().data or []
+
+
+class ItemRepository:
+    TABLE = "course_items"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self):
+        return self.client.table(self.TABLE)
+
+    def list_all(self):
+        return self._table().select("*").order("display_order", desc=False).execute().data or []
+
+    def list_for_course(self, course_id: str):
+        return (
+            self._table()
+            .select("*")
+            .eq("course_id", course_id)
+            .order("display_order", desc=False)
+            .execute()
+        ).data or []
+
+    def insert(self, data: dict):
+        return self._table().insert(data).execute().data or []
+
+    def update(self, item_id: str, data: dict):
+        return self._table().update(data).eq("id", item_id).execute().data or []
+
+    def delete(self, item_id: str):
+        return self._table().delete().eq("id", item_id).execute().data or []
+
+
+class Repositories:
+    """1 つのバックエンド（Supabase クライアント or InMemoryBackend）に対するリポジトリ一式。"""
+
+    def __init__(self, client):
+        self.client = client
+        # DB 呼び出しはすべて計測付きのクライアント経由にする（デバッグパネル用）
+        traced_client = TracedClient(client)
+        self.reservations = ReservationRepository(traced_client)
+        self.progress = ProgressRepository(traced_client)
+        self.courses = CourseRepository(traced_client)
+        self.items = ItemRepository(traced_client)
+
+
+# ==========================================================
+# バックエンドの切り替え
+# ==========================================================
+
+# COURSE_DATA_BACKEND=memory で起動すると、Supabase に接続せずメモリ上のデータで動く
+BACKEND_ENV = "COURSE_DATA_BACKEND"
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def use_backend(client) -> Repositories:
+    """使うバックエンドを差し替える（ベンチマーク・負荷試験用）。"""
+    global _current
+    with _current_lock:
+        _current = Repositories(client)
+    return _current
+
+
+def repos() -> Repositories:
+    """現在のバックエンドのリポジトリ一式を返す（未設定なら Supabase）。"""
+    global _current
+    if _current is None:
+        with _current_lock:
+            if _current is None:
+                if os.environ.get(BACKEND_ENV) == "memory":
+                    _current = Repositories(InMemoryBackend())
+                else:
+                    # Supabase の接続情報（st.secrets）は、実際に使うときだけ読み込む
+                    from .supabase_client import supabase
+                    _current = Repositories(supabase)
+    return _current
@@ -0,0 +1,75 @@
+# modules/stations.py
+
+# ==========================================================
+# 進行ボードの「持ち場」（どの端末に、どの商品を出すか）
+# ==========================================================
+
+# 商品マスタの作業場所（course_master の選択肢と同じ）
+ALL_PLACES = ("キッチン", "ピザ", "両方")
+
+
+class Station:
+    """
+    ボード 1 枚分の表示条件。条件はすべて get_board_rows の RPC に渡し、DB 側で絞り込む。
+
+    - places         : 作業場所（course_items.making_place）がこのどれかの商品だけ
+    - mains          : メイン枠の進行は、main_detail（無ければ予約の main_choice）に
+                       このどれかを含むものだけ。None なら絞らない
+    - table_prefixes : table_no がこのどれかで始まる予約だけ（フロア別）。None なら絞らない
+    """
+
+    def __init__(self, key: str, label: str, places, mains=None, table_prefixes=None):
+        self.key = key
+        self.label = label
+        self.places = tuple(places)
+        self.mains = tuple(mains) if mains else None
+        self.table_prefixes = tuple(table_prefixes) if table_prefixes else None
+
+    def includes(self, reservation: dict, progress: dict, item: dict) -> bool:
+        """この持ち場のボードに出る進行かどうか（get_board_rows の絞り込みと同じ判定）。"""
+        return item.get("making_place") in self.places and in_station(
+            reservation, progress, item, self.mains, self.table_prefixes
+        )
+
+    def rpc_params(self) -> dict:
+        return {
+            "p_places": list(self.places),
+            "p_mains": list(self.mains) if self.mains else None,
+            "p_table_prefixes": list(self.table_prefixes) if self.table_prefixes else None,
+        }
+
+
+def in_station(reservation: dict, progress: dict, item: dict, mains, table_prefixes) -> bool:
+    """sql/005_board_rows_station.sql の in_station と同じ判定（作業場所は見ない）。"""
+    if table_prefixes is not None:
+        table_no = reservation.get("table_no") or ""
+        if not any(table_no.startswith(prefix) for prefix in table_prefixes):
+            return False
+    if mains is not None and item.get("item_name") == "メイン":
+        main = progress.get("main_detail") or reservation.get("main_choice")
+        if main and not any(name in main for name in mains):
+            return False
+    return True
+
+
+STATIONS = {
+    s.key: s
+    for s in (
+        # ピザ場：ピザ・両方の商品と、ピザのメイン
+        Station("pizza", "ピザ", places=("ピザ", "両方"), mains=("ピザ",)),
+        # キッチン：キッチン・両方の商品と、ピザ以外のメイン
+        Station("kitchen", "キッチン", places=("キッチン", "両方"), mains=("パスタ",)),
+        # 両方：全商品（キッチン・ピザをまとめて見る端末用）
+        Station("all", "両方（全商品）", places=ALL_PLACES),
+        # フロア：そのフロアのテーブルの全商品（レコード席は 1F）
+        Station("floor1", "1F", places=ALL_PLACES, table_prefixes=("1-", "レコード")),
+        Station("floor2", "2F", places=ALL_PLACES, table_prefixes=("2-",)),
+    )
+}
+
+DEFAULT_STATION = "pizza"
+
+
+def get_station(key: str) -> Station:
+    """キーに対応する持ち場を返す（不明なキーはピザ場）。"""
+    return STATIONS.get(key) or STATIONS[DEFAULT_STATION]
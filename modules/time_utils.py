@@ -1,9 +1,116 @@
 # modules/time_utils.py
 
-from datetime import datetime, timedelta
+# ==========================================================
+# 日時の扱い
+#   DB の列は 2 種類ある。
+#   - timestamptz（cooked_at / served_at / arrived_at / updated_at など）
+#       Supabase からは "+00:00" 付きで返る。オフセットが無ければ UTC とみなす。
+#   - timestamp（reserved_at / scheduled_time）
+#       店の壁時計（JST）の時刻をタイムゾーン無しで保存している。
+#   画面で使うときは、どちらもタイムゾーン付きの JST（aware）にそろえる。
+# ==========================================================
 
-def get_today_jst():
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+
+JST = timezone(timedelta(hours=9), "JST")
+UTC = timezone.utc
+
+# 秒の小数部（桁数はまちまち: ".86786" など）とオフセット（"Z" / "+0000" / "+09"）
+_FRACTION_RE = re.compile(r"\.(\d+)")
+_OFFSET_RE = re.compile(r"(Z|[+-]\d{2}(?::?\d{2})?)$")
+
+
+def get_today_jst() -> date:
+    """サーバーのタイムゾーンによらず、JST の「今日の日付」を返す。"""
+    return datetime.now(JST).date()
+
+
+def get_now_jst() -> datetime:
+    """JST の現在時刻（タイムゾーン付き）を返す。"""
+    return datetime.now(JST)
+
+
+def now_utc_iso() -> str:
+    """DB（timestamptz）に書き込む現在時刻。オフセット付きなので、サーバーの時計の設定に左右されない。"""
+    return datetime.now(UTC).isoformat()
+
+
+@lru_cache(maxsize=8192)
+def _parse_iso(value: str) -> datetime:
+    # 同じ文字列（予定時刻・予約時刻など）は何度も出てくるので、結果を使い回す（datetime は不変）
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+
+    # fromisoformat が受け付けない形（古い Python の "Z"、6 桁でない小数部、"+0000" など）をそろえる
+    text = value.strip().replace(" ", "T", 1)
+    offset = ""
+    m = _OFFSET_RE.search(text)
+    if m and "T" in text[:m.start()]:
+        offset = m.group(1)
+        text = text[:m.start()]
+        if offset == "Z":
+            offset = "+00:00"
+        elif len(offset) == 3:
+            offset += ":00"
+        elif ":" not in offset:
+            offset = f"{offset[:3]}:{offset[3:]}"
+    text = _FRACTION_RE.sub(lambda f: "." + f.group(1)[:6].ljust(6, "0"), text)
+    return datetime.fromisoformat(text + offset)
+
+
+def parse_dt(value):
+    """
+    Supabase の日時文字列を datetime に変換する（オフセットがあれば aware、無ければ naive のまま）。
+    None・空文字は None。datetime はそのまま返す。
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return _parse_iso(value)
+
+
+def to_jst(dt):
+    """
+    datetime を JST（aware）に変換する。タイムゾーン無しは UTC とみなす（timestamptz の列用）。
+    None の場合はそのまま None。
+    """
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.astimezone(JST)
+
+
+# 一覧の行を読み込むときは同じ値が何度も出てくるので、JST への変換結果もまとめて使い回す
+# （数千行でも、解析・変換は異なる値の数だけで済む）
+
+@lru_cache(maxsize=8192)
+def parse_ts_jst(value):
+    """timestamptz の列（cooked_at など）を JST（aware）で返す。"""
+    return to_jst(parse_dt(value))
+
+
+@lru_cache(maxsize=8192)
+def parse_wall_jst(value):
+    """timestamp の列（reserved_at / scheduled_time。JST の壁時計時刻）を JST（aware）で返す。"""
+    dt = parse_dt(value)
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=JST)
+    return dt.astimezone(JST)
+
+
+def jst_day_bounds_utc(target_date: date):
     """
-    サーバーがUTCでも、JST（UTC+9）の「今日の日付」を返す。
+    JST の 1 日（0:00〜翌 0:00）を UTC の ISO 文字列 (start, end) で返す。
+    timestamptz の列を gte(start) / lt(end) で絞るときに使う（列をそのまま比べるのでインデックスが効く）。
     """
-    return (datetime.utcnow() + timedelta(hours=9)).date()
+    start = datetime.combine(target_date, time(0, 0), tzinfo=JST).astimezone(UTC)
+    end = start + timedelta(days=1)
+    return start.isoformat(), end.isoformat()
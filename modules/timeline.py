@@ -0,0 +1,181 @@
+# modules/timeline.py
+
+import threading
+import time as time_module
+from datetime import date
+
+import streamlit as st
+
+from .instrumentation import traced
+from .models import ProgressRow, ReservationRow
+from .realtime_feed import get_change_feed
+from .repository import repos
+
+
+# Realtime に接続できないとき（変更通知が来ないとき）に、同じ結果を使い回す時間（秒）。
+# 一覧のポーリング間隔（5 秒）と同じにして、端末が何台あっても 1 間隔 1 回の取得にする。
+POLL_TTL_SEC = 5
+
+# この時間どのセッションからも見られなかった日付は捨てる（秒）
+TIMELINE_IDLE_SEC = 600
+
+
+class TimelineEvent:
+    """
+    一覧に出す出来事の種類。
+    progress 側の出来事（調理済み・配膳済み）は flag_column / time_column で、
+    予約側の出来事（来店済み）は status で判定する。
+    """
+
+    def __init__(self, key: str, label: str, time_column: str, flag_column: str = None, status: str = None):
+        self.key = key
+        self.label = label
+        self.time_column = time_column
+        self.flag_column = flag_column
+        self.status = status
+
+    @property
+    def is_reservation_event(self) -> bool:
+        return self.status is not None
+
+
+EVENTS = {
+    e.key: e
+    for e in (
+        TimelineEvent("cooked", "調理済み", time_column="cooked_at", flag_column="is_cooked"),
+        TimelineEvent("served", "配膳済み", time_column="served_at", flag_column="is_served"),
+        TimelineEvent("arrived", "来店済み", time_column="arrived_at", status="arrived"),
+    )
+}
+
+
+class TimelineDay:
+    """
+    get_timeline_rows の結果（1 日分）。どの出来事の一覧もここから組み立てる。
+    行は ReservationRow / ProgressRow（modules/models.py）に変換し、進行は scheduled_time 順に持つ。
+    """
+
+    def __init__(self, target_date: date, rows):
+        self.target_date = target_date
+        self.reservations = {}   # reservation_id -> ReservationRow
+        self.progress = []       # (ProgressRow, item)
+        for row in rows:
+            r = ReservationRow(row["reservation"])
+            self.reservations[r.id] = r
+            if row.get("progress") is not None:
+                self.progress.append((ProgressRow(row["progress"]), row["item"]))
+        self.progress.sort(key=lambda x: x[0].scheduled_time)
+        self._entries = {}
+
+    def entries(self, event_key: str):
+        """
+        (予約の一覧, reservation_id -> その予約の出来事のリスト) を返す。
+        予約は「予約時間 → テーブル順」、出来事は scheduled_time 順。
+        出来事は {"progress", "item", "at"}（at は time_column の datetime、無ければ None）。
+        """
+        if event_key not in self._entries:
+            by_res = self._build_entries(EVENTS[event_key])
+            reservations = sorted((self.reservations[rid] for rid in by_res), key=lambda r: r.sort_key)
+            self._entries[event_key] = (reservations, by_res)
+        return self._entries[event_key]
+
+    def _build_entries(self, event: TimelineEvent):
+        by_res = {}
+        if event.is_reservation_event:
+            for r in self.reservations.values():
+                if r.status == event.status:
+                    by_res[r.id] = [{"progress": None, "item": None, "at": getattr(r, event.time_column)}]
+            return by_res
+
+        for p, item in self.progress:
+            if not getattr(p, event.flag_column):
+                continue
+            by_res.setdefault(p.reservation_id, []).append(
+                {"progress": p, "item": item, "at": getattr(p, event.time_column)}
+            )
+        return by_res
+
+
+class TimelineCache:
+    """
+    日付ごとの TimelineDay をプロセス全体で共有するキャッシュ。
+
+    ChangeFeed のその日付のバージョンが変わるまで（Realtime が無いときは POLL_TTL_SEC の間）
+    同じ結果を返す。同じ日付の取得が重なったときは 1 回だけ取得し、ほかはその結果を待つ。
+    """
+
+    def __init__(self, feed):
+        self._feed = feed
+        self._lock = threading.Lock()
+        self._entries = {}       # date_key -> (version, fetched_at, TimelineDay)
+        self._fetch_locks = {}   # date_key -> Lock（同じ日付の取得を 1 本にまとめる）
+        self._last_used = {}     # date_key -> monotonic
+
+    def get(self, target_date: date) -> TimelineDay:
+        date_key = target_date.isoformat()
+        now = time_module.monotonic()
+        with self._lock:
+            self._last_used[date_key] = now
+
+            # しばらく誰も見ていない日付は、取得用のロックごと捨てる
+            for old_key, used_at in list(self._last_used.items()):
+                if now - used_at >= TIMELINE_IDLE_SEC:
+                    self._entries.pop(old_key, None)
+                    self._fetch_locks.pop(old_key, None)
+                    self._last_used.pop(old_key, None)
+
+        cached = self._fresh(date_key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(date_key, threading.Lock())
+        with fetch_lock:
+            # 待っている間に別のセッションが取得し終えていれば、それを使う
+            cached = self._fresh(date_key)
+            if cached is not None:
+                return cached
+
+            # 取得中に届いた変更を取りこぼさないよう、バージョンは取得の前に読む
+            version = self._feed.version(date_key)
+            day = _fetch_timeline(target_date)
+            self._feed.remember_reservation_dates((r.id, r.date_key) for r in day.reservations.values())
+            with self._lock:
+                self._entries[date_key] = (version, time_module.monotonic(), day)
+            return day
+
+    def _fresh(self, date_key: str):
+        with self._lock:
+            entry = self._entries.get(date_key)
+        if entry is None:
+            return None
+        version, fetched_at, day = entry
+        if version != self._feed.version(date_key):
+            return None
+        if not self._feed.is_live and time_module.monotonic() - fetched_at >= POLL_TTL_SEC:
+            return None
+        return day
+
+    def invalidate(self, target_date: date):
+        """このアプリから書き込んだ直後に呼ぶ（Realtime の通知を待たずに読み直させる）。"""
+        with self._lock:
+            self._entries.pop(target_date.isoformat(), None)
+
+
+@traced()
+def _fetch_timeline(target_date: date) -> TimelineDay:
+    return TimelineDay(target_date, repos().progress.timeline_rows(target_date))
+
+
+@st.cache_resource
+def get_timeline_cache() -> TimelineCache:
+    """プロセス全体で 1 つのタイムラインキャッシュを返す。"""
+    return TimelineCache(get_change_feed())
+
+
+def get_timeline(target_date: date) -> TimelineDay:
+    return get_timeline_cache().get(target_date)
+
+
+def invalidate_timeline(target_date: date):
+    get_timeline_cache().invalidate(target_date)
@@ -0,0 +1,353 @@
+# modules/write_behind.py
+
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time as time_module
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from .realtime_feed import get_change_feed
+from .repository import ProgressRepository, ReservationRepository, repos
+
+
+# COURSE_WRITE_BEHIND=0 で起動すると、ボードの操作は従来どおりその場で書き込む
+ENABLED = os.environ.get("COURSE_WRITE_BEHIND", "1") != "0"
+
+# ボード操作の書き込みログ（SQLite）。同じマシンの Streamlit ワーカー（プロセス）で共有する
+LOG_PATH = os.environ.get(
+    "COURSE_WRITE_LOG",
+    os.path.join(tempfile.gettempdir(), "course_board_actions.sqlite3"),
+)
+LOCK_PATH = LOG_PATH + ".lock"
+
+# DB がエラーを返した書き込みの再試行回数（通信の失敗は回数に数えず、つながるまで待つ）
+MAX_ATTEMPTS = 3
+
+# 再試行までの待ち時間（秒、回数ごとに 2 倍、上限あり）
+RETRY_BACKOFF_SEC = 0.5
+RETRY_BACKOFF_MAX_SEC = 30
+
+# 送信済み・失敗の記録を残しておく期間
+KEEP_FINISHED = timedelta(days=1)
+
+
+def job_key(owner: str, table: str, row_ids, action: str, nonce: str) -> str:
+    """
+    冪等キー。同じ押下（ボードのコンポーネントが押下ごとに付ける nonce）からは同じ値になるので、
+    再実行や別のワーカーで同じイベントを二度 submit しても、ログには 1 回しか記録されない。
+    """
+    raw = json.dumps([owner, table, sorted(row_ids), action, nonce], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class WriteJob:
+    """
+    update 1 回分（同じ payload を row_ids の全行に書く）。key が冪等キーになる。
+    key を渡さなければ毎回別の操作として記録する（押下を特定できない呼び出し用）。
+    """
+
+    def __init__(self, owner: str, table: str, row_ids, payload: dict, label: str, date_key: str, key: str = None):
+        self.key = key or uuid.uuid4().hex
+        self.owner = owner          # 依頼したセッション（失敗の通知先）
+        self.table = table
+        self.row_ids = list(row_ids)
+        self.payload = dict(payload)
+        self.label = label          # エラー表示用（例: "調理フラグの更新"）
+        self.date_key = date_key
+        self.status = "pending"     # pending / done / failed
+        self.error = None
+        self.attempts = 0
+
+    @classmethod
+    def from_row(cls, row):
+        job = cls(
+            owner=row["owner"],
+            table=row["tbl"],
+            row_ids=json.loads(row["row_ids"]),
+            payload=json.loads(row["payload"]),
+            label=row["label"],
+            date_key=row["date_key"],
+            key=row["key"],
+        )
+        job.status = row["status"]
+        job.error = row["error"]
+        job.attempts = row["attempts"]
+        return job
+
+
+def write_now(table: str, row_ids, payload: dict):
+    """row_ids の全行に payload を書き込む（ワーカーと、write-behind 無効時の両方で使う）。"""
+    if table == ProgressRepository.TABLE:
+        repos().progress.update_many(row_ids, payload)
+    elif table == ReservationRepository.TABLE:
+        for row_id in row_ids:
+            repos().reservations.update(row_id, payload)
+    else:
+        raise ValueError(f"未対応のテーブルです: {table}")
+
+
+def _is_transient(exc: Exception) -> bool:
+    """通信の失敗（つながらない・タイムアウト）なら True。DB がエラーを返した場合は False。"""
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, OSError)
+
+
+class WriteAheadLog:
+    """
+    ボード操作を「先に」記録する SQLite のログ（board_actions テーブル）。
+
+    記録した順（seq）に Supabase へ送り、送れたら done にする。
+    key は冪等キーで、同じ操作を二重に記録しない。
+    アプリが落ちても未送信（pending）の操作は残り、次の起動時に続きから送られる。
+    """
+
+    def __init__(self, path: str = LOG_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.execute(
+                """
+                create table if not exists board_actions (
+                    seq        integer primary key autoincrement,
+                    key        text not null unique,
+                    owner      text not null,
+                    date_key   text not null,
+                    tbl        text not null,
+                    row_ids    text not null,
+                    payload    text not null,
+                    label      text not null,
+                    status     text not null default 'pending',
+                    attempts   integer not null default 0,
+                    error      text,
+                    notified   integer not null default 0,
+                    created_at text not null
+                )
+                """
+            )
+            conn.execute(
+                "create index if not exists idx_board_actions_status_seq on board_actions (status, seq)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # スレッドごとに別の接続が必要なので、呼び出しのたびに開く（ローカルファイルなので軽い）
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # 抜けるときに commit（例外なら rollback）
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, job: WriteJob):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                insert or ignore into board_actions
+                    (key, owner, date_key, tbl, row_ids, payload, label, created_at)
+                values (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job.key, job.owner, job.date_key, job.table,
+                    json.dumps(job.row_ids), json.dumps(job.payload, ensure_ascii=False),
+                    job.label, datetime.now().isoformat(),
+                ),
+            )
+
+    def next_pending(self):
+        with self._connect() as conn:
+            row = conn.execute(
+                "select * from board_actions where status = 'pending' order by seq limit 1"
+            ).fetchone()
+        return WriteJob.from_row(row) if row else None
+
+    def pending_for(self, date_key: str):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "select * from board_actions where status = 'pending' and date_key = ? order by seq",
+                (date_key,),
+            ).fetchall()
+        return [WriteJob.from_row(r) for r in rows]
+
+    def failure_count(self, date_key: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "select count(*) from board_actions where status = 'failed' and date_key = ?",
+                (date_key,),
+            ).fetchone()[0]
+
+    def record_attempt(self, key: str, error: str, counted: bool = True):
+        with self._connect() as conn:
+            conn.execute(
+                "update board_actions set attempts = attempts + ?, error = ? where key = ?",
+                (1 if counted else 0, error, key),
+            )
+
+    def mark_done(self, key: str):
+        with self._connect() as conn:
+            conn.execute(
+                "update board_actions set status = 'done', attempts = attempts + 1, error = null where key = ?",
+                (key,),
+            )
+
+    def mark_failed(self, key: str, error: str):
+        with self._connect() as conn:
+            conn.execute(
+                "update board_actions set status = 'failed', error = ? where key = ?",
+                (error, key),
+            )
+
+    def pop_failures(self, owner: str):
+        """owner のまだ表示していない失敗を返し、表示済みにする。"""
+        with self._connect() as conn:
+            # 読む前に書き込みロックを取る（読んだ後に更新へ上げると、ワーカーの書き込みと衝突して SQLITE_BUSY になる）
+            conn.execute("begin immediate")
+            rows = conn.execute(
+                "select * from board_actions where status = 'failed' and owner = ? and notified = 0 order by seq",
+                (owner,),
+            ).fetchall()
+            if rows:
+                # 読んだ行だけを表示済みにする（その間に増えた失敗は次回に返す）
+                seqs = [r["seq"] for r in rows]
+                conn.execute(
+                    f"update board_actions set notified = 1 where seq in ({', '.join('?' * len(seqs))})",
+                    seqs,
+                )
+        return [WriteJob.from_row(r) for r in rows]
+
+    def purge(self):
+        """送信済み・失敗の古い記録を消す。"""
+        before = (datetime.now() - KEEP_FINISHED).isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "delete from board_actions where status != 'pending' and created_at < ?",
+                (before,),
+            )
+
+
+class WriteBehindQueue:
+    """
+    ボードの操作を WriteAheadLog に記録し、1 本のワーカースレッドで記録順に Supabase へ送る。
+    画面側は送信を待たずに再描画できる。
+
+    - 通信の失敗（Supabase に届かない）は、つながるまで同じ操作を送り直す（順番は崩さない）
+    - DB がエラーを返した操作は MAX_ATTEMPTS 回で諦めて failed にし、
+      ChangeFeed のその日付を起こして画面を再実行させる（画面側でロールバックと表示）
+
+    複数プロセスで同じログを共有するので、送信はファイルロックを取れた 1 プロセスだけが行う。
+    """
+
+    def __init__(self, feed, log: WriteAheadLog):
+        self._feed = feed
+        self.log = log
+        self._offline_streak = 0  # 通信エラーが続いた回数（待ち時間の計算用）
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="course-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: WriteJob) -> WriteJob:
+        self.log.append(job)
+        self._wake.set()
+        return job
+
+    def _run(self):
+        while True:
+            # 起動直後は前回の残りを送る。その後は submit されるか 5 秒経つたびに確認する
+            try:
+                self._drain()
+            except Exception:
+                pass  # ロックファイル・SQLite の I/O エラーなど。次の確認で再試行する
+            self._wake.wait(timeout=5)
+            self._wake.clear()
+
+    def _drain(self):
+        with open(LOCK_PATH, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # 別のプロセスが送信中
+            try:
+                while True:
+                    job = self.log.next_pending()
+                    if job is None:
+                        break
+                    self._send(job)
+                self.log.purge()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _send(self, job: WriteJob):
+        try:
+            write_now(job.table, job.row_ids, job.payload)
+        except Exception as e:
+            if _is_transient(e):
+                # Supabase に届かない。記録は残したまま、つながるまで待って同じ操作を送り直す
+                self.log.record_attempt(job.key, str(e), counted=False)
+                delay = RETRY_BACKOFF_SEC * 2 ** self._offline_streak
+                self._offline_streak += 1
+            elif job.attempts + 1 >= MAX_ATTEMPTS:
+                self.log.mark_failed(job.key, str(e))
+                # 画面を再実行させ、スナップショットをフル同期（＝ロールバック）させる
+                self._feed.touch(job.date_key)
+                return
+            else:
+                self.log.record_attempt(job.key, str(e))
+                delay = RETRY_BACKOFF_SEC * 2 ** job.attempts
+            time_module.sleep(min(delay, RETRY_BACKOFF_MAX_SEC))
+            return
+
+        self._offline_streak = 0
+        self.log.mark_done(job.key)
+
+
+@st.cache_resource
+def get_write_queue() -> WriteBehindQueue:
+    """プロセス全体で 1 つの書き込みキューを返す（初回だけワーカーを起動）。"""
+    return WriteBehindQueue(get_change_feed(), WriteAheadLog())
+
+
+def _owner() -> str:
+    if "write_behind_owner" not in st.session_state:
+        st.session_state["write_behind_owner"] = uuid.uuid4().hex
+    return st.session_state["write_behind_owner"]
+
+
+def submit(table: str, row_ids, payload: dict, label: str, date_key: str, action: str = None, nonce: str = None) -> WriteJob:
+    """
+    このセッションからの操作をログに記録して WriteJob を返す（送信は待たない）。
+    nonce（押下ごとの値）と action を渡すと、同じ押下の二重記録を防ぐ（job_key）。
+
+    payload の cooked_at / served_at などは押した時刻のまま送る。オフラインの間に溜まった操作を
+    後から送っても、DB のトリガー（sql/010_progress_flag_tap_time.sql）がその時刻を残す。
+    """
+    owner = _owner()
+    key = job_key(owner, table, row_ids, action, nonce) if nonce else None
+    job = WriteJob(owner, table, row_ids, payload, label, date_key, key=key)
+    return get_write_queue().submit(job)
+
+
+def pending_for(date_key: str):
+    """その日付の、まだ Supabase に送れていない操作（全セッション分、記録順）。"""
+    return get_write_queue().log.pending_for(date_key)
+
+
+def failure_count(date_key: str) -> int:
+    return get_write_queue().log.failure_count(date_key)
+
+
+def pop_failures():
+    """このセッションの、前回表示以降に失敗した操作を返す。"""
+    return get_write_queue().log.pop_failures(_owner())
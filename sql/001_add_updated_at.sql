@@ -0,0 +1,35 @@
+-- sql/001_add_updated_at.sql
+-- ボードの差分同期（modules/board_snapshot.py）用に updated_at を追加する。
+-- Supabase の SQL Editor で一度だけ実行する。
+
+alter table course_reservations
+    add column if not exists updated_at timestamptz not null default now();
+
+alter table course_progress
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_course_reservations_updated_at on course_reservations;
+create trigger trg_course_reservations_updated_at
+    before update on course_reservations
+    for each row execute function set_updated_at();
+
+drop trigger if exists trg_course_progress_updated_at on course_progress;
+create trigger trg_course_progress_updated_at
+    before update on course_progress
+    for each row execute function set_updated_at();
+
+create index if not exists idx_course_reservations_reserved_at_updated_at
+    on course_reservations (reserved_at, updated_at);
+
+create index if not exists idx_course_progress_reservation_id_updated_at
+    on course_progress (reservation_id, updated_at);
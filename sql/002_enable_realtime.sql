@@ -0,0 +1,10 @@
+-- sql/002_enable_realtime.sql
+-- ボード画面のプッシュ更新（modules/realtime_feed.py）用に、
+-- course_reservations / course_progress の変更を Supabase Realtime に流す。
+
+alter publication supabase_realtime add table course_reservations;
+alter publication supabase_realtime add table course_progress;
+
+-- DELETE 時にも reservation_id / reserved_at を old_record に載せるため
+alter table course_reservations replica identity full;
+alter table course_progress replica identity full;
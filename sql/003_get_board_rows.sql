@@ -0,0 +1,38 @@
+-- sql/003_get_board_rows.sql
+-- 進行ボード用の 1 往復クエリ（modules/board_snapshot.py から rpc で呼ぶ）。
+--
+-- 指定日の予約 × 進行 × 商品を結合し、作業場所が p_places に含まれる行だけを返す。
+--   p_since が null : 表示対象（cancelled 以外の予約の、未配膳の進行）だけ
+--   p_since を指定  : 予約か進行の updated_at が p_since 以降の行（配膳済み・cancelled も含む。
+--                     クライアント側でスナップショットから外すため）
+
+create or replace function get_board_rows(
+    p_date date,
+    p_places text[],
+    p_since timestamptz default null
+)
+returns table (progress jsonb, reservation jsonb, item jsonb)
+language sql
+stable
+as $$
+    select
+        to_jsonb(p) as progress,
+        to_jsonb(r) as reservation,
+        jsonb_build_object(
+            'id', i.id,
+            'item_name', i.item_name,
+            'offset_minutes', i.offset_minutes,
+            'making_place', i.making_place
+        ) as item
+    from course_progress p
+    join course_reservations r on r.id = p.reservation_id
+    join course_items i on i.id = p.course_item_id
+    where r.reserved_at >= p_date::timestamp
+      and r.reserved_at < (p_date + 1)::timestamp
+      and i.making_place = any(p_places)
+      and (
+          (p_since is null and r.status is distinct from 'cancelled' and not p.is_served)
+          or (p_since is not null and greatest(p.updated_at, r.updated_at) >= p_since)
+      )
+    order by r.reserved_at, p.scheduled_time;
+$$;
@@ -0,0 +1,31 @@
+-- sql/004_progress_flag_timestamps.sql
+-- 調理済み・配膳済みの時刻（cooked_at / served_at）を DB 側の now() で付ける。
+-- 進行ボードの「まとめて操作」は複数行を 1 回の update で更新するので、
+-- 端末の時計ではなくサーバーの時刻にそろえる。
+-- Supabase の SQL Editor で一度だけ実行する。
+
+create or replace function set_progress_flag_timestamps()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.is_cooked and not coalesce(old.is_cooked, false) then
+        new.cooked_at := now();
+    elsif not new.is_cooked then
+        new.cooked_at := null;
+    end if;
+
+    if new.is_served and not coalesce(old.is_served, false) then
+        new.served_at := now();
+    elsif not new.is_served then
+        new.served_at := null;
+    end if;
+
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_course_progress_flag_timestamps on course_progress;
+create trigger trg_course_progress_flag_timestamps
+    before update on course_progress
+    for each row execute function set_progress_flag_timestamps();
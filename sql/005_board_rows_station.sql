@@ -0,0 +1,70 @@
+-- sql/005_board_rows_station.sql
+-- get_board_rows（sql/003_get_board_rows.sql）に持ち場の条件を追加する（modules/stations.py）。
+-- Supabase の SQL Editor で一度だけ実行する。
+--
+-- 追加した引数（null なら絞り込まない）
+--   p_mains          : メイン枠の進行は main_detail（無ければ予約の main_choice）に
+--                      このどれかを含むものだけ返す（例: ピザ場は {ピザ}）
+--   p_table_prefixes : table_no がこのどれかで始まる予約だけ返す（フロア別のボード）
+--
+-- p_since を指定したときは、条件から外れた行も in_station = false で返す
+-- （テーブル移動などで持ち場から外れた行を、クライアント側でスナップショットから外すため）。
+
+drop function if exists get_board_rows(date, text[], timestamptz);
+
+create or replace function get_board_rows(
+    p_date date,
+    p_places text[],
+    p_since timestamptz default null,
+    p_mains text[] default null,
+    p_table_prefixes text[] default null
+)
+returns table (progress jsonb, reservation jsonb, item jsonb, in_station boolean)
+language sql
+stable
+as $$
+    select progress, reservation, item, in_station
+    from (
+        select
+            to_jsonb(p) as progress,
+            to_jsonb(r) as reservation,
+            jsonb_build_object(
+                'id', i.id,
+                'item_name', i.item_name,
+                'offset_minutes', i.offset_minutes,
+                'making_place', i.making_place
+            ) as item,
+            (
+                (
+                    p_table_prefixes is null
+                    or exists (
+                        select 1 from unnest(p_table_prefixes) as t(prefix)
+                        where left(coalesce(r.table_no, ''), length(t.prefix)) = t.prefix
+                    )
+                )
+                and (
+                    p_mains is null
+                    or i.item_name <> 'メイン'
+                    or coalesce(nullif(p.main_detail, ''), nullif(r.main_choice, '')) is null
+                    or exists (
+                        select 1 from unnest(p_mains) as m(name)
+                        where position(m.name in coalesce(nullif(p.main_detail, ''), r.main_choice)) > 0
+                    )
+                )
+            ) as in_station,
+            r.reserved_at,
+            p.scheduled_time
+        from course_progress p
+        join course_reservations r on r.id = p.reservation_id
+        join course_items i on i.id = p.course_item_id
+        where r.reserved_at >= p_date::timestamp
+          and r.reserved_at < (p_date + 1)::timestamp
+          and i.making_place = any(p_places)
+          and (
+              (p_since is null and r.status is distinct from 'cancelled' and not p.is_served)
+              or (p_since is not null and greatest(p.updated_at, r.updated_at) >= p_since)
+          )
+    ) board
+    where p_since is not null or in_station
+    order by reserved_at, scheduled_time;
+$$;
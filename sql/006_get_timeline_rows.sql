@@ -0,0 +1,36 @@
+-- sql/006_get_timeline_rows.sql
+-- 調理済み・配膳済み・来店済み一覧用の 1 往復クエリ（modules/timeline.py から rpc で呼ぶ）。
+-- Supabase の SQL Editor で一度だけ実行する。
+--
+-- 指定日の出来事を 1 回で返し、どの一覧もこの結果から描画する。
+--   進行の行 : cooked_at か served_at がその日に入っている進行（予約・商品と結合）
+--   予約の行 : その日の来店済みの予約（progress / item は null）
+
+create or replace function get_timeline_rows(p_date date)
+returns table (progress jsonb, reservation jsonb, item jsonb)
+language sql
+stable
+as $$
+    select
+        to_jsonb(p) as progress,
+        to_jsonb(r) as reservation,
+        jsonb_build_object(
+            'id', i.id,
+            'item_name', i.item_name,
+            'offset_minutes', i.offset_minutes,
+            'making_place', i.making_place
+        ) as item
+    from course_progress p
+    join course_reservations r on r.id = p.reservation_id
+    join course_items i on i.id = p.course_item_id
+    where (p.is_cooked and p.cooked_at >= p_date::timestamp and p.cooked_at < (p_date + 1)::timestamp)
+       or (p.is_served and p.served_at >= p_date::timestamp and p.served_at < (p_date + 1)::timestamp)
+
+    union all
+
+    select null, to_jsonb(r), null
+    from course_reservations r
+    where r.status = 'arrived'
+      and r.reserved_at >= p_date::timestamp
+      and r.reserved_at < (p_date + 1)::timestamp;
+$$;
@@ -0,0 +1,46 @@
+-- sql/007_timeline_rows_jst.sql
+-- get_timeline_rows（sql/006_get_timeline_rows.sql）の日付の区切りを JST にする。
+-- Supabase の SQL Editor で一度だけ実行する。
+--
+-- cooked_at / served_at は timestamptz なので、p_date::timestamp と比べると
+-- セッションのタイムゾーン（Supabase は UTC）の 1 日になり、JST の 0:00〜9:00 がずれる。
+-- JST の 0:00〜翌 0:00 を timestamptz にしてから比べる（列はそのまま比べるのでインデックスが効く）。
+-- reserved_at は JST の壁時計時刻（timestamp）なので、これまでどおり p_date::timestamp と比べる。
+
+create or replace function get_timeline_rows(p_date date)
+returns table (progress jsonb, reservation jsonb, item jsonb)
+language sql
+stable
+as $$
+    with bounds as (
+        select
+            (p_date::timestamp at time zone 'Asia/Tokyo') as ts_start,
+            ((p_date + 1)::timestamp at time zone 'Asia/Tokyo') as ts_end
+    )
+    select
+        to_jsonb(p) as progress,
+        to_jsonb(r) as reservation,
+        jsonb_build_object(
+            'id', i.id,
+            'item_name', i.item_name,
+            'offset_minutes', i.offset_minutes,
+            'making_place', i.making_place
+        ) as item
+    from course_progress p
+    join course_reservations r on r.id = p.reservation_id
+    join course_items i on i.id = p.course_item_id
+    cross join bounds b
+    where (p.is_cooked and p.cooked_at >= b.ts_start and p.cooked_at < b.ts_end)
+       or (p.is_served and p.served_at >= b.ts_start and p.served_at < b.ts_end)
+
+    union all
+
+    select null, to_jsonb(r), null
+    from course_reservations r
+    where r.status = 'arrived'
+      and r.reserved_at >= p_date::timestamp
+      and r.reserved_at < (p_date + 1)::timestamp;
+$$;
+
+create index if not exists idx_course_progress_cooked_at on course_progress (cooked_at) where is_cooked;
+create index if not exists idx_course_progress_served_at on course_progress (served_at) where is_served;
@@ -0,0 +1,82 @@
+-- sql/008_create_reservation_with_progress.sql
+-- 予約の登録を 1 往復・1 トランザクションにする（modules/course_reservation.py から rpc で呼ぶ）。
+-- Supabase の SQL Editor で一度だけ実行する。
+--
+-- バッティングの確認 → 予約の insert → コースの商品ごとの course_progress の insert をまとめて行う。
+-- 途中で失敗すると全体が取り消されるので、「予約だけあって進行が無い」状態にはならない。
+--
+--   p_reservation    : course_reservations に入れる列（course_id / reserved_at / table_no など）
+--   p_conflict_times : 同じテーブルにあると登録できない予約時間（"HH24:MI"。TIME_CONFLICT_RULES の値）
+--   p_main_counts    : メイン枠の内訳 [{"main_detail": "ピザ", "quantity": 2}, ...]
+--                      空ならメイン枠も 1 行（quantity 1）で作る
+--
+-- 戻り値: バッティングしていれば {"conflict": true}
+--         登録できたら {"conflict": false, "reservation": 登録した予約, "progress_count": 進行の行数}
+
+create or replace function create_reservation_with_progress(
+    p_reservation jsonb,
+    p_conflict_times text[],
+    p_main_counts jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_reserved_at timestamp := (p_reservation->>'reserved_at')::timestamp;
+    v_table_no text := p_reservation->>'table_no';
+    v_reservation course_reservations;
+    v_progress_count integer;
+begin
+    -- 同じテーブル・同じ日の登録を 1 本ずつにする（確認から登録までの間に別の端末が割り込まないように）
+    perform pg_advisory_xact_lock(hashtext(v_table_no || '/' || v_reserved_at::date::text));
+
+    if exists (
+        select 1
+        from course_reservations r
+        where r.table_no = v_table_no
+          and r.reserved_at >= v_reserved_at::date
+          and r.reserved_at < v_reserved_at::date + 1
+          and r.status is distinct from 'cancelled'
+          and to_char(r.reserved_at, 'HH24:MI') = any(p_conflict_times)
+    ) then
+        return jsonb_build_object('conflict', true);
+    end if;
+
+    insert into course_reservations (
+        course_id, reserved_at, guest_name, guest_count, table_no, status, note, main_choice
+    )
+    select course_id, reserved_at, guest_name, guest_count, table_no,
+           coalesce(status, 'reserved'), note, main_choice
+    from jsonb_populate_record(null::course_reservations, p_reservation)
+    returning * into v_reservation;
+
+    -- メイン枠は内訳ごとに 1 行、それ以外の商品は 1 行ずつ
+    insert into course_progress (
+        reservation_id, course_item_id, scheduled_time, is_cooked, is_served, main_detail, quantity
+    )
+    select
+        v_reservation.id,
+        i.id,
+        v_reservation.reserved_at + make_interval(mins => i.offset_minutes),
+        false,
+        false,
+        m.main_detail,
+        coalesce(m.quantity, 1)
+    from course_items i
+    left join lateral (
+        select x->>'main_detail' as main_detail, (x->>'quantity')::int as quantity
+        from jsonb_array_elements(p_main_counts) x
+        where i.item_name = 'メイン'
+          and (x->>'quantity')::int > 0
+    ) m on true
+    where i.course_id = v_reservation.course_id;
+
+    get diagnostics v_progress_count = row_count;
+
+    return jsonb_build_object(
+        'conflict', false,
+        'reservation', to_jsonb(v_reservation),
+        'progress_count', v_progress_count
+    );
+end;
+$$;
@@ -0,0 +1,136 @@
+-- sql/009_update_reservation_with_mains.sql
+-- 予約の編集を 1 往復・1 トランザクションにする（modules/course_reservation.py から rpc で呼ぶ）。
+-- Supabase の SQL Editor で一度だけ実行する。
+--
+-- バッティングの確認 → 予約の update → メイン枠の course_progress の差分反映をまとめて行う。
+-- メイン枠は作り直さず、内訳（main_detail）ごとに
+--   - 皿数が変わった行は quantity だけ更新（is_cooked / cooked_at などはそのまま）
+--   - 新しく増えた内訳は insert
+--   - 無くなった内訳は delete
+-- とするので、調理済みのメインの状態は消えない。
+--
+--   p_reservation_id : 編集する予約
+--   p_changes        : 上書きする列（guest_name / guest_count / table_no / status / note / main_choice）
+--   p_conflict_times : 同じテーブルにあると変更できない予約時間（"HH24:MI"。TIME_CONFLICT_RULES の値）
+--   p_main_counts    : メイン枠の内訳 [{"main_detail": "ピザ", "quantity": 2}, ...]
+--                      空ならメイン枠は main_detail 無しの 1 行（quantity 1。予約登録時と同じ）
+--
+-- 戻り値: 予約が無ければ {"conflict": false, "reservation": null}
+--         バッティングしていれば {"conflict": true}
+--         更新できたら {"conflict": false, "reservation": 更新後の予約, "inserted": n, "updated": n, "deleted": n}
+
+create or replace function update_reservation_with_mains(
+    p_reservation_id uuid,
+    p_changes jsonb,
+    p_conflict_times text[],
+    p_main_counts jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_current course_reservations;
+    v_new course_reservations;
+    v_wanted jsonb;
+    v_inserted integer;
+    v_updated integer;
+    v_deleted integer;
+begin
+    select * into v_current from course_reservations where id = p_reservation_id for update;
+    if not found then
+        return jsonb_build_object('conflict', false, 'reservation', null);
+    end if;
+
+    -- p_changes に含まれる列だけを上書きした行
+    v_new := jsonb_populate_record(v_current, p_changes);
+
+    -- 同じテーブル・同じ日の登録・変更を 1 本ずつにする（sql/008 と同じロック）
+    perform pg_advisory_xact_lock(hashtext(v_new.table_no || '/' || v_new.reserved_at::date::text));
+
+    if exists (
+        select 1
+        from course_reservations r
+        where r.id <> p_reservation_id
+          and r.table_no = v_new.table_no
+          and r.reserved_at >= v_new.reserved_at::date
+          and r.reserved_at < v_new.reserved_at::date + 1
+          and r.status is distinct from 'cancelled'
+          and to_char(r.reserved_at, 'HH24:MI') = any(p_conflict_times)
+    ) then
+        return jsonb_build_object('conflict', true);
+    end if;
+
+    update course_reservations
+    set guest_name = v_new.guest_name,
+        guest_count = v_new.guest_count,
+        table_no = v_new.table_no,
+        status = v_new.status,
+        note = v_new.note,
+        main_choice = v_new.main_choice
+    where id = p_reservation_id
+    returning * into v_new;
+
+    -- メイン枠のあるべき内訳
+    v_wanted := coalesce(
+        (select jsonb_agg(x) from jsonb_array_elements(p_main_counts) x where (x->>'quantity')::int > 0),
+        '[{"main_detail": null, "quantity": 1}]'::jsonb
+    );
+
+    -- 無くなった内訳
+    delete from course_progress p
+    using course_items i
+    where p.reservation_id = p_reservation_id
+      and i.id = p.course_item_id
+      and i.course_id = v_new.course_id
+      and i.item_name = 'メイン'
+      and not exists (
+          select 1 from jsonb_to_recordset(v_wanted) w(main_detail text, quantity int)
+          where w.main_detail is not distinct from p.main_detail
+      );
+    get diagnostics v_deleted = row_count;
+
+    -- 皿数が変わった内訳（ほかの列はそのまま）
+    update course_progress p
+    set quantity = w.quantity
+    from course_items i, jsonb_to_recordset(v_wanted) w(main_detail text, quantity int)
+    where p.reservation_id = p_reservation_id
+      and i.id = p.course_item_id
+      and i.course_id = v_new.course_id
+      and i.item_name = 'メイン'
+      and w.main_detail is not distinct from p.main_detail
+      and p.quantity is distinct from w.quantity;
+    get diagnostics v_updated = row_count;
+
+    -- 新しく増えた内訳
+    insert into course_progress (
+        reservation_id, course_item_id, scheduled_time, is_cooked, is_served, main_detail, quantity
+    )
+    select
+        p_reservation_id,
+        i.id,
+        v_new.reserved_at + make_interval(mins => i.offset_minutes),
+        false,
+        false,
+        w.main_detail,
+        w.quantity
+    from course_items i
+    cross join jsonb_to_recordset(v_wanted) w(main_detail text, quantity int)
+    where i.course_id = v_new.course_id
+      and i.item_name = 'メイン'
+      and not exists (
+          select 1 from course_progress p
+          where p.reservation_id = p_reservation_id
+            and p.course_item_id = i.id
+            and p.main_detail is not distinct from w.main_detail
+      );
+    get diagnostics v_inserted = row_count;
+
+    return jsonb_build_object(
+        'conflict', false,
+        'reservation', to_jsonb(v_new),
+        'inserted', v_inserted,
+        'updated', v_updated,
+        'deleted', v_deleted
+    );
+end;
+$$;
@@ -0,0 +1,42 @@
+-- sql/010_progress_flag_tap_time.sql
+-- sql/004_progress_flag_timestamps.sql のトリガーを置き換え、cooked_at / served_at に
+-- 「ボタンを押した時刻」（送られてきた値）を残せるようにする。
+-- Supabase の SQL Editor で一度だけ実行する（sql/004 の後）。
+--
+-- ボードの操作は write-behind（modules/write_behind.py）で後から送られるので、
+-- 通信が切れていた間の操作は、つながった時刻にまとめて届く。now() で付け直すと
+-- 調理済み・配膳済みの時刻がすべて「再送した時刻」になってしまう。
+--
+--   - フラグが true になった行で、送られてきた時刻が過去 1 日以内ならその時刻を使う
+--     （まとめて操作は全行に同じ値を送るので、時刻はそろったまま）
+--   - 時刻が無い・未来（端末の時計が進んでいる）・古すぎるときは now()
+--   - フラグが false になったら null
+
+create or replace function set_progress_flag_timestamps()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.is_cooked and not coalesce(old.is_cooked, false) then
+        if new.cooked_at is null
+           or new.cooked_at > now()
+           or new.cooked_at < now() - interval '1 day' then
+            new.cooked_at := now();
+        end if;
+    elsif not new.is_cooked then
+        new.cooked_at := null;
+    end if;
+
+    if new.is_served and not coalesce(old.is_served, false) then
+        if new.served_at is null
+           or new.served_at > now()
+           or new.served_at < now() - interval '1 day' then
+            new.served_at := now();
+        end if;
+    elsif not new.is_served then
+        new.served_at := null;
+    end if;
+
+    return new;
+end;
+$$;
@@ -0,0 +1,49 @@
+-- sql/011_import_reservations_with_progress.sql
+-- CSV 一括取り込み（modules/course_reservation.py の import_reservations）の 1 バッチを
+-- 1 往復・1 トランザクションで登録する。sql/008 の create_reservation_with_progress を使うので、先にそちらを実行しておく。
+-- Supabase の SQL Editor で一度だけ実行する。
+--
+-- バッチに含まれるテーブル・日付の advisory lock（sql/008 / sql/009 と同じキー）を先にまとめて取り、
+-- 行ごとに「バッティングの確認 → 予約の insert → 進行の insert」を行う。
+--   - 確認と登録の間に別の端末が同じテーブル・日に割り込むことはない
+--   - 同じバッチの前の行も確認の対象になる
+--   - 途中でエラーになるとバッチ全体が取り消される（予約だけが残ることはない）
+-- ロックはキーの順に取るので、別の端末の一括取り込みと重なってもデッドロックしない。
+--
+--   p_rows : [{"reservation": {...}, "conflict_times": ["18:00", ...], "main_counts": [...]}, ...]
+--            各要素は create_reservation_with_progress の引数と同じ形
+--
+-- 戻り値: p_rows と同じ順の配列。要素は create_reservation_with_progress の戻り値
+--         （{"conflict": true} または {"conflict": false, "reservation": ..., "progress_count": n}）
+
+create or replace function import_reservations_with_progress(p_rows jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_lock_key text;
+    v_row jsonb;
+    v_results jsonb := '[]'::jsonb;
+begin
+    for v_lock_key in
+        select distinct (x->'reservation'->>'table_no') || '/' || ((x->'reservation'->>'reserved_at')::timestamp)::date::text
+        from jsonb_array_elements(p_rows) x
+        order by 1
+    loop
+        perform pg_advisory_xact_lock(hashtext(v_lock_key));
+    end loop;
+
+    for v_row in select x from jsonb_array_elements(p_rows) x
+    loop
+        v_results := v_results || jsonb_build_array(
+            create_reservation_with_progress(
+                v_row->'reservation',
+                array(select jsonb_array_elements_text(v_row->'conflict_times')),
+                coalesce(v_row->'main_counts', '[]'::jsonb)
+            )
+        );
+    end loop;
+
+    return v_results;
+end;
+$$;
@@ -0,0 +1,72 @@
+# tests/conftest.py
+"""
+InMemoryBackend を使うテストの共通設定（Supabase には接続しない）。
+
+    python -m pytest -q
+"""
+
+import logging
+
+import pytest
+
+from modules import board_snapshot, catalog_cache, daily_summary, occupancy, realtime_feed, timeline
+from modules.repository import InMemoryBackend, use_backend
+
+
+# st.cache_resource を Streamlit の実行環境の外で使うと出る警告を抑える
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+def _reset_process_caches():
+    # use_backend() で差し替えても、プロセス全体のキャッシュは前のバックエンドのデータ・購読を持ったままなので捨てる
+    for cached in (
+        realtime_feed.get_change_feed,
+        timeline.get_timeline_cache,
+        board_snapshot.get_board_snapshot_cache,
+        occupancy._registry,
+        daily_summary.get_summary_registry,
+    ):
+        cached.clear()
+    catalog_cache.invalidate_catalog()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_caches():
+    _reset_process_caches()
+    yield
+    _reset_process_caches()
+
+
+@pytest.fixture
+def make_backend():
+    """tables dict から InMemoryBackend を作り、repos() の接続先にする。"""
+    def make(tables=None) -> InMemoryBackend:
+        backend = InMemoryBackend(tables)
+        use_backend(backend)
+        _reset_process_caches()
+        return backend
+    return make
+
+
+# メイン枠のあるコース 1 つ（前菜 → メイン → デザート）
+COURSE_TABLES = {
+    "course_master": [
+        {"id": "c1", "name": "Aコース", "is_active": True, "created_at": "2025-01-01T00:00:00+00:00"},
+    ],
+    "course_items": [
+        {"id": "i1", "course_id": "c1", "display_order": 1, "item_name": "前菜",
+         "offset_minutes": 0, "making_place": "キッチン"},
+        {"id": "i2", "course_id": "c1", "display_order": 2, "item_name": "メイン",
+         "offset_minutes": 30, "making_place": "両方"},
+        {"id": "i3", "course_id": "c1", "display_order": 3, "item_name": "デザート",
+         "offset_minutes": 60, "making_place": "キッチン"},
+    ],
+    "course_reservations": [],
+    "course_progress": [],
+}
+
+
+@pytest.fixture
+def course_backend(make_backend) -> InMemoryBackend:
+    """COURSE_TABLES だけが入ったバックエンド（予約は空）。"""
+    return make_backend(COURSE_TABLES)
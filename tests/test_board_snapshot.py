@@ -0,0 +1,103 @@
+# tests/test_board_snapshot.py
+
+from benchmarks.synthetic_day import SyntheticDayConfig, build_day
+from modules.board_snapshot import BoardSnapshot, get_board_snapshot
+from modules.realtime_feed import get_change_feed
+from modules.repository import repos
+from modules.stations import DEFAULT_STATION, get_station
+from modules.time_utils import get_today_jst, parse_wall_jst
+
+
+def _expected_progress_ids(backend, target_date, station):
+    """テーブルから直接求めた、ボードに出るはずの進行（cancelled 以外・未配膳・持ち場の条件に合う）。"""
+    reservations = {
+        r["id"]: r
+        for r in backend.tables["course_reservations"]
+        if r.get("status") != "cancelled" and parse_wall_jst(r["reserved_at"]).date() == target_date
+    }
+    items = {i["id"]: i for i in backend.tables["course_items"]}
+    return {
+        p["id"]
+        for p in backend.tables["course_progress"]
+        if p["reservation_id"] in reservations
+        and not p.get("is_served")
+        and station.includes(reservations[p["reservation_id"]], p, items[p["course_item_id"]])
+    }
+
+
+def test_full_sync_matches_tables(make_backend):
+    today = get_today_jst()
+    backend = make_backend(build_day(today, SyntheticDayConfig(reservations=40)))
+    station = get_station(DEFAULT_STATION)
+
+    snapshot = BoardSnapshot(today, station)
+    assert snapshot.sync() is True
+
+    expected = _expected_progress_ids(backend, today, station)
+    assert set(snapshot.progress) == expected
+    assert set(snapshot.reservations) == {p.reservation_id for p in snapshot.progress.values()}
+
+
+def test_delta_sync_drops_served_and_cancelled(make_backend):
+    today = get_today_jst()
+    backend = make_backend(build_day(today, SyntheticDayConfig(reservations=20)))
+    snapshot = get_board_snapshot(today)
+    snapshot.sync()
+
+    served_id = next(iter(snapshot.progress))
+    cancelled_id = next(r.id for r in snapshot.reservations.values() if r.id != snapshot.progress[served_id].reservation_id)
+    repos().progress.update(served_id, {"is_served": True})
+    repos().reservations.update(cancelled_id, {"status": "cancelled"})
+
+    backend.reset_stats()
+    assert snapshot.sync() is True
+    # 変更通知を受けて差分だけ取り直す（get_board_rows 1 回）
+    assert backend.stats["round_trips"] == 1
+
+    assert served_id not in snapshot.progress
+    assert cancelled_id not in snapshot.reservations
+    assert all(p.reservation_id != cancelled_id for p in snapshot.progress.values())
+    assert set(snapshot.progress) == _expected_progress_ids(backend, today, snapshot.station)
+
+
+def test_sync_skips_fetch_without_changes(make_backend):
+    today = get_today_jst()
+    backend = make_backend(build_day(today, SyntheticDayConfig(reservations=10)))
+    assert get_change_feed().is_live
+
+    snapshot = get_board_snapshot(today)
+    snapshot.sync()
+    backend.reset_stats()
+    assert snapshot.sync() is False
+    assert backend.stats["round_trips"] == 0
+
+
+def test_merge_keeps_rows_out_of_station_off_the_board(make_backend):
+    today = get_today_jst()
+    make_backend(build_day(today, SyntheticDayConfig(reservations=5)))
+    snapshot = BoardSnapshot(today)
+    snapshot.sync()
+
+    progress = next(iter(snapshot.progress.values()))
+    reservation = snapshot.reservations[progress.reservation_id]
+    row = {
+        "progress": {
+            "id": progress.id,
+            "reservation_id": reservation.id,
+            "course_item_id": progress.course_item_id,
+            "scheduled_time": progress.scheduled_time.isoformat(),
+            "is_cooked": False,
+            "is_served": False,
+            "quantity": 1,
+        },
+        "reservation": {
+            "id": reservation.id,
+            "reserved_at": reservation.reserved_at.isoformat(),
+            "table_no": reservation.table_no,
+            "status": "reserved",
+        },
+        "item": snapshot.items[progress.course_item_id],
+        "in_station": False,
+    }
+    snapshot._merge([row])
+    assert progress.id not in snapshot.progress
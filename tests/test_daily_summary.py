@@ -0,0 +1,135 @@
+# tests/test_daily_summary.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.synthetic_day import SyntheticDayConfig, build_day
+from modules import daily_summary
+from modules.course_reservation import create_reservation_and_progress, delete_reservation, update_reservation_basic
+from modules.daily_summary import DailySummary, DailySummaryRegistry, get_daily_summary
+from modules.realtime_feed import get_change_feed
+from modules.repository import repos
+from modules.time_utils import get_today_jst, parse_wall_jst
+
+
+@pytest.fixture
+def day_backend(make_backend):
+    return make_backend(build_day(get_today_jst(), SyntheticDayConfig(reservations=40)))
+
+
+def _rebuilt_counts(target_date):
+    summary = DailySummary(target_date)
+    summary.rebuild()
+    return summary.counts()
+
+
+def _reservations(backend, target_date):
+    return [
+        r for r in backend.tables["course_reservations"]
+        if parse_wall_jst(r["reserved_at"]).date() == target_date
+    ]
+
+
+def test_first_read_builds_and_later_reads_do_not_query(day_backend):
+    today = get_today_jst()
+    counts = get_daily_summary(today)
+
+    reservations = _reservations(day_backend, today)
+    assert counts["reservations"] == len(reservations)
+    assert counts["covers"] == sum(r["guest_count"] for r in reservations)
+    assert counts == _rebuilt_counts(today)
+
+    day_backend.reset_stats()
+    for _ in range(100):
+        get_daily_summary(today)
+    assert day_backend.stats["round_trips"] == 0
+
+
+def _create(target_date, table_no, guest_count=3):
+    # 合成データはバッティングを気にせず割り当てているので、空いているテーブルに登録して編集する
+    ok, _ = create_reservation_and_progress(
+        course_id="course-0",
+        reserved_at=datetime.combine(target_date, datetime.strptime("21:00", "%H:%M").time()),
+        guest_name=table_no,
+        guest_count=guest_count,
+        table_no=table_no,
+        note=None,
+        main_choice="パスタ：2、ピザ：1",
+        main_detail_counts={"パスタ": 2, "ピザ": 1},
+    )
+    assert ok
+    return next(r for r in repos().client.tables["course_reservations"] if r["guest_name"] == table_no)
+
+
+def _update(r, **changes):
+    values = {**r, **changes}
+    ok, _ = update_reservation_basic(
+        r["id"], values["guest_name"], values["guest_count"], values["table_no"], values["status"], None,
+        parse_wall_jst(r["reserved_at"]), values["main_choice"],
+    )
+    assert ok
+
+
+def test_incremental_counts_equal_rebuild_after_edits(day_backend):
+    today = get_today_jst()
+    get_daily_summary(today)
+
+    # 新規登録
+    r0, r1, r2, r3 = (_create(today, t) for t in ("2-R1", "2-R2", "2-R3", "2-C8"))
+    assert get_daily_summary(today) == _rebuilt_counts(today)
+
+    # メインの内訳・人数の変更、テーブルの移動
+    _update(r0, guest_count=2, main_choice="ピザ：2")
+    _update(r1, table_no="2-C5")
+    assert get_daily_summary(today) == _rebuilt_counts(today)
+
+    # キャンセル
+    _update(r1, status="cancelled")
+    counts = get_daily_summary(today)
+    assert counts["cancelled"] == 1
+    assert counts == _rebuilt_counts(today)
+
+    # まとめて配膳
+    progress_ids = [p["id"] for p in day_backend.tables["course_progress"] if p["reservation_id"] == r2["id"]]
+    repos().progress.update_many(progress_ids, {"is_served": True})
+    assert get_daily_summary(today) == _rebuilt_counts(today)
+
+    # 別の日付への移動と削除
+    moved_at = parse_wall_jst(r3["reserved_at"]) + timedelta(days=1)
+    repos().reservations.update(r3["id"], {"reserved_at": moved_at.replace(tzinfo=None).isoformat()})
+    assert delete_reservation(r2["id"])[0]
+
+    counts = get_daily_summary(today)
+    assert counts == _rebuilt_counts(today)
+    assert counts["reservations"] == len([
+        r for r in _reservations(day_backend, today) if r.get("status") != "cancelled"
+    ])
+
+
+def test_repeated_event_does_not_double_count(day_backend):
+    today = get_today_jst()
+    summary = daily_summary.get_summary_registry().get(today)
+    before = summary.counts()
+
+    reservation = _reservations(day_backend, today)[0]
+    summary.apply("course_reservations", "UPDATE", dict(reservation))
+    summary.apply("course_reservations", "UPDATE", dict(reservation))
+    assert summary.counts() == before
+
+
+def test_idle_dates_are_evicted(day_backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(daily_summary.time_module, "monotonic", lambda: now[0])
+    registry = DailySummaryRegistry(get_change_feed())
+    today = get_today_jst()
+    tomorrow = today + timedelta(days=1)
+
+    registry.get(today)
+    now[0] += daily_summary.SUMMARY_IDLE_SEC - 1
+    registry.get(tomorrow)
+    assert set(registry._summaries) == {today.isoformat(), tomorrow.isoformat()}
+
+    now[0] += 2
+    registry.get(tomorrow)
+    assert set(registry._summaries) == {tomorrow.isoformat()}
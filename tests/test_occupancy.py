@@ -0,0 +1,92 @@
+# tests/test_occupancy.py
+
+from datetime import date
+
+from modules.course_reservation import TABLE_OPTIONS, TIME_CONFLICT_RULES, TIME_OPTIONS, get_occupancy_for
+from modules.occupancy import OccupancyIndex
+from modules.repository import repos
+
+
+DAY = date(2026, 10, 20)
+
+
+def _reservation(rid, time_str, table_no="1-T1", status="reserved"):
+    return {"id": rid, "reserved_at": f"{DAY.isoformat()}T{time_str}:00", "table_no": table_no, "status": status}
+
+
+def _index(reservations=()):
+    index = OccupancyIndex(DAY, TABLE_OPTIONS, TIME_OPTIONS, TIME_CONFLICT_RULES)
+    index.load(list(reservations))
+    return index
+
+
+def test_conflicts_follow_time_rules():
+    index = _index([_reservation("r1", "18:00")])
+
+    for time_str in TIME_OPTIONS:
+        expected = "18:00" in TIME_CONFLICT_RULES[time_str]
+        assert index.is_conflicted("1-T1", time_str) is expected, time_str
+        assert index.is_conflicted("1-T2", time_str) is False
+
+
+def test_cancelled_reservations_leave_the_slot_free():
+    index = _index([_reservation("r1", "18:00", status="cancelled")])
+    assert not index.is_conflicted("1-T1", "18:00")
+
+    index.add(_reservation("r2", "20:30"))
+    index.update(_reservation("r2", "20:30", status="cancelled"))
+    assert not index.is_conflicted("1-T1", "21:00")
+
+
+def test_update_moves_reservation_and_exclude_ignores_self():
+    index = _index([_reservation("r1", "18:00")])
+    assert index.is_conflicted("1-T1", "18:30")
+    assert not index.is_conflicted("1-T1", "18:00", exclude_reservation_id="r1")
+
+    index.update(_reservation("r1", "18:00", table_no="1-T2"))
+    assert not index.is_conflicted("1-T1", "18:30")
+    assert index.is_conflicted("1-T2", "18:30")
+
+    index.remove("r1")
+    assert not index.is_conflicted("1-T2", "18:30")
+
+
+def test_shared_slot_stays_occupied_until_last_reservation_leaves():
+    index = _index([_reservation("r1", "18:00"), _reservation("r2", "18:00")])
+    # r1 を除いても r2 が残っている
+    assert index.is_conflicted("1-T1", "18:00", exclude_reservation_id="r1")
+
+    index.remove("r1")
+    assert index.is_occupied("1-T1", "18:00")
+    index.remove("r2")
+    assert not index.is_occupied("1-T1", "18:00")
+
+
+def test_grid_marks_occupied_and_blocked_cells():
+    index = _index([_reservation("r1", "18:30")])
+    cells = dict(index.grid())["1-T1"]
+    assert dict(zip(TIME_OPTIONS, cells)) == {
+        "18:00": "blocked",
+        "18:30": "occupied",
+        "20:30": "blocked",
+        "21:00": "free",
+    }
+
+
+def test_registry_rebuilds_after_a_change_notification(course_backend):
+    index = get_occupancy_for(DAY)
+    assert not index.is_conflicted("1-T1", "18:00")
+
+    # 画面を通さずに入った予約も、変更通知で作り直した索引に入る
+    repos().client.table("course_reservations").insert(
+        {**_reservation("r1", "18:00"), "course_id": "c1", "guest_name": "A", "guest_count": 2}
+    ).execute()
+    course_backend.reset_stats()
+    assert get_occupancy_for(DAY).is_conflicted("1-T1", "18:00")
+    assert course_backend.stats["round_trips"] == 1
+
+    # 変更が無ければクエリは発生しない
+    course_backend.reset_stats()
+    get_occupancy_for(DAY)
+    assert course_backend.stats["round_trips"] == 0
+
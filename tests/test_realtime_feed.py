@@ -0,0 +1,26 @@
+# tests/test_realtime_feed.py
+
+from modules.realtime_feed import ChangeFeed
+
+
+def test_deleted_reservation_is_forgotten():
+    feed = ChangeFeed()
+    feed.publish("course_reservations", "INSERT", {"id": "r1", "reserved_at": "2026-10-20T18:00:00"})
+    feed.publish("course_progress", "UPDATE", {"id": "p1", "reservation_id": "r1"})
+    assert feed.table_version("course_progress", "2026-10-20") == 1
+
+    feed.publish("course_reservations", "DELETE", None, {"id": "r1"})
+    assert feed.delete_version("2026-10-20") == 1
+    assert "r1" not in feed._reservation_dates
+
+    # 日付が分からない変更は全日付に通知する
+    feed.publish("course_progress", "DELETE", None, {"id": "p1", "reservation_id": "r1"})
+    assert feed.table_version("course_progress", "2026-10-21") == 1
+
+
+def test_dates_before_today_are_forgotten():
+    feed = ChangeFeed()
+    feed.remember_reservation_dates([("r1", "2026-10-19"), ("r2", "2026-10-20"), ("r3", "2026-10-21")])
+
+    feed.forget_dates_before("2026-10-20")
+    assert feed._reservation_dates == {"r2": "2026-10-20", "r3": "2026-10-21"}
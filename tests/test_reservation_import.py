@@ -0,0 +1,154 @@
+# tests/test_reservation_import.py
+
+from modules.course_reservation import (
+    IMPORT_COLUMNS,
+    import_reservations,
+    import_template_csv,
+    parse_reservation_csv,
+)
+from modules.repository import repos
+
+
+HEADER = ",".join(IMPORT_COLUMNS)
+
+
+def _csv(*lines, encoding="utf-8"):
+    return "\n".join((HEADER,) + lines).encode(encoding)
+
+
+def _errors_by_line(errors):
+    return {e["行"]: e["内容"] for e in errors}
+
+
+def test_valid_rows_are_parsed(course_backend):
+    valid, errors = parse_reservation_csv(_csv(
+        "2026-10-20,18:00,山田,3,1-T1,Aコース,パスタ：2、ピザ：1,窓側",
+        "2026/10/20,20:30,佐藤,2,1-T2,Aコース,ピザ：2,",
+    ))
+    assert errors == []
+    assert [(r["line"], r["guest_name"], r["table_no"]) for r in valid] == [(2, "山田", "1-T1"), (3, "佐藤", "1-T2")]
+    assert valid[0]["main_counts"] == {"パスタ": 2, "ピザ": 1}
+    assert valid[0]["note"] == "窓側"
+    assert valid[1]["reserved_at"].strftime("%Y-%m-%d %H:%M") == "2026-10-20 20:30"
+
+
+def test_shift_jis_and_blank_lines(course_backend):
+    valid, errors = parse_reservation_csv(_csv("2026-10-20,18:00,山田,1,1-T1,Aコース,パスタ：1,", ",,,,,,,", encoding="cp932"))
+    assert errors == []
+    assert len(valid) == 1
+
+
+def test_missing_columns(course_backend):
+    valid, errors = parse_reservation_csv("予約日,お名前\n2026-10-20,山田".encode())
+    assert valid == []
+    assert errors[0]["行"] == 1
+    assert "時間" in errors[0]["内容"] and "テーブル" in errors[0]["内容"]
+
+
+def test_validation_errors_are_reported_per_line(course_backend):
+    valid, errors = parse_reservation_csv(_csv(
+        "2026-13-01,18:00,A,2,1-T1,Aコース,パスタ：2,",    # 日付
+        "2026-10-20,19:00,B,2,1-T1,Aコース,パスタ：2,",    # 予約できない時間
+        "2026-10-20,18:00,,2,1-T1,Aコース,パスタ：2,",     # 名前なし
+        "2026-10-20,18:00,D,0,1-T1,Aコース,,",             # 人数
+        "2026-10-20,18:00,E,2,9-T9,Bコース,パスタ：2,",    # テーブル・コース
+        "2026-10-20,18:00,F,3,1-T1,Aコース,パスタ：2,",    # メインの合計と人数が違う
+    ))
+    assert valid == []
+    by_line = _errors_by_line(errors)
+    assert "予約日" in by_line[2]
+    assert "予約できる時間帯ではありません" in by_line[3]
+    assert "お名前が空です" in by_line[4]
+    assert "人数" in by_line[5]
+    assert "テーブル「9-T9」" in by_line[6] and "コース「Bコース」" in by_line[6]
+    assert "一致していません" in by_line[7]
+
+
+def test_conflicts_with_existing_reservations_and_within_the_file(course_backend):
+    repos().client.table("course_reservations").insert({
+        "id": "r0", "course_id": "c1", "reserved_at": "2026-10-20T18:00:00",
+        "table_no": "1-T1", "status": "reserved", "guest_name": "既存", "guest_count": 2,
+    }).execute()
+
+    valid, errors = parse_reservation_csv(_csv(
+        "2026-10-20,18:30,A,2,1-T1,Aコース,パスタ：2,",    # 既存の 18:00 と重なる
+        "2026-10-20,20:30,B,2,1-T2,Aコース,パスタ：2,",
+        "2026-10-20,21:00,C,2,1-T2,Aコース,パスタ：2,",    # 上の行と重なる
+        "2026-10-20,21:00,D,2,1-T1,Aコース,パスタ：2,",
+    ))
+    by_line = _errors_by_line(errors)
+    assert "別の予約が入っています" in by_line[2]
+    assert "ファイル内の別の行" in by_line[4]
+    assert [r["line"] for r in valid] == [3, 5]
+
+
+def test_import_creates_reservations_and_progress_in_one_round_trip(course_backend):
+    valid, _ = parse_reservation_csv(_csv(
+        "2026-10-20,18:00,A,3,1-T1,Aコース,パスタ：2、ピザ：1,",
+        "2026-10-20,18:00,B,2,1-T2,Aコース,ピザ：2,",
+    ))
+    course_backend.reset_stats()
+    created, errors = import_reservations(valid)
+
+    assert (created, errors) == (2, [])
+    assert course_backend.stats["by_table"]["rpc:import_reservations_with_progress"]["round_trips"] == 1
+    assert len(course_backend.tables["course_reservations"]) == 2
+    # 前菜・デザート 1 行ずつ + メインは内訳ごと
+    mains = sorted(
+        (p["main_detail"], p["quantity"])
+        for p in course_backend.tables["course_progress"]
+        if p["course_item_id"] == "i2"
+    )
+    assert mains == [("パスタ", 2), ("ピザ", 1), ("ピザ", 2)]
+    assert len(course_backend.tables["course_progress"]) == 2 * 2 + 3
+
+
+def test_import_rechecks_conflicts_made_after_validation(course_backend):
+    valid, errors = parse_reservation_csv(_csv(
+        "2026-10-20,18:00,A,2,1-T1,Aコース,パスタ：2,",
+        "2026-10-20,18:00,B,2,1-T2,Aコース,パスタ：2,",
+    ))
+    assert errors == []
+
+    # 検証した後に、別の端末で同じテーブルに予約が入った
+    repos().client.table("course_reservations").insert({
+        "id": "other", "course_id": "c1", "reserved_at": "2026-10-20T18:30:00",
+        "table_no": "1-T1", "status": "reserved", "guest_name": "別端末", "guest_count": 1,
+    }).execute()
+
+    created, errors = import_reservations(valid)
+    assert created == 1
+    assert _errors_by_line(errors).keys() == {2}
+    tables = sorted(r["table_no"] for r in course_backend.tables["course_reservations"])
+    assert tables == ["1-T1", "1-T2"]
+
+
+def test_failed_batch_registers_nothing(course_backend, monkeypatch):
+    valid, _ = parse_reservation_csv(_csv(
+        "2026-10-20,18:00,A,2,1-T1,Aコース,パスタ：2,",
+        "2026-10-20,18:00,B,2,1-T2,Aコース,パスタ：2,",
+        "2026-10-20,20:30,C,2,1-T3,Aコース,パスタ：2,",
+    ))
+
+    calls = []
+    original = type(repos().reservations).import_with_progress
+
+    def fail_second_batch(self, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        return original(self, rows)
+
+    monkeypatch.setattr(type(repos().reservations), "import_with_progress", fail_second_batch)
+    created, errors = import_reservations(valid, batch_size=2)
+
+    assert calls == [2, 1]
+    assert created == 2
+    assert _errors_by_line(errors).keys() == {4}
+    assert "登録していません" in errors[0]["内容"]
+    assert len(course_backend.tables["course_reservations"]) == 2
+
+
+def test_template_is_readable(course_backend):
+    header = import_template_csv().decode("utf-8-sig").splitlines()[0]
+    assert header.split(",") == IMPORT_COLUMNS
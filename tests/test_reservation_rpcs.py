@@ -0,0 +1,152 @@
+# tests/test_reservation_rpcs.py
+"""sql/008・sql/009 の RPC のメモリ版（InMemoryBackend）と、それを呼ぶ画面側の関数。"""
+
+from datetime import datetime
+
+from modules.course_reservation import create_reservation_and_progress, get_occupancy_for, update_reservation_basic
+from modules.repository import repos
+
+
+RESERVED_AT = datetime(2026, 10, 20, 18, 0)
+
+
+def _create(table_no="1-T1", reserved_at=RESERVED_AT, main_counts=None, guest_count=2):
+    return create_reservation_and_progress(
+        course_id="c1",
+        reserved_at=reserved_at,
+        guest_name="山田",
+        guest_count=guest_count,
+        table_no=table_no,
+        note=None,
+        main_choice=None,
+        main_detail_counts=main_counts,
+    )
+
+
+def _progress_for(backend, reservation_id):
+    return [p for p in backend.tables["course_progress"] if p["reservation_id"] == reservation_id]
+
+
+def test_create_inserts_reservation_and_progress_in_one_round_trip(course_backend):
+    course_backend.reset_stats()
+    ok, _ = _create(main_counts={"パスタ": 1, "ピザ": 1})
+
+    assert ok
+    # 書き込みは RPC 1 回（もう 1 回は空き状況の索引の初回読み込み）
+    assert course_backend.stats["by_table"]["rpc:create_reservation_with_progress"]["round_trips"] == 1
+    assert set(course_backend.stats["by_table"]) <= {"rpc:create_reservation_with_progress", "course_reservations"}
+    (reservation,) = course_backend.tables["course_reservations"]
+    assert reservation["status"] == "reserved"
+
+    progress = _progress_for(course_backend, reservation["id"])
+    assert sorted((p["course_item_id"], p.get("main_detail")) for p in progress) == [
+        ("i1", None), ("i2", "パスタ"), ("i2", "ピザ"), ("i3", None),
+    ]
+    main = next(p for p in progress if p["course_item_id"] == "i2")
+    assert main["scheduled_time"] == "2026-10-20T18:30:00"
+
+
+def test_create_without_main_counts_makes_one_main_row(course_backend):
+    ok, _ = _create()
+    assert ok
+    mains = [p for p in course_backend.tables["course_progress"] if p["course_item_id"] == "i2"]
+    assert [(p["main_detail"], p["quantity"]) for p in mains] == [(None, 1)]
+
+
+def test_create_rejects_conflicting_slot_without_writing(course_backend):
+    assert _create()[0]
+    course_backend.reset_stats()
+
+    ok, message = _create(reserved_at=datetime(2026, 10, 20, 18, 30))
+    assert not ok and "登録できません" in message
+    assert len(course_backend.tables["course_reservations"]) == 1
+    assert course_backend.stats["round_trips"] == 1
+
+    # 別のテーブル・重ならない時間帯なら登録できる
+    assert _create(table_no="1-T2", reserved_at=datetime(2026, 10, 20, 18, 30))[0]
+    assert _create(reserved_at=datetime(2026, 10, 20, 21, 0))[0]
+
+
+def test_cancelled_reservation_does_not_block_the_slot(course_backend):
+    assert _create()[0]
+    (reservation,) = course_backend.tables["course_reservations"]
+    repos().reservations.update(reservation["id"], {"status": "cancelled"})
+
+    assert _create()[0]
+
+
+def _update(reservation_id, main_choice, table_no="1-T1", status="reserved", guest_count=2):
+    return update_reservation_basic(
+        reservation_id,
+        guest_name="山田",
+        guest_count=guest_count,
+        table_no=table_no,
+        status=status,
+        note=None,
+        reserved_at=RESERVED_AT,
+        main_choice=main_choice,
+    )
+
+
+def test_update_applies_main_diff_and_keeps_cooked_state(course_backend):
+    assert _create(main_counts={"パスタ": 1, "ピザ": 1})[0]
+    (reservation,) = course_backend.tables["course_reservations"]
+    pasta = next(p for p in course_backend.tables["course_progress"] if p.get("main_detail") == "パスタ")
+    repos().progress.update(pasta["id"], {"is_cooked": True})
+
+    course_backend.reset_stats()
+    ok, _ = _update(reservation["id"], "パスタ：3", guest_count=3)
+    assert ok
+    assert course_backend.stats["by_table"]["rpc:update_reservation_with_mains"]["round_trips"] == 1
+    assert "course_progress" not in course_backend.stats["by_table"]
+
+    mains = [p for p in _progress_for(course_backend, reservation["id"]) if p["course_item_id"] == "i2"]
+    # パスタは皿数だけ更新（調理済みのまま）、ピザは削除
+    assert [(p["id"], p["main_detail"], p["quantity"], p["is_cooked"]) for p in mains] == [
+        (pasta["id"], "パスタ", 3, True),
+    ]
+    assert reservation["guest_count"] == 3
+
+
+def test_update_adds_new_main_detail(course_backend):
+    assert _create(main_counts={"パスタ": 2})[0]
+    (reservation,) = course_backend.tables["course_reservations"]
+
+    assert _update(reservation["id"], "パスタ：2、ピザ：1", guest_count=3)[0]
+    mains = sorted(
+        (p["main_detail"], p["quantity"])
+        for p in _progress_for(course_backend, reservation["id"])
+        if p["course_item_id"] == "i2"
+    )
+    assert mains == [("パスタ", 2), ("ピザ", 1)]
+
+
+def test_update_rejects_move_onto_a_booked_table(course_backend):
+    assert _create(table_no="1-T1")[0]
+    assert _create(table_no="1-T2")[0]
+    first = next(r for r in course_backend.tables["course_reservations"] if r["table_no"] == "1-T1")
+
+    ok, message = _update(first["id"], None, table_no="1-T2")
+    assert not ok and "変更できません" in message
+    assert first["table_no"] == "1-T1"
+
+    # 自分自身とは重ならない
+    assert _update(first["id"], None, table_no="1-T1")[0]
+
+
+def test_update_keeps_occupancy_index_in_step(course_backend):
+    assert _create(table_no="1-T1")[0]
+    (reservation,) = course_backend.tables["course_reservations"]
+
+    assert _update(reservation["id"], None, table_no="1-T3")[0]
+    index = get_occupancy_for(RESERVED_AT.date())
+    assert not index.is_conflicted("1-T1", "18:00")
+    assert index.is_conflicted("1-T3", "18:00")
+
+    assert _update(reservation["id"], None, table_no="1-T3", status="cancelled")[0]
+    assert not get_occupancy_for(RESERVED_AT.date()).is_conflicted("1-T3", "18:00")
+
+
+def test_update_of_missing_reservation(course_backend):
+    ok, message = _update("missing", None)
+    assert not ok and "見つかりませんでした" in message
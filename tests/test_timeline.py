@@ -0,0 +1,25 @@
+# tests/test_timeline.py
+
+from datetime import timedelta
+
+from modules import timeline
+from modules.realtime_feed import get_change_feed
+from modules.time_utils import get_today_jst
+from modules.timeline import TimelineCache
+
+
+def test_idle_dates_are_evicted_with_their_fetch_locks(course_backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(timeline.time_module, "monotonic", lambda: now[0])
+    cache = TimelineCache(get_change_feed())
+    today = get_today_jst()
+    tomorrow = today + timedelta(days=1)
+
+    cache.get(today)
+    now[0] += timeline.TIMELINE_IDLE_SEC - 1
+    cache.get(tomorrow)
+    assert set(cache._entries) == set(cache._fetch_locks) == {today.isoformat(), tomorrow.isoformat()}
+
+    now[0] += 2
+    cache.get(tomorrow)
+    assert set(cache._entries) == set(cache._fetch_locks) == set(cache._last_used) == {tomorrow.isoformat()}
@@ -0,0 +1,147 @@
+# tests/test_write_behind.py
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from modules import write_behind
+from modules.realtime_feed import get_change_feed
+from modules.write_behind import WriteAheadLog, WriteBehindQueue, WriteJob, job_key
+
+
+DATE_KEY = "2026-10-20"
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "LOCK_PATH", str(tmp_path / "actions.lock"))
+    monkeypatch.setattr(write_behind, "RETRY_BACKOFF_SEC", 0.01)
+    return WriteAheadLog(str(tmp_path / "actions.sqlite3"))
+
+
+@pytest.fixture
+def progress_backend(make_backend):
+    return make_backend({
+        "course_progress": [
+            {"id": "p1", "reservation_id": "r1", "is_cooked": False, "cooked_at": None},
+            {"id": "p2", "reservation_id": "r1", "is_cooked": False, "cooked_at": None},
+        ],
+    })
+
+
+def _job(payload, key=None, table="course_progress", row_ids=("p1", "p2")):
+    return WriteJob("owner", table, row_ids, payload, "調理フラグの更新", DATE_KEY, key=key)
+
+
+def _drained(log, timeout=5.0):
+    # ワーカースレッドが送り終えるまで待つ
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not log.pending_for(DATE_KEY):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_job_key_identifies_one_tap():
+    key = job_key("owner", "course_progress", ["p2", "p1"], "cook", "nonce-1")
+    assert key == job_key("owner", "course_progress", ["p1", "p2"], "cook", "nonce-1")
+    assert key != job_key("owner", "course_progress", ["p1", "p2"], "cook", "nonce-2")
+    assert key != job_key("owner", "course_progress", ["p1", "p2"], "undo_cook", "nonce-1")
+    assert key != job_key("other", "course_progress", ["p1", "p2"], "cook", "nonce-1")
+
+
+def test_same_tap_is_logged_once(log):
+    key = job_key("owner", "course_progress", ["p1", "p2"], "cook", "nonce-1")
+    log.append(_job({"is_cooked": True}, key=key))
+    log.append(_job({"is_cooked": True}, key=key))
+    log.append(_job({"is_cooked": False}))
+
+    pending = log.pending_for(DATE_KEY)
+    assert [job.payload["is_cooked"] for job in pending] == [True, False]
+
+
+def test_pending_actions_are_replayed_in_order_with_tap_time(log, progress_backend):
+    # 前回の起動で記録だけして送れなかった操作（調理済み → 戻す → 調理済み）
+    tapped_at = (datetime.now(timezone.utc) - timedelta(minutes=30)).isoformat()
+    log.append(_job({"is_cooked": True, "cooked_at": tapped_at}))
+    log.append(_job({"is_cooked": False, "cooked_at": None}))
+    log.append(_job({"is_cooked": True, "cooked_at": tapped_at}))
+
+    WriteBehindQueue(get_change_feed(), log)
+    assert _drained(log)
+
+    rows = {p["id"]: p for p in progress_backend.tables["course_progress"]}
+    assert all(p["is_cooked"] for p in rows.values())
+    # 再送した時刻ではなく、押した時刻が残る（sql/010）
+    assert {p["cooked_at"] for p in rows.values()} == {tapped_at}
+
+
+def test_tap_time_in_the_future_falls_back_to_server_time(log, progress_backend):
+    future = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    log.append(_job({"is_cooked": True, "cooked_at": future}, row_ids=("p1",)))
+
+    WriteBehindQueue(get_change_feed(), log)
+    assert _drained(log)
+
+    p1 = next(p for p in progress_backend.tables["course_progress"] if p["id"] == "p1")
+    assert p1["is_cooked"] and p1["cooked_at"] != future
+
+
+def test_rejected_action_fails_after_max_attempts(log, progress_backend):
+    log.append(_job({"is_cooked": True}, table="no_such_table"))
+    feed = get_change_feed()
+    version = feed.version(DATE_KEY)
+
+    WriteBehindQueue(feed, log)
+    assert _drained(log)
+
+    failures = log.pop_failures("owner")
+    assert len(failures) == 1
+    assert failures[0].attempts == write_behind.MAX_ATTEMPTS - 1
+    assert log.failure_count(DATE_KEY) == 1
+    # 画面を再実行させる（スナップショットをフル同期させる）
+    assert feed.version(DATE_KEY) != version
+    # 表示済みの失敗は二度返さない
+    assert log.pop_failures("owner") == []
+
+
+def test_transient_errors_retry_without_giving_up(log, progress_backend, monkeypatch):
+    calls = []
+    original = write_behind.write_now
+
+    def flaky_write_now(table, row_ids, payload):
+        calls.append(table)
+        if len(calls) <= write_behind.MAX_ATTEMPTS:
+            raise ConnectionError("offline")
+        return original(table, row_ids, payload)
+
+    monkeypatch.setattr(write_behind, "write_now", flaky_write_now)
+    log.append(_job({"is_cooked": True}))
+
+    WriteBehindQueue(get_change_feed(), log)
+    assert _drained(log)
+
+    assert len(calls) == write_behind.MAX_ATTEMPTS + 1
+    assert log.failure_count(DATE_KEY) == 0
+    assert all(p["is_cooked"] for p in progress_backend.tables["course_progress"])
+
+
+def test_pop_failures_marks_only_the_rows_it_returns(log):
+    for nonce in ("n1", "n2", "n3"):
+        key = job_key("owner", "course_progress", ["p1"], "cook", nonce)
+        log.append(_job({"is_cooked": True}, key=key))
+        log.mark_failed(key, "rejected")
+    other = job_key("other", "course_progress", ["p1"], "cook", "n1")
+    log.append(WriteJob("other", "course_progress", ["p1"], {"is_cooked": True}, "調理フラグの更新", DATE_KEY, key=other))
+    log.mark_failed(other, "rejected")
+
+    assert len(log.pop_failures("owner")) == 3
+
+    # 表示した後に起きた失敗は、次の呼び出しで返す
+    late = job_key("owner", "course_progress", ["p2"], "cook", "n4")
+    log.append(_job({"is_cooked": True}, key=late, row_ids=("p2",)))
+    log.mark_failed(late, "rejected")
+    assert [job.key for job in log.pop_failures("owner")] == [late]
+    assert len(log.pop_failures("other")) == 1